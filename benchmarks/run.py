@@ -0,0 +1,168 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Benchmark suite for the kernels and the full step.
+
+Run from the top of the repository, once the C code is built::
+
+    python -m benchmarks.run --output bench.json
+
+Configurations are generated from a fixed seed, so two runs of the same
+commit on the same machine time exactly the same work.
+"""
+
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+from pexmd import particles, box, integrator, neighbour, interaction, simulation
+
+RCUT = 2.5
+SKIN = 0.3
+
+def configuration(n, density, seed=0):
+  """
+  Particles in a jittered simple cubic lattice, with the box that
+  gives them the requested number density.
+  """
+  rng = np.random.RandomState(seed)
+  side = (n/density)**(1.0/3)
+  nside = int(np.ceil(n**(1.0/3)))
+  spacing = side/nside
+  grid = (np.arange(nside) + 0.5)*spacing
+  x = np.array(np.meshgrid(grid, grid, grid, indexing='ij')).reshape(3, -1).T[:n]
+  x = x + rng.uniform(-0.1, 0.1, size=x.shape)*spacing
+  v = rng.normal(0.0, 1.0, size=x.shape)
+  v -= v.mean(axis=0)
+  return x.astype(np.float32), v.astype(np.float32), side
+
+def timeit(func, repeat, setup=None):
+  """
+  Time `func` `repeat` times. If given, `setup` is called, untimed,
+  before each repetition and its result is passed to `func`.
+  """
+  times = []
+  for _ in range(repeat):
+    args = () if setup is None else (setup(),)
+    t0 = time.perf_counter()
+    func(*args)
+    times.append(time.perf_counter() - t0)
+  return {'min': min(times), 'median': float(np.median(times)),
+          'repeat': repeat}
+
+def bench_forces(n, density, repeat, compute=interaction.ENERGY):
+  x, v, side = configuration(n, density)
+  b = box.Box(0.0, side, t='Periodic')
+  pairs = neighbour.LinkedCell(b, RCUT).build_list(x, np.zeros(n))
+  lj = interaction.LennardJones(RCUT, 1.0, 1.0)
+  result = timeit(lambda: lj.forces(x, v, pairs, box=b, compute=compute),
+                  repeat)
+  result['npairs'] = len(pairs)
+  return result
+
+def bench_neighbour(mode, n, density, repeat):
+  x, v, side = configuration(n, density)
+  t = np.zeros(n, dtype=np.int32)
+  b = box.Box(0.0, side, t='Periodic')
+  if mode == 'All':
+    neigh = neighbour.Neighbour()
+  elif mode == 'LinkedCell':
+    neigh = neighbour.LinkedCell(b, RCUT)
+  elif mode == 'VerletList':
+    neigh = neighbour.VerletList(b, RCUT, SKIN)
+    neigh.build_list(x, t)
+  return timeit(lambda: neigh.build_list(x, t), repeat)
+
+def bench_wrap(t, n, repeat):
+  x, v, side = configuration(n, 0.8)
+  b = box.Box(0.0, side, t=t)
+  rng = np.random.RandomState(1)
+  shift = rng.uniform(-side, side, size=x.shape).astype(np.float32)
+  return timeit(lambda xv: b.wrap_boundary(*xv), repeat,
+                setup=lambda: (x + shift, v.copy()))
+
+def bench_step(n, density, native, repeat, nsteps=10):
+  x, v, side = configuration(n, density)
+  part = particles.PointParticles(n)
+  part.x = x
+  part.v = v
+  part.mass = 1.0
+  b = box.Box(0.0, side, t='Periodic')
+  neigh = neighbour.VerletList(b, RCUT, SKIN)
+  lj = interaction.LennardJones(RCUT, 1.0, 1.0)
+  integ = integrator.VelVerlet(0.005)
+  sim = simulation.Simulation(part, b, integ, neigh, lj)
+  sim.native = native
+  result = timeit(lambda: sim.run(nsteps), repeat)
+  result['min'] /= nsteps
+  result['median'] /= nsteps
+  return result
+
+def commit():
+  try:
+    out = subprocess.check_output(['git', 'rev-parse', 'HEAD'],
+                                  stderr=subprocess.DEVNULL)
+    return out.decode().strip()
+  except (OSError, subprocess.CalledProcessError):
+    return None
+
+def main(argv=None):
+  parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+  parser.add_argument('--output', default=None,
+                      help="JSON file for the results (default: stdout)")
+  parser.add_argument('--sizes', type=int, nargs='+',
+                      default=[1000, 8000, 64000],
+                      help="Numbers of particles")
+  parser.add_argument('--densities', type=float, nargs='+',
+                      default=[0.4, 0.8], help="Number densities")
+  parser.add_argument('--repeat', type=int, default=5,
+                      help="Repetitions of each benchmark")
+  args = parser.parse_args(argv)
+
+  results = []
+  def record(name, params, result):
+    result.update(name=name, params=params)
+    results.append(result)
+    print("{0:<24s} {1:<40s} {2:12.6f} s".format(name, json.dumps(params),
+                                                  result['min']),
+          file=sys.stderr)
+
+  for n in args.sizes:
+    for density in args.densities:
+      params = {'n': n, 'density': density}
+      record('lj_forces', params, bench_forces(n, density, args.repeat))
+    params = {'n': n, 'density': 0.8, 'compute': 'forces'}
+    record('lj_forces', params, bench_forces(n, 0.8, args.repeat,
+                                             interaction.FORCES))
+    for mode in ('All', 'LinkedCell', 'VerletList'):
+      if mode == 'All' and n > 2000:
+        continue
+      params = {'n': n, 'density': 0.8, 'mode': mode}
+      record('neighbour', params, bench_neighbour(mode, n, 0.8, args.repeat))
+    for t in ('Periodic', 'Fixed'):
+      record('wrap_boundary', {'n': n, 't': t}, bench_wrap(t, n, args.repeat))
+    for native in (True, False):
+      params = {'n': n, 'density': 0.8, 'native': native}
+      record('nve_step', params, bench_step(n, 0.8, native, args.repeat))
+
+  report = {'commit': commit(),
+            'date': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'machine': {'platform': platform.platform(),
+                        'processor': platform.processor(),
+                        'python': platform.python_version(),
+                        'numpy': np.__version__},
+            'results': results}
+  if args.output is None:
+    json.dump(report, sys.stdout, indent=2)
+  else:
+    with open(args.output, 'w') as f:
+      json.dump(report, f, indent=2)
+
+if __name__ == '__main__':
+  main()
@@ -6,4 +6,4 @@ __author__ = """Pablo Nicolás Alcain"""
 __email__ = 'pabloalcain@gmail.com'
 __version__ = '0.1.0'
 
-from pexmd import particles, integrator, interaction, box, neighbour
+from pexmd import particles, integrator, interaction, box, neighbour, simulation, profiler, parallel, trajectory, checkpoint, analysis
@@ -0,0 +1,210 @@
+"""
+Main Correlator module.
+"""
+
+import numpy as np
+
+class Correlator(object):
+  """
+  Multiple-tau correlator.
+
+  Samples are kept in a hierarchy of `nlevels` buffers of `p` entries.
+  Each level holds samples coarse-grained `m` times more than the
+  previous one, so lags up to p*m**(nlevels - 1) samples are reached
+  with memory and work per sample that grow only with the number of
+  levels.
+  """
+  def __init__(self, nlevels=16, p=16, m=2, kind='product',
+               coarsen='mean', dt=1.0):
+    """
+    Parameters
+    ----------
+
+    nlevels : int
+        Number of levels of the hierarchy
+
+    p : int
+        Number of entries of each level, a multiple of `m`
+
+    m : int
+        Number of samples of a level averaged into one of the next
+
+    kind : {'product', 'displacement'}
+        Correlation computed: the mean of a(t)*a(t + tau) or of
+        (a(t + tau) - a(t))**2, summed over the last axis
+
+    coarsen : {'mean', 'last'}
+        How a level passes its samples on: their average, for
+        correlation functions, or the last one, which keeps the
+        displacements exact
+
+    dt : float
+        Time between samples
+    """
+    if p % m:
+      raise ValueError("The number of entries must be a multiple of m")
+    if kind not in ('product', 'displacement'):
+      raise ValueError("Unknown correlation {0}".format(kind))
+    if coarsen not in ('mean', 'last'):
+      raise ValueError("Unknown coarsening {0}".format(coarsen))
+    self.nlevels = nlevels
+    self.p = p
+    self.m = m
+    self.kind = kind
+    self.coarsen = coarsen
+    self.dt = dt
+    self.reset()
+
+  def reset(self):
+    """
+    Forget all the samples.
+    """
+    self.buffers = None
+    self.sums = np.zeros((self.nlevels, self.p))
+    self.counts = np.zeros((self.nlevels, self.p), dtype=np.int64)
+    self.nsamples = np.zeros(self.nlevels, dtype=np.int64)
+    self.acc = None
+    self.nacc = np.zeros(self.nlevels, dtype=np.int64)
+
+  def push(self, a):
+    """
+    Add a sample.
+
+    Parameters
+    ----------
+
+    a : NumPy array
+        The sample, for example an Nx3 array with a vector per particle
+    """
+    a = np.asarray(a, dtype=np.float64)
+    if self.buffers is None:
+      self.buffers = np.zeros((self.nlevels, self.p) + a.shape)
+      self.acc = np.zeros((self.nlevels,) + a.shape)
+    elif a.shape != self.buffers.shape[2:]:
+      msg = "Trying to push a sample of shape {0} into a correlator of {1}"
+      raise ValueError(msg.format(a.shape, self.buffers.shape[2:]))
+    self._push(0, a)
+
+  def _push(self, level, a):
+    buf = self.buffers[level]
+    n = self.nsamples[level]
+    head = n % self.p
+    buf[head] = a
+    n += 1
+    self.nsamples[level] = n
+    # Lags already covered by the previous level are skipped
+    first = 0 if level == 0 else self.p // self.m
+    last = min(n, self.p)
+    if first < last:
+      lags = np.arange(first, last)
+      past = buf[(head - lags) % self.p]
+      if self.kind == 'product':
+        values = past*a
+      else:
+        values = (a - past)**2
+      ncols = a.shape[-1] if a.ndim else 1
+      values = values.reshape(len(lags), -1, ncols).sum(axis=2)
+      self.sums[level, first:last] += values.mean(axis=1)
+      self.counts[level, first:last] += 1
+    if level + 1 == self.nlevels:
+      return
+    if self.coarsen == 'mean':
+      self.acc[level] += a
+    else:
+      self.acc[level] = a
+    self.nacc[level] += 1
+    if self.nacc[level] == self.m:
+      coarse = self.acc[level].copy()
+      if self.coarsen == 'mean':
+        coarse /= self.m
+      self.acc[level] = 0.0
+      self.nacc[level] = 0
+      self._push(level + 1, coarse)
+
+  @property
+  def lags(self):
+    """
+    Lag of each entry of the levels, in samples.
+    """
+    return np.arange(self.p)*(self.m**np.arange(self.nlevels)[:, np.newaxis])
+
+  def result(self):
+    """
+    Correlation at the lags sampled so far.
+
+    Returns
+    -------
+
+    tau : 1D NumPy array
+        The lags, in units of time
+
+    values : 1D NumPy array
+        The average correlation at each lag
+    """
+    valid = self.counts > 0
+    tau = self.lags[valid]*self.dt
+    values = self.sums[valid]/self.counts[valid]
+    order = np.argsort(tau, kind='stable')
+    return tau[order], values[order]
+
+def _by_id(part, a):
+  """
+  Per-particle values sorted by the IDs of the particles, so that the
+  correlations follow each particle through reorderings.
+  """
+  idx = part.idx
+  if len(idx) > 1 and np.any(idx[1:] < idx[:-1]):
+    return a[np.argsort(idx)]
+  return a
+
+class MSD(Correlator):
+  """
+  Mean-squared displacement, from the unwrapped positions.
+  """
+  def __init__(self, box, nlevels=16, p=16, m=2, dt=1.0):
+    """
+    Parameters
+    ----------
+
+    box : Box
+        The simulation box, to unwrap the positions
+
+    nlevels, p, m, dt :
+        As in `Correlator`
+    """
+    self.box = box
+    super().__init__(nlevels, p, m, kind='displacement', coarsen='last',
+                     dt=dt)
+
+  def sample(self, part):
+    """
+    Add the current positions of the particles.
+    """
+    x = self.box.unwrap(part.x.astype(np.float64), part.img)
+    self.push(_by_id(part, x))
+
+  def __call__(self, sim):
+    self.sample(sim.particles)
+
+class VACF(Correlator):
+  """
+  Velocity autocorrelation function.
+  """
+  def __init__(self, nlevels=16, p=16, m=2, dt=1.0):
+    """
+    Parameters
+    ----------
+
+    nlevels, p, m, dt :
+        As in `Correlator`
+    """
+    super().__init__(nlevels, p, m, kind='product', coarsen='mean', dt=dt)
+
+  def sample(self, part):
+    """
+    Add the current velocities of the particles.
+    """
+    self.push(_by_id(part, part.v))
+
+  def __call__(self, sim):
+    self.sample(sim.particles)
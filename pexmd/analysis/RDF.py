@@ -0,0 +1,168 @@
+"""
+Main RDF module.
+"""
+
+import numpy as np
+import ctypes as ct
+
+class _RDFStruct(ct.Structure):
+  """
+  Mirror of `struct rdf` in lj.h.
+  """
+  _fields_ = [('hist', ct.c_void_p), ('nbins', ct.c_int),
+              ('binv', ct.c_float), ('t', ct.c_void_p),
+              ('ntypes', ct.c_int), ('nsamples', ct.c_long)]
+
+class RDF(object):
+  """
+  Radial distribution function, accumulated on the fly.
+
+  The distances of the pairs in the neighbour list are histogrammed in
+  r**2 while the forces are calculated: inside the kernel for
+  `LennardJones`, with NumPy for the other short-range interactions.
+  Only pairs in the list are seen, so `rmax` must not be larger than
+  the cut radius of the interaction.
+  """
+  def __init__(self, rmax, nbins=100, ntypes=1):
+    """
+    Parameters
+    ----------
+
+    rmax : float
+        Largest distance in the histogram
+
+    nbins : int
+        Number of bins, uniform in r**2
+
+    ntypes : int
+        Number of particle types. With more than one, there is a
+        histogram per type pair and the types are needed.
+    """
+    self.rmax = rmax
+    self.nbins = nbins
+    self.ntypes = ntypes
+    self.hist = np.zeros((ntypes, ntypes, nbins), dtype=np.int64)
+    self._t = None
+    self._struct = _RDFStruct(self.hist.ctypes.data, nbins, nbins/rmax**2,
+                              None, ntypes, 0)
+
+  @property
+  def nsamples(self):
+    return self._struct.nsamples
+
+  def reset(self):
+    """
+    Clear the histograms.
+    """
+    self.hist[...] = 0
+    self._struct.nsamples = 0
+
+  def pointer(self, t=None):
+    """
+    Address of the histogram description to pass to the kernels.
+
+    Parameters
+    ----------
+
+    t : 1D NumPy array, optional
+        Types of the particles, needed with more than one type
+    """
+    self._struct.t = None
+    if self.ntypes > 1:
+      self._t = self._types(t)
+      self._struct.t = self._t.ctypes.data
+    return ct.addressof(self._struct)
+
+  def _types(self, t):
+    if t is None:
+      raise ValueError("Per type pair histograms need the particle types")
+    t = np.ascontiguousarray(t, dtype=np.int32)
+    if len(t) and (t.min() < 0 or t.max() >= self.ntypes):
+      msg = "Types must be between 0 and {0}"
+      raise ValueError(msg.format(self.ntypes - 1))
+    return t
+
+  def accumulate(self, x, pairs, box=None, t=None):
+    """
+    Add the pairs of one configuration to the histograms.
+
+    Parameters
+    ----------
+
+    x : 2D NumPy array
+        Positions of the particles
+
+    pairs : 2D NumPy array
+        The list of pairs
+
+    box : Box, optional
+        The simulation box, for the minimum image convention
+
+    t : 1D NumPy array, optional
+        Types of the particles, needed with more than one type
+    """
+    pairs = np.asarray(pairs, dtype=np.int64).reshape(-1, 2)
+    delr = x[pairs[:, 0]] - x[pairs[:, 1]]
+    if box is not None:
+      box.minimum_image(delr)
+    r2 = np.einsum('ij,ij->i', delr, delr)
+    bins = (r2*np.float32(self._struct.binv)).astype(np.int64)
+    inside = bins < self.nbins
+    row = 0
+    if self.ntypes > 1:
+      t = self._types(t)
+      row = t[pairs[inside, 0]]*self.ntypes + t[pairs[inside, 1]]
+    flat = row*self.nbins + bins[inside]
+    self.hist += np.bincount(flat, minlength=self.hist.size).reshape(
+      self.hist.shape)
+    self._struct.nsamples += 1
+
+  @property
+  def edges(self):
+    """
+    Edges of the bins, in r.
+    """
+    return np.sqrt(np.linspace(0.0, self.rmax**2, self.nbins + 1))
+
+  @property
+  def r(self):
+    """
+    Centers of the bins, in r.
+    """
+    edges = self.edges
+    return 0.5*(edges[1:] + edges[:-1])
+
+  def g(self, counts, volume):
+    """
+    Average radial distribution function over the samples.
+
+    Parameters
+    ----------
+
+    counts : int or 1D NumPy array
+        Number of particles, or of particles of each type
+
+    volume : float
+        Volume of the box
+
+    Returns
+    -------
+
+    g : NumPy array
+        The radial distribution function, with shape (nbins,) for one
+        type or (ntypes, ntypes, nbins) per type pair
+    """
+    counts = np.atleast_1d(counts).astype(np.float64)
+    if len(counts) != self.ntypes:
+      msg = "Trying to normalise {0} types with {1} particle counts"
+      raise ValueError(msg.format(self.ntypes, len(counts)))
+    hist = self.hist + np.swapaxes(self.hist, 0, 1)
+    idx = np.arange(self.ntypes)
+    hist[idx, idx] //= 2
+    npairs = np.outer(counts, counts)
+    npairs[idx, idx] = 0.5*counts*(counts - 1)
+    shell = 4.0/3.0*np.pi*np.diff(self.edges**3)
+    ideal = npairs[..., np.newaxis]*shell/volume*max(self.nsamples, 1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+      g = np.where(ideal > 0, hist/ideal, 0.0)
+    return g[0, 0] if self.ntypes == 1 else g
@@ -0,0 +1,227 @@
+"""
+Main StructureFactor module.
+"""
+
+import numpy as np
+
+# Name of each mass assignment order
+ORDERS = {'NGP': 1, 'CIC': 2, 'TSC': 3}
+
+def _weights(u, order):
+  """
+  First grid point and weights of the mass assignment, along one
+  direction.
+
+  Parameters
+  ----------
+
+  u : 1D NumPy array
+      Positions in units of the grid spacing
+
+  order : int
+      1 for nearest grid point, 2 for cloud in cell, 3 for triangular
+      shaped cloud
+
+  Returns
+  -------
+
+  first : 1D NumPy array
+      Grid point of the first weight
+
+  weights : 2D NumPy array
+      Weights of the `order` consecutive grid points, in an Nxorder
+      array
+  """
+  if order == 1:
+    return np.rint(u).astype(np.int64), np.ones((len(u), 1))
+  if order == 2:
+    first = np.floor(u)
+    d = u - first
+    return first.astype(np.int64), np.stack([1.0 - d, d], axis=1)
+  if order == 3:
+    center = np.rint(u)
+    d = u - center
+    weights = np.stack([0.5*(0.5 - d)**2, 0.75 - d**2, 0.5*(0.5 + d)**2],
+                       axis=1)
+    return center.astype(np.int64) - 1, weights
+  raise ValueError("Unknown assignment order {0}".format(order))
+
+class StructureFactor(object):
+  """
+  Static structure factor, from the FFT of the density on a grid.
+
+  The particles are deposited on a grid over the fractional
+  coordinates of the periodic box, the density is Fourier transformed
+  and the window of the assignment is divided out. S(k) is averaged
+  over spherical shells in k and over all the sampled frames.
+  """
+  def __init__(self, box, ngrid=64, order='CIC', nbins=None, kmax=None,
+               ntypes=1):
+    """
+    Parameters
+    ----------
+
+    box : Box
+        The periodic simulation box
+
+    ngrid : int
+        Number of grid points along each cell vector
+
+    order : {'NGP', 'CIC', 'TSC'}
+        Mass assignment: nearest grid point, cloud in cell or
+        triangular shaped cloud
+
+    nbins : int, optional
+        Number of shells in k, each 2*pi/L wide and centred on a
+        multiple of 2*pi/L, for the largest width L of the box. By
+        default, as many as fit below `kmax`.
+
+    kmax : float, optional
+        Largest k, used when `nbins` is not given. By default, half the
+        Nyquist wavenumber of the grid, where aliasing is still small.
+
+    ntypes : int
+        Number of particle types. With more than one, the partial
+        structure factors are accumulated too.
+    """
+    if box.t != 'Periodic':
+      raise ValueError("The structure factor needs a periodic box")
+    self.box = box
+    self.ngrid = ngrid
+    self.order = ORDERS[order] if order in ORDERS else order
+    if self.order not in ORDERS.values():
+      raise ValueError("Unknown assignment order {0}".format(order))
+    self.ntypes = ntypes
+    widths = 1.0/np.linalg.norm(box.hinv.astype(np.float64), axis=1)
+    if kmax is None:
+      kmax = 0.5*np.pi*ngrid/np.min(widths)
+    # Shells centered on the multiples of the smallest wavenumber
+    dk = 2*np.pi/np.max(widths)
+    if nbins is None:
+      nbins = max(int(kmax/dk - 0.5), 1)
+    self.nbins = nbins
+    self.edges = (np.arange(nbins + 1) + 0.5)*dk
+    self.kmax = self.edges[-1]
+    self.sums = np.zeros((ntypes, ntypes, nbins))
+    self.counts = np.zeros(nbins, dtype=np.int64)
+    self.nsamples = 0
+    self._h = None
+
+  def _shells(self):
+    """
+    Shell of each wavevector of the real FFT, and the deconvolution
+    factor of the assignment window, recomputed if the box changes.
+    """
+    h = self.box.h
+    if self._h is not None and np.array_equal(h, self._h):
+      return self._shell, self._window
+    n = self.ngrid
+    q = np.meshgrid(np.fft.fftfreq(n)*n, np.fft.fftfreq(n)*n,
+                    np.fft.rfftfreq(n)*n, indexing='ij')
+    q = np.stack(q, axis=-1)
+    k = 2*np.pi*np.dot(q, self.box.hinv.astype(np.float64))
+    kabs = np.linalg.norm(k, axis=-1)
+    shell = np.digitize(kabs, self.edges) - 1
+    shell[(kabs < self.edges[0]) | (kabs >= self.kmax)] = -1
+    window = np.prod(np.sinc(q/n), axis=-1)**(2*self.order)
+    self._h = h
+    self._shell = shell.ravel()
+    self._window = window.ravel()
+    return self._shell, self._window
+
+  def density(self, x):
+    """
+    Grid with the particles deposited on it.
+
+    Parameters
+    ----------
+
+    x : 2D NumPy array
+        Positions of the particles
+
+    Returns
+    -------
+
+    rho : 3D NumPy array
+        Number of particles assigned to each grid point
+    """
+    n = self.ngrid
+    s = np.dot(np.asarray(x, dtype=np.float64) - self.box.x0,
+               self.box.hinv.T.astype(np.float64))
+    firsts, weights = zip(*[_weights(n*s[:, k], self.order) for k in range(3)])
+    rho = np.zeros(n**3)
+    shifts = range(self.order)
+    for a in shifts:
+      for b in shifts:
+        for c in shifts:
+          cell = ((((firsts[0] + a) % n)*n + (firsts[1] + b) % n)*n +
+                  (firsts[2] + c) % n)
+          w = weights[0][:, a]*weights[1][:, b]*weights[2][:, c]
+          rho += np.bincount(cell, weights=w, minlength=n**3)
+    return rho.reshape(n, n, n)
+
+  def sample(self, part):
+    """
+    Add a frame of the particles.
+
+    Parameters
+    ----------
+
+    part : Particles
+        The particles, whose types are used with more than one type
+    """
+    shell, window = self._shells()
+    inside = shell >= 0
+    shell = shell[inside]
+    if self.ntypes > 1:
+      if len(part.t) and (part.t.min() < 0 or part.t.max() >= self.ntypes):
+        msg = "Types must be between 0 and {0}"
+        raise ValueError(msg.format(self.ntypes - 1))
+      groups = [part.t == a for a in range(self.ntypes)]
+    else:
+      groups = [slice(None)]
+    rhok = [np.fft.rfftn(self.density(part.x[g])).ravel()[inside]
+            for g in groups]
+    counts = [np.count_nonzero(g) if self.ntypes > 1 else part.n
+              for g in groups]
+    window = window[inside]
+    for a in range(self.ntypes):
+      for b in range(a, self.ntypes):
+        norm = np.sqrt(counts[a]*counts[b]) or 1.0
+        s = np.real(rhok[a]*np.conj(rhok[b]))/window/norm
+        self.sums[a, b] += np.bincount(shell, weights=s,
+                                       minlength=self.nbins)
+        if b != a:
+          self.sums[b, a] = self.sums[a, b]
+    self.counts += np.bincount(shell, minlength=self.nbins)
+    self.nsamples += 1
+
+  def __call__(self, sim):
+    self.sample(sim.particles)
+
+  @property
+  def k(self):
+    """
+    Centers of the shells.
+    """
+    return 0.5*(self.edges[1:] + self.edges[:-1])
+
+  def result(self):
+    """
+    Structure factor averaged over shells and samples.
+
+    Returns
+    -------
+
+    k : 1D NumPy array
+        Centers of the shells
+
+    s : NumPy array
+        S(k), with shape (nbins,) for one type. With more than one, the
+        partial structure factors in an (ntypes, ntypes, nbins) array,
+        normalised by the square root of the number of particles of
+        each type.
+    """
+    with np.errstate(divide='ignore', invalid='ignore'):
+      s = np.where(self.counts > 0, self.sums/self.counts, 0.0)
+    return self.k, (s[0, 0] if self.ntypes == 1 else s)
@@ -0,0 +1,221 @@
+"""
+Main Thermo module.
+"""
+
+import sys
+import numpy as np
+
+from pexmd.interaction import ENERGY, VIRIAL
+
+# Quantities computed by Thermo, in the order of the log columns
+QUANTITIES = ['KinEng', 'Temp', 'PotEng', 'TotEng', 'Press']
+
+class BlockAverage(object):
+  """
+  Running mean with a blocking (Flyvbjerg-Petersen) error estimate.
+
+  Level k holds the averages of blocks of 2**k consecutive samples,
+  through their count, sum and sum of squares, so the memory does not
+  grow with the number of samples.
+  """
+  def __init__(self, nlevels=32, minblocks=16):
+    """
+    Parameters
+    ----------
+
+    nlevels : int
+        Number of levels, enough for 2**nlevels samples
+
+    minblocks : int
+        Least number of blocks for a level to enter the error estimate
+    """
+    self.nlevels = nlevels
+    self.minblocks = minblocks
+    self.count = np.zeros(nlevels, dtype=np.int64)
+    self.sum = np.zeros(nlevels)
+    self.sumsq = np.zeros(nlevels)
+    self.pending = np.zeros(nlevels)
+    self.haspending = np.zeros(nlevels, dtype=bool)
+
+  def add(self, value):
+    """
+    Add a sample. Non-finite values, from quantities that could not be
+    computed, are skipped.
+    """
+    if not np.isfinite(value):
+      return
+    for level in range(self.nlevels):
+      self.count[level] += 1
+      self.sum[level] += value
+      self.sumsq[level] += value*value
+      if not self.haspending[level]:
+        self.pending[level] = value
+        self.haspending[level] = True
+        return
+      value = 0.5*(self.pending[level] + value)
+      self.haspending[level] = False
+
+  @property
+  def n(self):
+    return int(self.count[0])
+
+  @property
+  def mean(self):
+    return self.sum[0]/self.count[0] if self.count[0] else np.nan
+
+  @property
+  def errors(self):
+    """
+    Standard error of the mean estimated at each level.
+    """
+    with np.errstate(divide='ignore', invalid='ignore'):
+      mean = self.sum/self.count
+      var = self.sumsq/self.count - mean**2
+      return np.sqrt(np.maximum(var, 0.0)/(self.count - 1))
+
+  @property
+  def error(self):
+    """
+    Standard error of the mean, the largest one among the levels with
+    enough blocks, where correlations no longer hide it.
+    """
+    enough = self.count >= self.minblocks
+    if not enough.any():
+      return np.nan
+    return float(np.max(self.errors[enough]))
+
+class Thermo(object):
+  """
+  Thermodynamics observer.
+
+  Used as a `Simulation.run` callback, it computes the kinetic energy,
+  temperature, potential energy, total energy and pressure of the
+  system with vectorized reductions, keeps their block averages and
+  writes a line to the log every some samples.
+
+  It needs the energy and virial from the force kernel, so it adds
+  ENERGY | VIRIAL to the `compute` flags of the simulation it is
+  attached to, which happens on the first sample if not done before.
+  """
+  def __init__(self, log=sys.stdout, log_every=1, dof=None, kb=1.0,
+               sim=None):
+    """
+    Parameters
+    ----------
+
+    log : file, optional
+        Where the log lines are written. None turns off the log.
+
+    log_every : int
+        Number of samples between log lines
+
+    dof : int, optional
+        Degrees of freedom for the temperature. By default, three per
+        particle.
+
+    kb : float
+        Boltzmann constant
+
+    sim : Simulation, optional
+        Simulation to `attach` to, so that even the first sample gets
+        its virial from the kernel
+    """
+    self.log = log
+    self.log_every = log_every
+    self.dof = dof
+    self.kb = kb
+    self.values = dict((name, np.nan) for name in QUANTITIES)
+    self.averages = dict((name, BlockAverage()) for name in QUANTITIES)
+    self.nsamples = 0
+    if sim is not None:
+      self.attach(sim)
+
+  def __call__(self, sim):
+    self.sample(sim)
+
+  def attach(self, sim):
+    """
+    Make a simulation compute the energy and virial on the steps that
+    can be sampled.
+    """
+    sim.compute |= ENERGY | VIRIAL
+    return self
+
+  def sample(self, sim):
+    """
+    Compute the quantities for the current state of a simulation.
+    """
+    part = sim.particles
+    kin = 0.5*np.einsum('i,ij,ij->', part.mass, part.v, part.v,
+                        dtype=np.float64)
+    dof = self.dof if self.dof is not None else 3*part.n
+    temp = 2.0*kin/(dof*self.kb) if dof else 0.0
+    pot = float(sim.energ) if sim.compute & ENERGY else np.nan
+    virial = self.virial(sim)
+    if not sim.compute & VIRIAL:
+      self.attach(sim)
+    press = (2.0*kin + virial)/(3.0*sim.box.volume)
+    self.values = {'KinEng': kin, 'Temp': temp, 'PotEng': pot,
+                   'TotEng': kin + pot, 'Press': press}
+    for name in QUANTITIES:
+      self.averages[name].add(self.values[name])
+    self.nsamples += 1
+    if self.log is not None and (self.nsamples - 1) % self.log_every == 0:
+      if self.nsamples == 1:
+        self.log.write(self.header() + '\n')
+      self.log.write(self.line(sim.step) + '\n')
+
+  def virial(self, sim):
+    """
+    Pair virial, the sum of r_ij . F_ij over the pairs. It comes from
+    the kernel when the simulation computes VIRIAL. Before Thermo is
+    attached, it takes a pass over the pairs, and is NaN when the
+    interaction does not give the pair forces.
+    """
+    inter = sim.interaction
+    if sim.compute & VIRIAL and inter.virial is not None:
+      return float(np.trace(inter.virial))
+    if sim.pairs is None or not hasattr(inter, 'pair_force_batch'):
+      return np.nan
+    if getattr(inter, 'typed', False):
+      return np.nan
+    pairs = np.asarray(sim.pairs, dtype=np.int64).reshape(-1, 2)
+    x = sim.particles.x
+    delr = x[pairs[:, 0]] - x[pairs[:, 1]]
+    sim.box.minimum_image(delr)
+    r2 = np.einsum('ij,ij->i', delr, delr)
+    inside = r2 < inter.rcut**2
+    delr, r2 = delr[inside], r2[inside]
+    return float(np.einsum('ij,ij->', delr, inter.pair_force_batch(r2, delr),
+                           dtype=np.float64))
+
+  def header(self):
+    return "{0:>10s} ".format('Step') + ' '.join("{0:>12s}".format(name)
+                                                 for name in QUANTITIES)
+
+  def line(self, step):
+    return "{0:10d} ".format(step) + ' '.join(
+      "{0:12.6g}".format(self.values[name]) for name in QUANTITIES)
+
+  def mean(self, name):
+    return self.averages[name].mean
+
+  def error(self, name):
+    return self.averages[name].error
+
+  def summary(self):
+    """
+    Table with the mean and its error for each quantity.
+
+    Returns
+    -------
+
+    table : str
+        The formatted table
+    """
+    lines = ["Quantity |         mean |        error",
+             "---------+--------------+-------------"]
+    fmt = "{0:<8s} | {1:12.6g} | {2:12.4g}"
+    for name in QUANTITIES:
+      lines.append(fmt.format(name, self.mean(name), self.error(name)))
+    return '\n'.join(lines)
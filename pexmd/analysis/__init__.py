@@ -0,0 +1,4 @@
+from pexmd.analysis.RDF import *
+from pexmd.analysis.Correlator import *
+from pexmd.analysis.StructureFactor import *
+from pexmd.analysis.Thermo import *
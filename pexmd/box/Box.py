@@ -7,7 +7,11 @@ import ctypes as ct
 
 box = ct.CDLL('pexmd/box/box.so')
 boxperiodic_c = box.periodic
-boxperiodic_c.argtypes = [ct.c_voidp, ct.c_longlong, ct.c_voidp, ct.c_voidp]
+boxperiodic_c.argtypes = [ct.c_voidp, ct.c_voidp, ct.c_longlong, ct.c_voidp,
+                          ct.c_voidp]
+boxtriclinic_c = box.periodic_triclinic
+boxtriclinic_c.argtypes = [ct.c_voidp, ct.c_voidp, ct.c_longlong, ct.c_voidp,
+                           ct.c_voidp]
 boxfixed_c = box.fixed
 boxfixed_c.argtypes = [ct.c_voidp, ct.c_voidp, ct.c_longlong, ct.c_voidp, ct.c_voidp]
 
@@ -15,7 +19,7 @@ class Box(object):
   """
   Box class
   """
-  def __init__(self, x0, xf, t='Periodic'):
+  def __init__(self, x0, xf, t='Periodic', tilt=None):
     """
     Parameters
     ----------
@@ -28,19 +32,101 @@ class Box(object):
 
     t : {'Periodic', 'Fixed'}
         Type of boundary
+
+    tilt : NumPy array, optional
+        Tilt factors (xy, xz, yz) of a triclinic box, whose cell vectors
+        are (lx, 0, 0), (xy, ly, 0) and (xz, yz, lz), with
+        (lx, ly, lz) = xf - x0. Only periodic boundaries are supported,
+        and each factor must be at most half the length it tilts along,
+        |xy|, |xz| <= lx/2 and |yz| <= ly/2, so that the minimum image
+        is found by rounding fractional coordinates.
+    """
+    self.t = t
+    self._update(x0, xf, tilt)
+
+  @property
+  def x0(self):
+    return self._x0
+
+  @x0.setter
+  def x0(self, value):
+    self._update(value, self._xf, self._tilt)
+
+  @property
+  def xf(self):
+    return self._xf
+
+  @xf.setter
+  def xf(self, value):
+    self._update(self._x0, value, self._tilt)
+
+  @property
+  def tilt(self):
+    return self._tilt
+
+  @tilt.setter
+  def tilt(self, value):
+    self._update(self._x0, self._xf, value)
+
+  @property
+  def triclinic(self):
+    return self.tilt is not None
+
+  @property
+  def h(self):
+    """
+    Cell matrix, with the cell vectors as columns.
     """
-    if np.isscalar(x0):
-      self.x0 = np.array([x0]*3, dtype=np.float32)
+    return self._h
+
+  @property
+  def hinv(self):
+    """
+    Inverse of the cell matrix, to get fractional coordinates.
+    """
+    return self._hinv
+
+  @property
+  def cell(self):
+    """
+    Cell matrix and its inverse, as handed to the C kernels, or None
+    for orthorhombic boxes.
+    """
+    return self._cell
+
+  def _update(self, x0, xf, tilt):
+    """
+    Check and set the vertices and the tilt, caching the cell matrix,
+    its inverse and the cell handed to the kernels. The setters go
+    through here, so the arrays must not be modified in place.
+    """
+    x0 = np.array([x0]*3 if np.isscalar(x0) else x0, dtype=np.float32)
+    xf = np.array([xf]*3 if np.isscalar(xf) else xf, dtype=np.float32)
+    if tilt is None or not np.any(tilt):
+      tilt = None
     else:
-      self.x0 = np.array(x0, dtype=np.float32)
-    if np.isscalar(xf):
-      self.xf = np.array([xf]*3, dtype=np.float32)
+      if self.t != 'Periodic':
+        raise ValueError("Triclinic boxes must have periodic boundaries")
+      tilt = np.array(tilt, dtype=np.float32)
+    lx, ly, lz = xf - x0
+    xy, xz, yz = tilt if tilt is not None else (0.0, 0.0, 0.0)
+    if abs(xy) > 0.5*lx or abs(xz) > 0.5*lx or abs(yz) > 0.5*ly:
+      raise ValueError("Tilt factors must be at most half the box length")
+    self._x0, self._xf, self._tilt = x0, xf, tilt
+    self._h = np.array([[lx, xy, xz], [0.0, ly, yz], [0.0, 0.0, lz]],
+                       dtype=np.float32)
+    self._hinv = np.linalg.inv(self._h.astype(np.float64)).astype(np.float32)
+    if self.triclinic:
+      self._cell = np.concatenate([self._h.ravel(), self._hinv.ravel()])
     else:
-      self.xf = np.array(xf, dtype=np.float32)
-    self.t = t
+      self._cell = None
+
+  @property
+  def volume(self):
+    return float(np.prod(self.xf - self.x0))
 
 
-  def wrap_boundary(self, x, v):
+  def wrap_boundary(self, x, v, img=None):
     """
     Apply boundary conditions
 
@@ -50,6 +136,10 @@ class Box(object):
     x, v : NumPy array
         Positions and velocities of the particles
 
+    img : NumPy array, optional
+        Image flags of the particles, an Nx3 int32 array updated in
+        place with the box crossings in periodic boundaries
+
     Returns
     -------
 
@@ -60,9 +150,62 @@ class Box(object):
     xfp = self.xf.ctypes.data_as(ct.c_voidp)
     xp = x.ctypes.data_as(ct.c_voidp)
     npart = len(x)
-    if self.t == 'Periodic':
-      boxperiodic_c(xp, npart, x0p, xfp)
+    if self.triclinic:
+      imgp = None if img is None else img.ctypes.data_as(ct.c_voidp)
+      cell = self.cell
+      boxtriclinic_c(xp, imgp, npart, x0p, cell.ctypes.data_as(ct.c_voidp))
+    elif self.t == 'Periodic':
+      imgp = None if img is None else img.ctypes.data_as(ct.c_voidp)
+      boxperiodic_c(xp, imgp, npart, x0p, xfp)
     elif self.t == 'Fixed':
       vp = v.ctypes.data_as(ct.c_voidp)
       boxfixed_c(xp, vp, npart, x0p, xfp)
     return x, v
+
+  def minimum_image(self, delr):
+    """
+    Apply the minimum image convention to distance vectors
+
+    Parameters
+    ----------
+
+    delr : NumPy array
+        Distance vectors between pairs of particles
+
+    Returns
+    -------
+
+    delr : NumPy array
+        Distance vectors updated, in place, if the box is periodic
+    """
+    if self.triclinic:
+      s = np.dot(delr, self.hinv.T)
+      s -= np.round(s)
+      delr[...] = np.dot(s, self.h.T)
+    elif self.t == 'Periodic':
+      l = self.xf - self.x0
+      delr -= l*np.round(delr/l)
+    return delr
+
+  def unwrap(self, x, img):
+    """
+    Unwrapped positions, as if the box had not been crossed
+
+    Parameters
+    ----------
+
+    x : NumPy array
+        Positions of the particles, inside the box
+
+    img : NumPy array
+        Image flags of the particles
+
+    Returns
+    -------
+
+    x : NumPy array
+        Unwrapped positions
+    """
+    if self.triclinic:
+      return x + np.dot(img, self.h.T)
+    return x + img*(self.xf - self.x0)
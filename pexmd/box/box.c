@@ -1,8 +1,49 @@
-void periodic(float *x, long int npart, float *x0, float *xf) {
-  for (int i = 0; i < npart; i++) {
+#include <math.h>
+#include "box.h"
+
+void periodic(float *x, int *img, long int npart, float *x0, float *xf) {
+  /* Constant time per particle, however far it went. The number of box
+     lengths it was moved is added to its image flags, if given. */
+  float l[3], linv[3];
+  for (int k = 0; k < 3; k++) {
+    l[k] = xf[k] - x0[k];
+    linv[k] = 1.0 / l[k];
+  }
+  for (long int i = 0; i < npart; i++) {
     for (int k = 0; k < 3; k ++) {
-      while (x[3*i + k] > xf[k]) x[3*i + k] -= (xf[k] - x0[k]);
-      while (x[3*i + k] < x0[k]) x[3*i + k] += (xf[k] - x0[k]);
+      float s = floorf((x[3*i + k] - x0[k]) * linv[k]);
+      if (s != 0) {
+        x[3*i + k] -= s * l[k];
+        if (img) img[3*i + k] += (int) s;
+      }
+    }
+  }
+  return;
+}
+
+void periodic_triclinic(float *x, int *img, long int npart, float *x0,
+                        float *tri) {
+  /* tri holds the cell matrix h, with the cell vectors as columns,
+     followed by its inverse, both row-major. Positions are wrapped in
+     fractional coordinates s = h^-1 (x - x0). */
+  float *h = tri;
+  float *hinv = tri + 9;
+  for (long int i = 0; i < npart; i++) {
+    float d[3], n[3];
+    int moved = 0;
+    for (int k = 0; k < 3; k++) {
+      d[k] = x[3*i + k] - x0[k];
+    }
+    for (int k = 0; k < 3; k++) {
+      n[k] = floorf(hinv[3*k] * d[0] + hinv[3*k + 1] * d[1] +
+                    hinv[3*k + 2] * d[2]);
+      moved |= (n[k] != 0);
+    }
+    if (moved) {
+      for (int k = 0; k < 3; k++) {
+        x[3*i + k] -= h[3*k] * n[0] + h[3*k + 1] * n[1] + h[3*k + 2] * n[2];
+        if (img) img[3*i + k] += (int) n[k];
+      }
     }
   }
   return;
@@ -1,5 +1,30 @@
 #ifndef BOX_H
 #define BOX_H
-void periodic(float *x, long int npart, float *x0, float *xf);
+
+#include <math.h>
+
+void periodic(float *x, int *img, long int npart, float *x0, float *xf);
+void periodic_triclinic(float *x, int *img, long int npart, float *x0,
+                        float *tri);
 void fixed(float *x, float *v, long int npart, float *x0, float *xf);
+
+static inline void minimum_image(float *delr, float *boxl, float *tri) {
+  if (tri) {
+    /* Triclinic: tri holds h and h^-1, row-major */
+    float s[3];
+    for (int k = 0; k < 3; k++) {
+      s[k] = tri[9 + 3*k] * delr[0] + tri[9 + 3*k + 1] * delr[1] +
+        tri[9 + 3*k + 2] * delr[2];
+      s[k] -= rintf(s[k]);
+    }
+    for (int k = 0; k < 3; k++) {
+      delr[k] = tri[3*k] * s[0] + tri[3*k + 1] * s[1] + tri[3*k + 2] * s[2];
+    }
+  }
+  else if (boxl) {
+    for (int k = 0; k < 3; k++) {
+      delr[k] -= boxl[k] * rintf(delr[k] / boxl[k]);
+    }
+  }
+}
 #endif
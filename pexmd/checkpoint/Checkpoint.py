@@ -0,0 +1,250 @@
+"""
+Main Checkpoint module.
+
+A checkpoint file has a header and the raw arrays of the state:
+
+- header: MAGIC, its length as a little-endian uint64 and a JSON
+  document with the scalar state and the dtype, shape and offset of
+  each array, padded to ALIGN bytes
+- arrays: the raw bytes of each array, each one starting at a multiple
+  of ALIGN so that the file can be memory-mapped
+"""
+
+import os
+import json
+import time
+import numpy as np
+
+from pexmd.particles import PER_PARTICLE
+
+MAGIC = b'PEXMDCHK'
+VERSION = 1
+ALIGN = 64
+
+def _split(obj):
+  """
+  Split the attributes of an object into JSON scalars and arrays.
+  References to other objects are left out.
+  """
+  scalars, arrays = {}, {}
+  for key, value in vars(obj).items():
+    if isinstance(value, np.ndarray):
+      arrays[key] = value
+    elif value is None or isinstance(value, (bool, int, float, str)):
+      scalars[key] = value
+    elif isinstance(value, np.generic):
+      scalars[key] = value.item()
+  return scalars, arrays
+
+def _rng_state(rng):
+  """
+  State of a NumPy RandomState or Generator as JSON data, with the
+  arrays turned into lists.
+  """
+  if rng is None:
+    state = np.random.get_state(legacy=False)
+  elif hasattr(rng, 'get_state'):
+    state = rng.get_state(legacy=False)
+  else:
+    state = rng.bit_generator.state
+  return json.loads(json.dumps(state, default=lambda a: a.tolist()))
+
+def _set_rng_state(rng, state):
+  if state['bit_generator'] == 'MT19937':
+    key = state['state']['key']
+    state['state']['key'] = np.array(key, dtype=np.uint32)
+  if rng is None:
+    np.random.set_state(state)
+  elif hasattr(rng, 'set_state'):
+    rng.set_state(state)
+  else:
+    rng.bit_generator.state = state
+
+def save(fname, sim, rng=None):
+  """
+  Write the full state of a simulation, atomically: the checkpoint is
+  written to a temporary file that replaces `fname` once it is on disk.
+
+  Parameters
+  ----------
+
+  fname : str
+      Name of the checkpoint file
+
+  sim : Simulation
+      The simulation to save: its particles, box, integrator, neighbour
+      list cache and step
+
+  rng : RandomState or Generator, optional
+      The random number generator to save. By default, the global one
+      of NumPy.
+  """
+  part = sim.particles
+  arrays = dict(('particles.' + name, getattr(part, name))
+                for name in PER_PARTICLE)
+  meta = {'version': VERSION, 'step': sim.step, 'energ': float(sim.energ),
+          'particles': {'n': part.n, '_next_id': part._next_id},
+          'rng': _rng_state(rng)}
+  for name in ('box', 'integrator', 'neighbour'):
+    scalars, objarrays = _split(getattr(sim, name))
+    meta[name] = scalars
+    meta[name]['class'] = type(getattr(sim, name)).__name__
+    for key, value in objarrays.items():
+      arrays[name + '.' + key] = value
+  layout = {}
+  offset = 0
+  for key, value in arrays.items():
+    layout[key] = [value.dtype.str, list(value.shape), offset]
+    offset += -(-value.nbytes // ALIGN)*ALIGN
+  meta['arrays'] = layout
+  header = json.dumps(meta).encode()
+  header += b' '*(-(len(MAGIC) + 8 + len(header)) % ALIGN)
+  start = len(MAGIC) + 8 + len(header)
+
+  tmp = fname + '.tmp'
+  with open(tmp, 'wb') as f:
+    f.write(MAGIC)
+    f.write(np.uint64(len(header)).tobytes())
+    f.write(header)
+    for key, value in arrays.items():
+      f.seek(start + layout[key][2])
+      f.write(np.ascontiguousarray(value).data)
+    f.truncate(start + offset)
+    f.flush()
+    os.fsync(f.fileno())
+  os.replace(tmp, fname)
+  directory = os.open(os.path.dirname(os.path.abspath(fname)), os.O_RDONLY)
+  try:
+    os.fsync(directory)
+  finally:
+    os.close(directory)
+
+def load(fname):
+  """
+  Map a checkpoint file.
+
+  Parameters
+  ----------
+
+  fname : str
+      Name of the checkpoint file
+
+  Returns
+  -------
+
+  meta : dict
+      The scalar state
+
+  arrays : dict
+      Read-only views of the arrays in the file, by name
+  """
+  with open(fname, 'rb') as f:
+    if f.read(len(MAGIC)) != MAGIC:
+      raise ValueError("{0} is not a pexmd checkpoint".format(fname))
+    size = int(np.frombuffer(f.read(8), dtype='<u8')[0])
+    meta = json.loads(f.read(size).decode())
+  if meta['version'] != VERSION:
+    raise ValueError("Unknown checkpoint version {0}".format(meta['version']))
+  start = len(MAGIC) + 8 + size
+  data = np.memmap(fname, dtype=np.uint8, mode='r')
+  arrays = {}
+  for key, (dtype, shape, offset) in meta['arrays'].items():
+    arrays[key] = np.ndarray(shape, dtype=dtype, buffer=data,
+                             offset=start + offset)
+  return meta, arrays
+
+def restore(fname, sim, rng=None):
+  """
+  Bring a simulation back to the state saved in a checkpoint. Its
+  components must be of the same classes as the saved ones.
+
+  Parameters
+  ----------
+
+  fname : str
+      Name of the checkpoint file
+
+  sim : Simulation
+      The simulation to restore, updated in place
+
+  rng : RandomState or Generator, optional
+      The random number generator to restore. By default, the global
+      one of NumPy.
+  """
+  meta, arrays = load(fname)
+  for name in ('box', 'integrator', 'neighbour'):
+    obj = getattr(sim, name)
+    if type(obj).__name__ != meta[name]['class']:
+      msg = "Checkpoint has a {0} {1}, not a {2}"
+      raise ValueError(msg.format(meta[name]['class'], name,
+                                  type(obj).__name__))
+  part = sim.particles
+  n = meta['particles']['n']
+  with part.writing():
+    part._grow(n)
+    part.n = n
+    part._views()
+    part._next_id = meta['particles']['_next_id']
+    for name in PER_PARTICLE:
+      getattr(part, name)[...] = arrays['particles.' + name]
+  for name in ('box', 'integrator', 'neighbour'):
+    obj = getattr(sim, name)
+    for key, value in meta[name].items():
+      if key != 'class':
+        setattr(obj, key, value)
+    prefix = name + '.'
+    for key, value in arrays.items():
+      if key.startswith(prefix):
+        setattr(obj, key[len(prefix):], np.array(value))
+  sim.step = meta['step']
+  sim.energ = meta['energ']
+  _set_rng_state(rng, meta['rng'])
+
+class Checkpointer(object):
+  """
+  Checkpointer class. Saves a simulation every some steps or some
+  seconds, when used as a `Simulation.run` callback.
+  """
+  def __init__(self, fname, every=None, interval=None, rng=None):
+    """
+    Parameters
+    ----------
+
+    fname : str
+        Name of the checkpoint file, replaced on each save
+
+    every : int, optional
+        Interval between checkpoints, in steps
+
+    interval : float, optional
+        Interval between checkpoints, in seconds of wall-clock time
+
+    rng : RandomState or Generator, optional
+        The random number generator to save
+    """
+    self.fname = fname
+    self.every = every
+    self.interval = interval
+    self.rng = rng
+    self.last_step = None
+    self.last_time = time.perf_counter()
+    self.nsaves = 0
+
+  def __call__(self, sim):
+    due = self.every is None and self.interval is None
+    if self.every is not None:
+      last = self.last_step
+      due = due or last is None or sim.step - last >= self.every
+    if self.interval is not None:
+      due = due or time.perf_counter() - self.last_time >= self.interval
+    if due:
+      self.save(sim)
+
+  def save(self, sim):
+    """
+    Write a checkpoint now.
+    """
+    save(self.fname, sim, self.rng)
+    self.last_step = sim.step
+    self.last_time = time.perf_counter()
+    self.nsaves += 1
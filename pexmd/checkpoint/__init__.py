@@ -0,0 +1 @@
+from pexmd.checkpoint.Checkpoint import *
@@ -18,6 +18,40 @@ class Integrator(object):
   def last_step(self, x, v, a):
     return x, v
 
+  def first_step_inplace(self, part):
+    """
+    First half of the step, updating the particles in place.
+
+    Parameters
+    ----------
+
+    part : Particles
+        The particles to move
+    """
+    part.x, part.v = self.first_step(part.x, part.v, part.a)
+
+  def last_step_inplace(self, part):
+    """
+    Last half of the step, updating the particles in place.
+
+    Parameters
+    ----------
+
+    part : Particles
+        The particles to move
+    """
+    part.x, part.v = self.last_step(part.x, part.v, part.a)
+
+  def _buffer(self, part):
+    """
+    Preallocated Nx3 buffer, reallocated only when the number of
+    particles changes.
+    """
+    buf = getattr(self, '_buf', None)
+    if buf is None or buf.shape != part.x.shape:
+      buf = self._buf = np.empty_like(part.x)
+    return buf
+
 class NVE(Integrator):
   """
   NVE base class
@@ -37,6 +71,18 @@ class VelVerlet(NVE):
     v = v + 0.5*a*self.dt
     return x, v
 
+  def first_step_inplace(self, part):
+    halfdv = part.accel(self._buffer(part))
+    halfdv *= 0.5*self.dt
+    part.v += halfdv
+    dx = np.multiply(part.v, self.dt, out=halfdv)
+    part.x += dx
+
+  def last_step_inplace(self, part):
+    halfdv = part.accel(self._buffer(part))
+    halfdv *= 0.5*self.dt
+    part.v += halfdv
+
 class NVT(Integrator):
   """
   NVT base class
@@ -6,15 +6,49 @@ import numpy as np
 import itertools as it
 import ctypes as ct
 
+# Flags of what `forces` computes besides the forces, to be combined with |
+FORCES = 0
+ENERGY = 1
+VIRIAL = 2
+PERATOM = 4
+
+def _pointer(a):
+  return None if a is None else a.ctypes.data_as(ct.c_voidp)
+
+def _box_pointers(box):
+  """
+  Pointers to the box lengths and, for triclinic boxes, to the cell
+  matrices, as needed by the kernels for the minimum image convention.
+  NULL pointers mean no periodicity.
+  """
+  if box is None or box.t != 'Periodic':
+    return None, None
+  boxl = box.xf - box.x0
+  cell = box.cell
+  trip = None if cell is None else cell.ctypes.data_as(ct.c_voidp)
+  return boxl.ctypes.data_as(ct.c_voidp), trip
+
+def _tensor(virial):
+  """
+  Symmetric 3x3 tensor from its components xx, yy, zz, xy, xz, yz.
+  """
+  xx, yy, zz, xy, xz, yz = np.asarray(virial, dtype=np.float64)
+  return np.array([[xx, xy, xz], [xy, yy, yz], [xz, yz, zz]])
 
 class Interaction(object):
   """
   Base Interaction class.
+
+  Besides the forces and energy returned by `forces`, the virial
+  tensor, sum over the pairs of r_ij F_ij, and the energy of each
+  particle are stored in `virial` and `peratom` when asked for with
+  the `compute` flags. Otherwise they are None.
   """
   def __init__(self):
-    pass
+    self.virial = None
+    self.peratom = None
 
-  def forces(self, x, v, pairs=None):
+  def forces(self, x, v, pairs=None, box=None, t=None, compute=ENERGY):
     """
     Main loop calculation.
 
@@ -22,9 +56,27 @@ class Interaction(object):
     It is just meant to be a proof of concept for the main loop, but
     has to change *dramatically*, even in arity, when we want to add
     lists of neighbors, parallelization and so on.
+
+    `compute` combines FORCES, ENERGY, VIRIAL and PERATOM. Without
+    ENERGY, the returned energy is 0.
     """
+    self.virial = np.zeros((3, 3)) if compute & VIRIAL else None
+    self.peratom = np.zeros(len(x)) if compute & PERATOM else None
     return np.zeros_like(x), 0.0
 
+  def _outputs(self, compute, n):
+    """
+    Buffers for the kernels to add up the virial and per-atom energy,
+    or None when they are not asked for.
+    """
+    virial = np.zeros(6, dtype=np.float32) if compute & VIRIAL else None
+    peratom = np.zeros(n, dtype=np.float32) if compute & PERATOM else None
+    return virial, peratom
+
+  def _store(self, virial, peratom):
+    self.virial = None if virial is None else _tensor(virial)
+    self.peratom = peratom
+
 class ShortRange(Interaction):
   """
   Base short-range class
@@ -43,62 +95,359 @@ class ShortRange(Interaction):
         Shift style when approaching rcut
 
     .. note:: 'Splines' not implemented yet
+
+    .. note:: Setting `rdf` to an `RDF` accumulates the radial
+              distribution function of the pairs on each call to
+              `forces`.
     """
     self.rcut = rcut
     self.shift_style = shift_style
+    self.rdf = None
     super().__init__()
 
-  def forces(self, x, v, pairs=None):
+  def forces(self, x, v, pairs=None, box=None, t=None, compute=ENERGY):
     """
-    Calculate Lennard-Jones force
+    Calculate short-range forces.
+    If `box` is periodic, the minimum image convention is used.
+
+    When the subclass implements `pair_force_batch` and
+    `pair_energ_batch`, all the pairs are evaluated at once with NumPy;
+    otherwise `pair_force` and `pair_energ` are called pair by pair.
     """
-    energ = 0
-    forces = np.zeros_like(x)
     if pairs is None:
       pairs = np.array(list(it.combinations(range(len(x)), 2)), dtype=np.int64)
+    if self.rdf is not None:
+      self.rdf.accumulate(x, pairs, box, t)
+    if self.batched:
+      return self._forces_batch(x, pairs, box, compute)
+    energ = 0
+    forces = np.zeros_like(x)
+    virial, peratom = self._outputs(compute, len(x))
     for i, j in pairs:
-      f = self.pair_force(x[i], x[j])
-      energ += self.pair_energ(x[i], x[j])
+      xj = x[j]
+      if box is not None:
+        xj = x[i] - box.minimum_image(x[i] - x[j])
+      f = self.pair_force(x[i], xj)
       forces[i] += f
       forces[j] -= f
+      if compute & (ENERGY | PERATOM):
+        e = self.pair_energ(x[i], xj)
+        energ += e
+        if peratom is not None:
+          peratom[[i, j]] += 0.5*e
+      if virial is not None:
+        delr = x[i] - xj
+        virial += [delr[0]*f[0], delr[1]*f[1], delr[2]*f[2],
+                   delr[0]*f[1], delr[0]*f[2], delr[1]*f[2]]
+    self._store(virial, peratom)
+    return forces, (energ if compute & ENERGY else 0.0)
+
+  def _forces_batch(self, x, pairs, box=None, compute=ENERGY):
+    """
+    Vectorized force calculation, gathering the distances of all pairs
+    and scattering the pair forces with `np.bincount`.
+    """
+    forces = np.zeros_like(x)
+    pairs = np.asarray(pairs, dtype=np.int64).reshape(-1, 2)
+    i = pairs[:, 0]
+    j = pairs[:, 1]
+    delr = x[i] - x[j]
+    if box is not None:
+      box.minimum_image(delr)
+    r2 = np.einsum('ij,ij->i', delr, delr)
+    inside = r2 < self.rcut**2
+    if not inside.all():
+      i, j, delr, r2 = i[inside], j[inside], delr[inside], r2[inside]
+    f = self.pair_force_batch(r2, delr)
+    energ = 0.0
+    for k in range(3):
+      forces[:, k] = (np.bincount(i, weights=f[:, k], minlength=len(x)) -
+                      np.bincount(j, weights=f[:, k], minlength=len(x)))
+    virial = peratom = None
+    if compute & (ENERGY | PERATOM):
+      e = self.pair_energ_batch(r2)
+      if compute & ENERGY:
+        energ = np.sum(e)
+      if compute & PERATOM:
+        peratom = 0.5*(np.bincount(i, weights=e, minlength=len(x)) +
+                       np.bincount(j, weights=e, minlength=len(x)))
+    if compute & VIRIAL:
+      w = np.einsum('pa,pb->ab', delr, f)
+      virial = [w[0, 0], w[1, 1], w[2, 2], w[0, 1], w[0, 2], w[1, 2]]
+    self._store(virial, peratom)
     return forces, energ
 
+  @property
+  def batched(self):
+    """
+    Whether the subclass provides its own vectorized pair functions,
+    so that `forces` takes the fast path through them.
+    """
+    cls = type(self)
+    return (cls.pair_force_batch is not ShortRange.pair_force_batch and
+            cls.pair_energ_batch is not ShortRange.pair_energ_batch)
+
   def pair_force(self, s1, s2):
     return np.array([0, 0, 0], dtype=np.float32)
 
   def pair_energ(self, s1, s2):
     return 0.0
 
+  def pair_force_batch(self, r2, delr):
+    """
+    Force on the first particle of each pair. By default, `pair_force`
+    is called pair by pair, with the second particle at the origin.
+
+    Parameters
+    ----------
+
+    r2 : 1D NumPy array
+        Squared distances of the pairs, all of them below `rcut**2`
+
+    delr : 2D NumPy array
+        Distance vectors of the pairs, in an Mx3 array
+
+    Returns
+    -------
+
+    forces : 2D NumPy array
+        Forces in an Mx3 array
+    """
+    origin = np.zeros(3, dtype=delr.dtype)
+    forces = np.zeros_like(delr)
+    for k, d in enumerate(delr):
+      forces[k] = self.pair_force(d, origin)
+    return forces
+
+  def pair_energ_batch(self, r2):
+    """
+    Energy of each pair. By default, `pair_energ` is called pair by
+    pair, with the particles along the x axis.
+
+    Parameters
+    ----------
+
+    r2 : 1D NumPy array
+        Squared distances of the pairs, all of them below `rcut**2`
+
+    Returns
+    -------
+
+    energ : 1D NumPy array
+        Energies of the pairs
+    """
+    origin = np.zeros(3)
+    return np.array([self.pair_energ(np.array([np.sqrt(d), 0.0, 0.0]), origin)
+                     for d in r2], dtype=np.float64)
+
 lj = ct.CDLL('pexmd/interaction/lj.so')
 ljforces_c = lj.forces
-ljforces_c.argtypes = [ct.c_voidp, ct.c_voidp, ct.c_longlong, ct.c_float,
-                       ct.c_float, ct.c_float, ct.c_voidp]
+ljforces_c.argtypes = [ct.c_voidp, ct.c_voidp, ct.c_voidp, ct.c_longlong,
+                       ct.c_voidp, ct.c_int, ct.c_voidp, ct.c_voidp,
+                       ct.c_voidp, ct.c_int, ct.c_voidp, ct.c_voidp,
+                       ct.c_voidp]
 ljforces_c.restype = ct.c_float
+ljforcesomp_c = lj.forces_omp
+ljforcesomp_c.argtypes = [ct.c_voidp, ct.c_voidp, ct.c_longlong, ct.c_voidp,
+                          ct.c_longlong, ct.c_voidp, ct.c_int, ct.c_voidp,
+                          ct.c_voidp, ct.c_voidp, ct.c_int, ct.c_int,
+                          ct.c_voidp, ct.c_voidp, ct.c_voidp, ct.c_voidp,
+                          ct.c_voidp]
+ljforcesomp_c.restype = ct.c_float
 
 class LennardJones(ShortRange):
   """
   Lennard-Jones potential
   """
-  def __init__(self, rcut, eps, sigma, shift_style='None'):
+  def __init__(self, rcut, eps, sigma, shift_style='None', nthreads=1,
+               mixing=None):
+    """
+    Lennard-Jones potential
+
+    Parameters
+    ----------
+
+    rcut : float or 2D NumPy array
+        The cut radius parameter
+
+    eps, sigma : float or NumPy array
+        Depth of the well and zero-crossing distance of the potential.
+        They can be given per type pair, as symmetric matrices indexed
+        by the type of the particles, or per type, as vectors combined
+        with `mixing`.
+
+    shift_style: {'None', 'Displace', 'Splines'}
+        Shift style when approaching rcut
+
+    nthreads : int
+        Number of OpenMP threads used in the force calculation
+
+    mixing : {None, 'Lorentz-Berthelot', 'Geometric'}
+        Mixing rule to build the per type pair parameters from
+        per type `eps` and `sigma`
+    """
+    if mixing is not None:
+      eps, sigma = self.mix(eps, sigma, mixing)
+    self._params = None
+    self._buffer = np.zeros(0, dtype=np.float32)
+    self._hbuffer = np.zeros(0, dtype=np.int64)
     self.eps = eps
     self.sigma = sigma
+    self.nthreads = nthreads
     super().__init__(rcut, shift_style)
+    self.params()
+
+  @property
+  def eps(self):
+    return self._eps
+
+  @eps.setter
+  def eps(self, value):
+    self._eps = value
+    self._params = None
+
+  @property
+  def sigma(self):
+    return self._sigma
+
+  @sigma.setter
+  def sigma(self, value):
+    self._sigma = value
+    self._params = None
+
+  @property
+  def rcut(self):
+    return self._rcut
+
+  @rcut.setter
+  def rcut(self, value):
+    self._rcut = value
+    self._params = None
 
-  def forces(self, x, v, pairs=None):
+  @property
+  def typed(self):
     """
-    Calculate Lennard-Jones force
+    Whether the parameters are given per type pair.
+    """
+    return self.params().ndim == 3
+
+  def buffers(self, n):
+    """
+    Per-thread force and histogram buffers of the OpenMP kernel, kept
+    between calls and only reallocated when they are too small for `n`
+    particles and `nthreads` threads.
+
+    Returns
+    -------
+
+    buffer, hbuffer : ctypes pointers
+        Addresses of the buffers
+    """
+    size = self.nthreads*4*n
+    if len(self._buffer) < size:
+      self._buffer = np.zeros(size, dtype=np.float32)
+    hsize = 0
+    if self.rdf is not None:
+      hsize = self.nthreads*self.rdf.hist.size
+    if len(self._hbuffer) < hsize:
+      self._hbuffer = np.zeros(hsize, dtype=np.int64)
+    return (self._buffer.ctypes.data_as(ct.c_voidp),
+            self._hbuffer.ctypes.data_as(ct.c_voidp))
+
+  @staticmethod
+  def mix(eps, sigma, mixing):
+    """
+    Per type pair matrices of `eps` and `sigma` from the per type ones.
+    """
+    eps = np.asarray(eps, dtype=np.float64)
+    sigma = np.asarray(sigma, dtype=np.float64)
+    if mixing == 'Lorentz-Berthelot':
+      return np.sqrt(np.outer(eps, eps)), np.add.outer(sigma, sigma)/2
+    elif mixing == 'Geometric':
+      return np.sqrt(np.outer(eps, eps)), np.sqrt(np.outer(sigma, sigma))
+    raise ValueError("Unknown mixing rule {0}".format(mixing))
+
+  def params(self):
+    """
+    Kernel parameters (ljf1, ljf2, lje1, lje2, rcutsq, energcut), in an
+    array with shape (6,) or, per type pair, (ntypes, ntypes, 6). They
+    are built once and kept until `eps`, `sigma` or `rcut` are set.
+    """
+    if self._params is None:
+      self._params = self._build_params()
+    return self._params
+
+  def _build_params(self):
+    eps, sigma, rcut = np.broadcast_arrays(*[np.asarray(p, dtype=np.float64)
+                                             for p in (self.eps, self.sigma,
+                                                       self.rcut)])
+    if eps.ndim not in (0, 2):
+      raise ValueError("Per type pair parameters must be matrices")
+    if any(not np.array_equal(p, p.T) for p in (eps, sigma, rcut)):
+      raise ValueError("Per type pair parameters must be symmetric")
+    rcutsq = rcut**2
+    params = np.empty(eps.shape + (6,), dtype=np.float64)
+    params[..., 0] = 48*eps*sigma**12
+    params[..., 1] = 24*eps*sigma**6
+    params[..., 2] = 4*eps*sigma**12
+    params[..., 3] = 4*eps*sigma**6
+    params[..., 4] = rcutsq
+    params[..., 5] = rcutsq**-3*(params[..., 2]*rcutsq**-3 - params[..., 3])
+    return params.astype(np.float32)
+
+  def forces(self, x, v, pairs=None, box=None, t=None, compute=ENERGY):
+    """
+    Calculate Lennard-Jones force.
+    If `box` is periodic, the minimum image convention is applied
+    inside the kernel, so no ghost particles are needed. With per type
+    pair parameters, the types `t` of the particles are needed and all
+    the pairs are computed in a single sweep. The kernel skips the
+    energy arithmetic unless `compute` asks for ENERGY or PERATOM.
     """
     energ = 0
     forces = np.zeros_like(x, dtype=np.float32)
     if pairs is None:
       pairs = np.array(list(it.combinations(range(len(x)), 2)), dtype=np.int64)
+    pairs = np.ascontiguousarray(pairs, dtype=np.int64)
+    params = self.params()
+    tp = None
+    ntypes = 1
+    if self.typed:
+      if t is None:
+        raise ValueError("Per type pair parameters need the particle types")
+      ntypes = len(params)
+      t = np.ascontiguousarray(t, dtype=np.int32)
+      if len(t) and (t.min() < 0 or t.max() >= ntypes):
+        msg = "Types must be between 0 and {0}"
+        raise ValueError(msg.format(ntypes - 1))
+      tp = t.ctypes.data_as(ct.c_voidp)
     xp = x.ctypes.data_as(ct.c_voidp)
     pairsp = pairs.ctypes.data_as(ct.c_voidp)
     forcesp = forces.ctypes.data_as(ct.c_voidp)
-    energ = ljforces_c(xp, pairsp, len(pairs), self.eps, self.sigma, self.rcut, forcesp)
+    paramsp = params.ctypes.data_as(ct.c_voidp)
+    boxlp, trip = _box_pointers(box)
+    rdfp = None if self.rdf is None else self.rdf.pointer(t)
+    virial, peratom = self._outputs(compute, len(x))
+    if self.nthreads > 1:
+      bufferp, hbufferp = self.buffers(len(x))
+      energ = ljforcesomp_c(xp, tp, len(x), pairsp, len(pairs), paramsp,
+                            ntypes, boxlp, trip, forcesp, self.nthreads,
+                            compute, _pointer(virial), _pointer(peratom),
+                            rdfp, bufferp, hbufferp)
+    else:
+      energ = ljforces_c(xp, tp, pairsp, len(pairs), paramsp, ntypes, boxlp,
+                         trip, forcesp, compute, _pointer(virial),
+                         _pointer(peratom), rdfp)
+    self._store(virial, peratom)
     return forces, energ
 
+  def _check_scalar(self):
+    if self.typed:
+      raise ValueError("Pair functions need scalar parameters; per type "
+                       "pair parameters only work through forces")
+
   def pair_force(self, s1, s2):
+    self._check_scalar()
     d = np.linalg.norm(s1-s2)
     if d > self.rcut:
       return np.zeros_like(s1)
@@ -109,6 +458,7 @@ class LennardJones(ShortRange):
       return ljf
 
   def pair_energ(self, s1, s2):
+    self._check_scalar()
     vcut = 4*self.eps*(self.sigma**12/self.rcut**12 - self.sigma**6/self.rcut**6)
     d = np.linalg.norm(s1-s2)
     if d >= self.rcut:
@@ -118,3 +468,181 @@ class LennardJones(ShortRange):
       return ljf
     elif self.shift_style == 'Displace':
       return ljf - vcut
+
+  def pair_force_batch(self, r2, delr):
+    self._check_scalar()
+    r6inv = (self.sigma**2/r2)**3
+    ljf = 24*self.eps*r6inv*(2*r6inv - 1)/r2
+    return ljf[:, np.newaxis]*delr
+
+  def pair_energ_batch(self, r2):
+    self._check_scalar()
+    r6inv = (self.sigma**2/r2)**3
+    ljf = 4*self.eps*r6inv*(r6inv - 1)
+    if self.shift_style == 'Displace':
+      vcut = 4*self.eps*(self.sigma**12/self.rcut**12 - self.sigma**6/self.rcut**6)
+      ljf = ljf - vcut
+    return ljf
+
+table = ct.CDLL('pexmd/interaction/table.so')
+tableforces_c = table.forces_table
+tableforces_c.argtypes = [ct.c_voidp, ct.c_voidp, ct.c_longlong, ct.c_voidp,
+                          ct.c_longlong, ct.c_float, ct.c_float, ct.c_float,
+                          ct.c_voidp, ct.c_voidp, ct.c_voidp, ct.c_int,
+                          ct.c_voidp, ct.c_voidp]
+tableforces_c.restype = ct.c_float
+
+def _spline(xs, ys):
+  """
+  Second derivatives of the natural cubic spline through (xs, ys).
+  """
+  n = len(xs)
+  m = np.zeros(n)
+  if n < 3:
+    return m
+  h = np.diff(xs)
+  lower = h[:-1]
+  upper = h[1:]
+  diag = 2*(h[:-1] + h[1:])
+  rhs = 6*(np.diff(ys[1:])/h[1:] - np.diff(ys[:-1])/h[:-1])
+  for i in range(1, n-2):
+    w = lower[i]/diag[i-1]
+    diag[i] -= w*upper[i-1]
+    rhs[i] -= w*rhs[i-1]
+  m[n-2] = rhs[-1]/diag[-1]
+  for i in range(n-4, -1, -1):
+    m[i+1] = (rhs[i] - upper[i]*m[i+2])/diag[i]
+  return m
+
+def _spline_coeffs(xs, ys):
+  """
+  Coefficients (a, b, c, d) of each interval of the natural cubic
+  spline through (xs, ys), as y = a + b*t + c*t**2 + d*t**3 with t
+  the fractional position inside the interval.
+  """
+  m = _spline(xs, ys)
+  h = np.diff(xs)
+  a = ys[:-1]
+  b = np.diff(ys) - h**2*(2*m[:-1] + m[1:])/6
+  c = h**2*m[:-1]/2
+  d = h**2*np.diff(m)/6
+  return np.stack([a, b, c, d], axis=1)
+
+def _spline_eval(xs, coeffs, xq):
+  """
+  Evaluate the spline with `coeffs` at the points `xq`.
+  """
+  k = np.clip(np.searchsorted(xs, xq, side='right') - 1, 0, len(xs) - 2)
+  t = (xq - xs[k])/(xs[k+1] - xs[k])
+  a, b, c, d = coeffs[k].T
+  return a + t*(b + t*(c + t*d))
+
+class Tabulated(ShortRange):
+  """
+  Tabulated potential, interpolated with cubic splines on r**2
+  """
+  def __init__(self, rcut, energy, force=None, r=None, rmin=None,
+               ntable=1000, shift_style='None'):
+    """
+    Tabulated potential
+
+    Parameters
+    ----------
+
+    rcut : float
+        The cut radius parameter
+
+    energy : callable or 1D NumPy array
+        The potential V(r), either as a vectorized function of r or as
+        its values at the distances `r`
+
+    force : callable or 1D NumPy array, optional
+        The force F(r) = -dV/dr, in the same way as `energy`. If not
+        given, it is obtained by differentiating the spline of V.
+
+    r : 1D NumPy array, optional
+        Increasing distances at which `energy` and `force` are given
+
+    rmin : float, optional
+        Inner edge of the table. By default, `r[0]` or `rcut/10`.
+        Closer pairs are extrapolated from the first interval.
+
+    ntable : int
+        Number of points in the table
+
+    shift_style: {'None', 'Displace'}
+        Shift style when approaching rcut
+    """
+    super().__init__(rcut, shift_style)
+    if r is None:
+      if not callable(energy) or not (force is None or callable(force)):
+        raise ValueError("r is needed with tabulated arrays")
+    else:
+      r = np.asarray(r, dtype=np.float64)
+    if rmin is None:
+      rmin = r[0] if r is not None else 0.1*rcut
+    self.rmin = rmin
+    self.ntable = ntable
+    r2 = np.linspace(rmin**2, rcut**2, ntable)
+    self.r2min = r2[0]
+    self.dr2 = r2[1] - r2[0]
+
+    if callable(energy):
+      energ = np.asarray(energy(np.sqrt(r2)), dtype=np.float64)
+    else:
+      energ = np.asarray(energy, dtype=np.float64)
+      energ = _spline_eval(r**2, _spline_coeffs(r**2, energ), r2)
+    ecoeffs = _spline_coeffs(r2, energ)
+
+    if force is None:
+      # F(r)/r = -2 dV/d(r**2)
+      last = ecoeffs[-1, 1] + 2*ecoeffs[-1, 2] + 3*ecoeffs[-1, 3]
+      forcer = -2*np.append(ecoeffs[:, 1], last)/self.dr2
+    elif callable(force):
+      forcer = np.asarray(force(np.sqrt(r2)), dtype=np.float64)/np.sqrt(r2)
+    else:
+      force = np.asarray(force, dtype=np.float64)
+      forcer = _spline_eval(r**2, _spline_coeffs(r**2, force), r2)/np.sqrt(r2)
+    fcoeffs = _spline_coeffs(r2, forcer)
+
+    if shift_style == 'Displace':
+      ecoeffs[:, 0] -= energ[-1]
+    self.table = np.ascontiguousarray(np.hstack([fcoeffs, ecoeffs]),
+                                      dtype=np.float32)
+
+  def forces(self, x, v, pairs=None, box=None, t=None, compute=ENERGY):
+    """
+    Calculate tabulated force.
+    If `box` is periodic, the minimum image convention is applied.
+    """
+    forces = np.zeros_like(x, dtype=np.float32)
+    if pairs is None:
+      pairs = np.array(list(it.combinations(range(len(x)), 2)), dtype=np.int64)
+    pairs = np.ascontiguousarray(pairs, dtype=np.int64)
+    xp = x.ctypes.data_as(ct.c_voidp)
+    pairsp = pairs.ctypes.data_as(ct.c_voidp)
+    forcesp = forces.ctypes.data_as(ct.c_voidp)
+    tablep = self.table.ctypes.data_as(ct.c_voidp)
+    boxlp, trip = _box_pointers(box)
+    if self.rdf is not None:
+      self.rdf.accumulate(x, pairs, box, t)
+    virial, peratom = self._outputs(compute, len(x))
+    energ = tableforces_c(xp, pairsp, len(pairs), tablep, self.ntable,
+                          self.r2min, 1.0/self.dr2, self.rcut, boxlp, trip,
+                          forcesp, compute, _pointer(virial),
+                          _pointer(peratom))
+    self._store(virial, peratom)
+    return forces, energ
+
+  def _lookup(self, r2, offset):
+    s = (r2 - self.r2min)/self.dr2
+    k = np.clip(s.astype(np.int64), 0, self.ntable - 2)
+    t = s - k
+    a, b, c, d = self.table[k, offset:offset+4].T
+    return a + t*(b + t*(c + t*d))
+
+  def pair_force_batch(self, r2, delr):
+    return self._lookup(r2, 0)[:, np.newaxis]*delr
+
+  def pair_energ_batch(self, r2):
+    return self._lookup(r2, 4)
@@ -1,38 +1,172 @@
+#include <string.h>
+#include <omp.h>
+#include "box.h"
 #include "lj.h"
 
-float forces(float *x, long int* pairs, long int npairs, float eps,
-             float sigma, float rcut, float *force) {
+/* Each type pair has NPARAM parameters: ljf1, ljf2, lje1, lje2, rcutsq
+   and energcut. Without types (t == NULL) only the first set is used. */
+#define NPARAM 6
+
+static inline float pair_lj(float rsq, float *p, int flags,
+                            float *energlj) {
+  float r2inv = 1.0/rsq;
+  float r6inv = r2inv * r2inv * r2inv;
+  if (flags & (COMPUTE_ENERGY | COMPUTE_PERATOM)) {
+    *energlj = r6inv * (p[2] * r6inv - p[3]) - p[5];
+  }
+  return r2inv * r6inv * (p[0] * r6inv - p[1]);
+}
+
+static inline void tally(int flags, float forcelj, float energlj,
+                         float *delr, long int i, long int j, float *virial,
+                         float *peratom) {
+  /* Virial as xx, yy, zz, xy, xz, yz; per-atom energy split in halves */
+  if (flags & COMPUTE_VIRIAL) {
+    virial[0] += forcelj * delr[0] * delr[0];
+    virial[1] += forcelj * delr[1] * delr[1];
+    virial[2] += forcelj * delr[2] * delr[2];
+    virial[3] += forcelj * delr[0] * delr[1];
+    virial[4] += forcelj * delr[0] * delr[2];
+    virial[5] += forcelj * delr[1] * delr[2];
+  }
+  if (flags & COMPUTE_PERATOM) {
+    peratom[i] += 0.5 * energlj;
+    peratom[j] += 0.5 * energlj;
+  }
+}
+
+static inline float *pair_params(float *params, int *t, int ntypes,
+                                 long int i, long int j) {
+  if (t) return params + NPARAM * (t[i] * ntypes + t[j]);
+  return params;
+}
+
+static inline void rdf_count(struct rdf *rdf, long int *hist, float rsq,
+                             long int i, long int j) {
+  int bin = (int) (rsq * rdf->binv);
+  if (bin < rdf->nbins) {
+    long int row = rdf->t ? rdf->t[i] * rdf->ntypes + rdf->t[j] : 0;
+    hist[row * rdf->nbins + bin]++;
+  }
+}
+
+float forces(float *x, int *t, long int* pairs, long int npairs,
+             float *params, int ntypes, float *boxl, float *tri,
+             float *force, int flags, float *virial, float *peratom,
+             struct rdf *rdf) {
   float energ = 0.0;
-  float ljf1 = 48 * eps * pow(sigma, 12);
-  float ljf2 = 24 * eps * pow(sigma, 6);
-  float lje1 = 4 * eps * pow(sigma, 12);
-  float lje2 = 4 * eps * pow(sigma, 6);
-  float rcutsq = rcut * rcut;
-  float energcut = pow(rcutsq, -3) * (lje1 * pow(rcutsq, -3) - lje2);
-  for (int ii = 0; ii < npairs; ii++) {
+  for (long int ii = 0; ii < npairs; ii++) {
     float delr[3];
     long int i = pairs[2*ii];
     long int j = pairs[2*ii + 1];
+    float *p = pair_params(params, t, ntypes, i, j);
 
     for (int k = 0; k < 3; k++) {
       delr[k] = x[3*i + k] - x[3*j + k];
     }
+    minimum_image(delr, boxl, tri);
 
     float rsq = 0.0;
     for (int k = 0; k < 3; k++) {
       rsq += delr[k] * delr[k];
     }
-    if (rsq < rcutsq) {
-      float r2inv = 1.0/rsq;
-      float r6inv = r2inv * r2inv * r2inv;
-      float forcelj = r2inv * r6inv * (ljf1 * r6inv - ljf2);
-      float energlj = r6inv * (lje1 * r6inv - lje2) - energcut;
+    if (rdf) rdf_count(rdf, rdf->hist, rsq, i, j);
+    if (rsq < p[4]) {
+      float energlj = 0.0;
+      float forcelj = pair_lj(rsq, p, flags, &energlj);
       for (int k = 0; k < 3; k++) {
         force[3*i + k] += forcelj * delr[k];
         force[3*j + k] -= forcelj * delr[k];
       }
       energ += energlj;
+      tally(flags, forcelj, energlj, delr, i, j, virial, peratom);
+    }
+  }
+  if (rdf) rdf->nsamples++;
+  return (flags & COMPUTE_ENERGY) ? energ : 0.0;
+}
+
+float forces_omp(float *x, int *t, long int npart, long int* pairs,
+                 long int npairs, float *params, int ntypes, float *boxl,
+                 float *tri, float *force, int nthreads, int flags,
+                 float *virial, float *peratom, struct rdf *rdf,
+                 float *buffer, long int *hbuffer) {
+  /* One force buffer (followed by the per-atom energies) and histogram
+     per thread, summed at the end, to avoid races. The caller keeps
+     them between calls: buffer holds nthreads * 4 * npart floats and,
+     with rdf, hbuffer nthreads * ntypes^2 * nbins counts. Each thread
+     clears its own. */
+  float energ = 0.0;
+  long int size = 3 * npart;
+  long int stride = (flags & COMPUTE_PERATOM) ? 4 * npart : size;
+  long int hsize = 0;
+  if (rdf) hsize = (long int) rdf->ntypes * rdf->ntypes * rdf->nbins;
+#pragma omp parallel num_threads(nthreads) reduction(+:energ)
+  {
+    float *fth = buffer + omp_get_thread_num() * stride;
+    float vth[6] = {0.0, 0.0, 0.0, 0.0, 0.0, 0.0};
+    long int *hth = rdf ? hbuffer + omp_get_thread_num() * hsize : NULL;
+    memset(fth, 0, stride * sizeof(float));
+    if (rdf) memset(hth, 0, hsize * sizeof(long int));
+#pragma omp for schedule(static)
+    for (long int ii = 0; ii < npairs; ii++) {
+      float delr[3];
+      long int i = pairs[2*ii];
+      long int j = pairs[2*ii + 1];
+      float *p = pair_params(params, t, ntypes, i, j);
+
+      for (int k = 0; k < 3; k++) {
+        delr[k] = x[3*i + k] - x[3*j + k];
+      }
+      minimum_image(delr, boxl, tri);
+
+      float rsq = 0.0;
+      for (int k = 0; k < 3; k++) {
+        rsq += delr[k] * delr[k];
+      }
+      if (rdf) rdf_count(rdf, hth, rsq, i, j);
+      if (rsq < p[4]) {
+        float energlj = 0.0;
+        float forcelj = pair_lj(rsq, p, flags, &energlj);
+        for (int k = 0; k < 3; k++) {
+          fth[3*i + k] += forcelj * delr[k];
+          fth[3*j + k] -= forcelj * delr[k];
+        }
+        energ += energlj;
+        tally(flags, forcelj, energlj, delr, i, j, vth, fth + size);
+      }
+    }
+    if (flags & COMPUTE_VIRIAL) {
+      for (int k = 0; k < 6; k++) {
+#pragma omp atomic
+        virial[k] += vth[k];
+      }
+    }
+#pragma omp for schedule(static)
+    for (long int m = 0; m < size; m++) {
+      float fsum = 0.0;
+      for (int th = 0; th < nthreads; th++) {
+        fsum += buffer[th * stride + m];
+      }
+      force[m] += fsum;
+    }
+    if (flags & COMPUTE_PERATOM) {
+#pragma omp for schedule(static)
+      for (long int m = 0; m < npart; m++) {
+        for (int th = 0; th < nthreads; th++) {
+          peratom[m] += buffer[th * stride + size + m];
+        }
+      }
+    }
+    if (rdf) {
+#pragma omp for schedule(static)
+      for (long int m = 0; m < hsize; m++) {
+        for (int th = 0; th < nthreads; th++) {
+          rdf->hist[m] += hbuffer[th * hsize + m];
+        }
+      }
     }
   }
-  return energ;
+  if (rdf) rdf->nsamples++;
+  return (flags & COMPUTE_ENERGY) ? energ : 0.0;
 }
@@ -2,8 +2,33 @@
 #define LJ_H
 
 #include "math.h"
-float pair_force(float rsq, float ljf1, float ljf2);
-float pair_energ(float r2inv, float r6inv, float lje1, float lje2);
-float forces(float *x, long int* pairs, long int npairs, float eps,
-             float sigma, float rcutsq, float *force);
+
+/* What the kernels compute besides the forces. Energy and virial are
+   added to the outputs, the virial as xx, yy, zz, xy, xz, yz. */
+#define COMPUTE_FORCES 0
+#define COMPUTE_ENERGY 1
+#define COMPUTE_VIRIAL 2
+#define COMPUTE_PERATOM 4
+
+/* Running histogram of r^2 for the radial distribution function. A pair
+   with r^2 < nbins / binv falls in bin (int) (r^2 * binv) of the row
+   t[i] * ntypes + t[j] of hist, or of the only row if t is NULL. */
+struct rdf {
+  long int *hist;
+  int nbins;
+  float binv;
+  int *t;
+  int ntypes;
+  long int nsamples;
+};
+
+float forces(float *x, int *t, long int* pairs, long int npairs,
+             float *params, int ntypes, float *boxl, float *tri,
+             float *force, int flags, float *virial, float *peratom,
+             struct rdf *rdf);
+float forces_omp(float *x, int *t, long int npart, long int* pairs,
+                 long int npairs, float *params, int ntypes, float *boxl,
+                 float *tri, float *force, int nthreads, int flags,
+                 float *virial, float *peratom, struct rdf *rdf,
+                 float *buffer, long int *hbuffer);
 #endif
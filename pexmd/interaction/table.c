@@ -0,0 +1,58 @@
+#include "box.h"
+#include "table.h"
+
+float forces_table(float *x, long int* pairs, long int npairs, float *table,
+                   long int ntable, float r2min, float dr2inv, float rcut,
+                   float *boxl, float *tri, float *force, int flags,
+                   float *virial, float *peratom) {
+  /* table holds, for each of the ntable - 1 intervals in r^2, the cubic
+     coefficients of F(r)/r followed by the ones of V(r). The energy,
+     virial (xx, yy, zz, xy, xz, yz) and per-atom energy are only added
+     up when asked for in flags. */
+  float energ = 0.0;
+  float rcutsq = rcut * rcut;
+  for (long int ii = 0; ii < npairs; ii++) {
+    float delr[3];
+    long int i = pairs[2*ii];
+    long int j = pairs[2*ii + 1];
+
+    for (int k = 0; k < 3; k++) {
+      delr[k] = x[3*i + k] - x[3*j + k];
+    }
+    minimum_image(delr, boxl, tri);
+
+    float rsq = 0.0;
+    for (int k = 0; k < 3; k++) {
+      rsq += delr[k] * delr[k];
+    }
+    if (rsq < rcutsq) {
+      float s = (rsq - r2min) * dr2inv;
+      long int m = (s > 0) ? (long int) s : 0;
+      if (m > ntable - 2) m = ntable - 2;
+      float t = s - m;
+      float *c = table + 8*m;
+      float forcer = c[0] + t * (c[1] + t * (c[2] + t * c[3]));
+      for (int k = 0; k < 3; k++) {
+        force[3*i + k] += forcer * delr[k];
+        force[3*j + k] -= forcer * delr[k];
+      }
+      if (flags & (COMPUTE_ENERGY | COMPUTE_PERATOM)) {
+        float energr = c[4] + t * (c[5] + t * (c[6] + t * c[7]));
+        energ += energr;
+        if (flags & COMPUTE_PERATOM) {
+          peratom[i] += 0.5 * energr;
+          peratom[j] += 0.5 * energr;
+        }
+      }
+      if (flags & COMPUTE_VIRIAL) {
+        virial[0] += forcer * delr[0] * delr[0];
+        virial[1] += forcer * delr[1] * delr[1];
+        virial[2] += forcer * delr[2] * delr[2];
+        virial[3] += forcer * delr[0] * delr[1];
+        virial[4] += forcer * delr[0] * delr[2];
+        virial[5] += forcer * delr[1] * delr[2];
+      }
+    }
+  }
+  return (flags & COMPUTE_ENERGY) ? energ : 0.0;
+}
@@ -0,0 +1,16 @@
+#ifndef TABLE_H
+#define TABLE_H
+
+#include "math.h"
+
+/* What the kernel computes besides the forces, as in lj.h */
+#define COMPUTE_FORCES 0
+#define COMPUTE_ENERGY 1
+#define COMPUTE_VIRIAL 2
+#define COMPUTE_PERATOM 4
+
+float forces_table(float *x, long int* pairs, long int npairs, float *table,
+                   long int ntable, float r2min, float dr2inv, float rcut,
+                   float *boxl, float *tri, float *force, int flags,
+                   float *virial, float *peratom);
+#endif
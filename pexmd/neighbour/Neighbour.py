@@ -7,6 +7,14 @@ Main Interaction module.
 
 import numpy as np
 import itertools as it
+import ctypes as ct
+
+cell = ct.CDLL('pexmd/neighbour/cell.so')
+cellpairs_c = cell.cell_pairs
+cellpairs_c.argtypes = [ct.c_voidp, ct.c_longlong, ct.c_voidp, ct.c_voidp,
+                        ct.c_int, ct.c_voidp, ct.c_float, ct.c_voidp,
+                        ct.c_longlong]
+cellpairs_c.restype = ct.c_longlong
 
 class Neighbour(object):
   """
@@ -16,6 +24,18 @@ class Neighbour(object):
     self.types = types
 
 
+  def remap(self, order):
+    """
+    Follow a reordering of the particles. Only lists that are kept
+    between steps need to do anything.
+
+    Parameters
+    ----------
+
+    order : 1D NumPy array
+        The permutation applied to the particles
+    """
+
   def build_list(self, x, t):
     """
     Build list of neighbours.
@@ -31,3 +51,147 @@ class Neighbour(object):
     else:
       i2 = np.arange(len(t))[t == t2]
       return np.array(list(it.product(i1, i2)), dtype=np.int64)
+
+
+class LinkedCell(Neighbour):
+  """
+  Linked-cell Neighbour class.
+  Only the pairs closer than the cut radius are listed.
+  """
+  def __init__(self, box, rcut, types=None):
+    """
+    Parameters
+    ----------
+
+    box : Box
+        The simulation box, used to bin the particles in cells of side
+        at least `rcut` and, if periodic, to take the minimum image
+
+    rcut : float
+        The cut radius
+
+    types : list of two integers, optional
+        Types of the particles to pair. By default, all of them.
+    """
+    self.box = box
+    self.rcut = rcut
+    self._buffer = np.zeros((0, 2), dtype=np.int64)
+    super().__init__(types)
+
+  def build_list(self, x, t):
+    """
+    Build list of neighbours within the cut radius, in O(N).
+    """
+    return self._pairs(x, t, self.rcut)
+
+  def _pairs(self, x, t, rcut):
+    """
+    Pairs of the chosen types closer than `rcut`.
+    """
+    if self.types == None:
+      sel = None
+    else:
+      sel = np.flatnonzero(np.isin(t, self.types))
+      x = x[sel]
+    pairs = self._cell_pairs(x, rcut)
+    if sel is None:
+      return pairs
+    pairs = sel[pairs]
+    t1, t2 = self.types
+    if t1 == t2:
+      return pairs
+    ti = t[pairs[:, 0]]
+    tj = t[pairs[:, 1]]
+    pairs = pairs[ti != tj]
+    flip = t[pairs[:, 0]] != t1
+    pairs[flip] = pairs[flip, ::-1]
+    return pairs
+
+  def _cell_pairs(self, x, rcut):
+    """
+    Call the cell list kernel, growing the buffer when it overflows.
+    """
+    x = np.ascontiguousarray(x, dtype=np.float32)
+    xp = x.ctypes.data_as(ct.c_voidp)
+    x0p = self.box.x0.ctypes.data_as(ct.c_voidp)
+    xfp = self.box.xf.ctypes.data_as(ct.c_voidp)
+    periodic = int(self.box.t == 'Periodic')
+    cell = self.box.cell
+    cellp = None if cell is None else cell.ctypes.data_as(ct.c_voidp)
+    while True:
+      pairsp = self._buffer.ctypes.data_as(ct.c_voidp)
+      npairs = cellpairs_c(xp, len(x), x0p, xfp, periodic, cellp, rcut,
+                           pairsp, len(self._buffer))
+      if npairs < 0:
+        raise MemoryError("Not enough memory for the cell list")
+      if npairs <= len(self._buffer):
+        return self._buffer[:npairs].copy()
+      self._buffer = np.zeros((npairs + npairs//4, 2), dtype=np.int64)
+
+
+class VerletList(LinkedCell):
+  """
+  Verlet Neighbour class.
+  The list is built with `rcut + skin` and kept until some particle
+  has moved more than half the skin since the last build.
+  """
+  def __init__(self, box, rcut, skin, types=None):
+    """
+    Parameters
+    ----------
+
+    box : Box
+        The simulation box
+
+    rcut : float
+        The cut radius
+
+    skin : float
+        Extra distance added to the cut radius when building the list
+
+    types : list of two integers, optional
+        Types of the particles to pair. By default, all of them.
+    """
+    self.skin = skin
+    self.nbuilds = 0
+    self.pairs = None
+    self._xref = None
+    self._delr = None
+    super().__init__(box, rcut, types)
+
+  def build_list(self, x, t):
+    """
+    Return the cached list of neighbours, rebuilding it only when
+    needed. Between rebuilds the very same array is returned.
+    """
+    if self.needs_rebuild(x):
+      self.pairs = self._pairs(x, t, self.rcut + self.skin)
+      self._xref = np.array(x, dtype=np.float32)
+      self._delr = np.empty_like(self._xref)
+      self.nbuilds += 1
+    return self.pairs
+
+  def needs_rebuild(self, x):
+    """
+    Whether the largest displacement since the last build is larger
+    than half the skin.
+    """
+    if self.pairs is None or len(x) != len(self._xref):
+      return True
+    delr = self._delr
+    np.subtract(x, self._xref, out=delr)
+    self.box.minimum_image(delr)
+    rsq = np.einsum('ij,ij->i', delr, delr)
+    return len(rsq) > 0 and rsq.max() > 0.25*self.skin**2
+
+  def remap(self, order):
+    """
+    Follow a reordering of the particles, renumbering the cached pairs
+    and reference positions instead of rebuilding the list.
+    """
+    if self.pairs is None:
+      return
+    inverse = np.empty_like(order)
+    inverse[order] = np.arange(len(order))
+    self.pairs[...] = inverse[self.pairs]
+    self._xref[...] = self._xref[order]
@@ -0,0 +1,141 @@
+#include <stdlib.h>
+#include <math.h>
+#include "box.h"
+#include "cell.h"
+
+/* Fewest cells allowed to be kept however few particles there are */
+#define MINCELLS 27
+
+long int cell_pairs(float *x, long int npart, float *x0, float *xf,
+                    int periodic, float *tri, float rcut, long int *pairs,
+                    long int maxpairs) {
+  /* Cells are binned along the fractional coordinates of the box, so
+     that their perpendicular width is at least rcut. There are at
+     most about one per particle, wider if needed, so that sparse
+     systems in large boxes do not take huge grids. For triclinic
+     boxes, tri holds h and h^-1, row-major. Returns -1 when out of
+     memory. */
+  int ncell[3];
+  float l[3], cellinv[3];
+  for (int k = 0; k < 3; k++) {
+    l[k] = xf[k] - x0[k];
+    float width = l[k];
+    if (tri) {
+      float *row = tri + 9 + 3*k;
+      width = 1.0 / sqrtf(row[0]*row[0] + row[1]*row[1] + row[2]*row[2]);
+    }
+    float n = floorf(width / rcut);
+    ncell[k] = (n < 1.0f) ? 1 : (n > 1e6f) ? 1000000 : (int) n;
+  }
+  long int maxcells = (npart > MINCELLS) ? npart : MINCELLS;
+  long int ntot = (long int) ncell[0] * ncell[1] * ncell[2];
+  while (ntot > maxcells) {
+    int k = 0;
+    if (ncell[1] > ncell[k]) k = 1;
+    if (ncell[2] > ncell[k]) k = 2;
+    ncell[k] = (ncell[k] + 1) / 2;
+    ntot = (long int) ncell[0] * ncell[1] * ncell[2];
+  }
+  for (int k = 0; k < 3; k++) cellinv[k] = ncell[k] / l[k];
+  float *boxl = periodic ? l : NULL;
+  long int *head = malloc(ntot * sizeof(long int));
+  long int *next = malloc((npart > 0 ? npart : 1) * sizeof(long int));
+  if (!head || !next) {
+    free(head);
+    free(next);
+    return -1;
+  }
+  for (long int c = 0; c < ntot; c++) head[c] = -1;
+
+  for (long int i = 0; i < npart; i++) {
+    int c[3];
+    float d[3], u[3];
+    for (int k = 0; k < 3; k++) {
+      d[k] = x[3*i + k] - x0[k];
+    }
+    for (int k = 0; k < 3; k++) {
+      if (tri) {
+        u[k] = ncell[k] * (tri[9 + 3*k] * d[0] + tri[9 + 3*k + 1] * d[1] +
+                           tri[9 + 3*k + 2] * d[2]);
+      }
+      else {
+        u[k] = d[k] * cellinv[k];
+      }
+    }
+    for (int k = 0; k < 3; k++) {
+      c[k] = (int) floorf(u[k]);
+      if (periodic) {
+        c[k] %= ncell[k];
+        if (c[k] < 0) c[k] += ncell[k];
+      }
+      else {
+        if (c[k] < 0) c[k] = 0;
+        if (c[k] >= ncell[k]) c[k] = ncell[k] - 1;
+      }
+    }
+    long int idx = ((long int) c[0] * ncell[1] + c[1]) * ncell[2] + c[2];
+    next[i] = head[idx];
+    head[idx] = i;
+  }
+
+  float rcutsq = rcut * rcut;
+  long int npairs = 0;
+  int c[3];
+  for (c[0] = 0; c[0] < ncell[0]; c[0]++) {
+    for (c[1] = 0; c[1] < ncell[1]; c[1]++) {
+      for (c[2] = 0; c[2] < ncell[2]; c[2]++) {
+        /* Neighbouring cells along each direction, without repetitions
+           (with less than three cells, periodic images coincide) */
+        int nb[3][3], nnb[3];
+        for (int k = 0; k < 3; k++) {
+          nnb[k] = 0;
+          for (int d = -1; d <= 1; d++) {
+            int cc = c[k] + d;
+            if (periodic) {
+              cc = (cc + ncell[k]) % ncell[k];
+            }
+            else if (cc < 0 || cc >= ncell[k]) {
+              continue;
+            }
+            int seen = 0;
+            for (int m = 0; m < nnb[k]; m++) seen |= (nb[k][m] == cc);
+            if (!seen) nb[k][nnb[k]++] = cc;
+          }
+        }
+        long int idx = ((long int) c[0] * ncell[1] + c[1]) * ncell[2] + c[2];
+        for (int a = 0; a < nnb[0]; a++) {
+          for (int b = 0; b < nnb[1]; b++) {
+            for (int e = 0; e < nnb[2]; e++) {
+              long int nidx = ((long int) nb[0][a] * ncell[1] + nb[1][b])
+                * ncell[2] + nb[2][e];
+              for (long int i = head[idx]; i != -1; i = next[i]) {
+                for (long int j = head[nidx]; j != -1; j = next[j]) {
+                  if (j <= i) continue;
+                  float delr[3];
+                  for (int k = 0; k < 3; k++) {
+                    delr[k] = x[3*i + k] - x[3*j + k];
+                  }
+                  minimum_image(delr, boxl, tri);
+                  float rsq = 0.0;
+                  for (int k = 0; k < 3; k++) {
+                    rsq += delr[k] * delr[k];
+                  }
+                  if (rsq < rcutsq) {
+                    if (npairs < maxpairs) {
+                      pairs[2*npairs] = i;
+                      pairs[2*npairs + 1] = j;
+                    }
+                    npairs++;
+                  }
+                }
+              }
+            }
+          }
+        }
+      }
+    }
+  }
+  free(head);
+  free(next);
+  return npairs;
+}
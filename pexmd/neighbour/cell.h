@@ -0,0 +1,6 @@
+#ifndef CELL_H
+#define CELL_H
+long int cell_pairs(float *x, long int npart, float *x0, float *xf,
+                    int periodic, float *tri, float rcut, long int *pairs,
+                    long int maxpairs);
+#endif
@@ -0,0 +1,414 @@
+"""
+Main Decomposition module.
+"""
+
+import multiprocessing as mp
+from multiprocessing import shared_memory
+import threading
+import numpy as np
+
+from pexmd.integrator import VelVerlet
+from pexmd.neighbour import LinkedCell
+from pexmd.particles.Particles import _open_shared
+
+# Per-particle arrays kept in shared memory: name, dtype and columns
+FIELDS = [('x', np.float32, 3), ('v', np.float32, 3), ('f', np.float32, 3),
+          ('xref', np.float32, 3), ('img', np.int32, 3), ('t', np.int32, 1),
+          ('mass', np.float32, 1), ('owner', np.int32, 1),
+          ('members', np.int64, 1)]
+
+class DomainDecomposition(object):
+  """
+  Domain decomposition class.
+
+  The box is split in a grid of subdomains, each one driven by a worker
+  process. The particles live in shared memory: each worker moves the
+  ones it owns, reads the positions of the halo particles it needs
+  straight from the other subdomains, and takes ownership of the ones
+  that enter its region when the neighbour lists are rebuilt.
+  """
+  def __init__(self, particles, box, integrator, interaction, grid=(2, 1, 1),
+               skin=0.3):
+    """
+    Parameters
+    ----------
+
+    particles : Particles
+        The particles of the system
+
+    box : Box
+        The simulation box. It must be orthorhombic.
+
+    integrator : VelVerlet
+        The integrator of the equations of motion
+
+    interaction : Interaction
+        The short-range interaction between the particles
+
+    grid : tuple of three integers
+        Number of subdomains along each direction, one worker each
+
+    skin : float
+        Extra distance added to the cut radius for the halos and the
+        neighbour lists, which are rebuilt when some particle moves
+        more than half of it
+    """
+    if box.triclinic:
+      raise ValueError("Domain decomposition needs an orthorhombic box")
+    if type(integrator) is not VelVerlet:
+      raise ValueError("Domain decomposition only supports VelVerlet")
+    self.particles = particles
+    self.box = box
+    self.integrator = integrator
+    self.interaction = interaction
+    self.grid = tuple(int(g) for g in grid)
+    self.nworkers = int(np.prod(self.grid))
+    self.skin = skin
+    self.rcut = interaction.rcut + skin
+    self.energ = 0.0
+
+    self.n = particles.n
+    sizes = [self.n*cols*np.dtype(dtype).itemsize
+             for _, dtype, cols in FIELDS]
+    extra = 8*(3*self.nworkers + 1)
+    self._shm = shared_memory.SharedMemory(create=True,
+                                           size=sum(sizes) + extra)
+    self._map()
+    self.scatter()
+
+    # The workers come from a fork server: forked from this process,
+    # they would inherit its OpenMP runtime, which deadlocks if it
+    # already ran a parallel region
+    ctx = mp.get_context('forkserver')
+    ctx.set_forkserver_preload(['pexmd'])
+    self._start = ctx.Barrier(self.nworkers + 1)
+    self._done = ctx.Barrier(self.nworkers + 1)
+    self._step = ctx.Barrier(self.nworkers)
+    self._closing = False
+    self.workers = [ctx.Process(target=self._work, args=(rank,), daemon=True)
+                    for rank in range(self.nworkers)]
+    for w in self.workers:
+      w.start()
+    self._watcher = threading.Thread(target=self._watch, daemon=True)
+    self._watcher.start()
+
+  def __getstate__(self):
+    """
+    What the workers get: everything but the particles, the processes
+    and the views of the shared memory, which they map again.
+    """
+    state = self.__dict__.copy()
+    for key in ('particles', 'workers', '_watcher', '_shm', 'arrays',
+                'energies', 'flags', 'counts', 'ctrl'):
+      state.pop(key, None)
+    state['_shm_name'] = self._shm.name
+    return state
+
+  def __setstate__(self, state):
+    name = state.pop('_shm_name')
+    self.__dict__.update(state)
+    self.particles = None
+    self.workers = []
+    self._shm = _open_shared(name)
+    self._map()
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *args):
+    self.close()
+
+  def _map(self):
+    """
+    Lay the arrays over the shared memory block.
+    """
+    n = self.n
+    buf = self._shm.buf
+    self.arrays = {}
+    offset = 0
+    for name, dtype, cols in FIELDS:
+      shape = (n, cols) if cols > 1 else (n,)
+      self.arrays[name] = np.ndarray(shape, dtype=dtype, buffer=buf,
+                                     offset=offset)
+      offset += n*cols*np.dtype(dtype).itemsize
+    self.energies = np.ndarray(self.nworkers, dtype=np.float64, buffer=buf,
+                               offset=offset)
+    self.flags = np.ndarray(self.nworkers, dtype=np.int64, buffer=buf,
+                            offset=offset + 8*self.nworkers)
+    self.counts = np.ndarray(self.nworkers, dtype=np.int64, buffer=buf,
+                             offset=offset + 16*self.nworkers)
+    self.ctrl = np.ndarray(1, dtype=np.int64, buffer=buf,
+                           offset=offset + 24*self.nworkers)
+
+  def scatter(self):
+    """
+    Copy the particles into shared memory and assign their owners.
+    """
+    part = self.particles
+    a = self.arrays
+    a['x'][...] = part.x
+    a['v'][...] = part.v
+    a['f'][...] = part.f
+    a['img'][...] = part.img
+    a['t'][...] = part.t
+    a['mass'][...] = part.mass
+    a['owner'][...] = self.domain_of(a['x'])
+    a['members'][...] = np.argsort(a['owner'], kind='stable')
+    self.counts[...] = np.bincount(a['owner'], minlength=self.nworkers)
+
+  def gather(self):
+    """
+    Copy the state in shared memory back into the particles.
+    """
+    part = self.particles
+    part.x = self.arrays['x']
+    part.v = self.arrays['v']
+    part.f = self.arrays['f']
+    part.img = self.arrays['img']
+
+  def domain_of(self, x):
+    """
+    Rank of the subdomain holding each position.
+    """
+    l = self.box.xf - self.box.x0
+    c = np.floor((x - self.box.x0)/l*self.grid).astype(np.int64)
+    c = np.clip(c, 0, np.array(self.grid) - 1)
+    return np.ravel_multi_index(c.T, self.grid).astype(np.int32)
+
+  def bounds(self, rank):
+    """
+    Lower and upper corners of the region of a subdomain.
+    """
+    c = np.array(np.unravel_index(rank, self.grid))
+    l = self.box.xf - self.box.x0
+    return (self.box.x0 + l*c/self.grid,
+            self.box.x0 + l*(c + 1)/self.grid)
+
+  def neighbours(self, rank):
+    """
+    Ranks of the other subdomains closer than the cut radius, plus the
+    skin, to the region of a subdomain.
+    """
+    c = np.unravel_index(rank, self.grid)
+    width = (self.box.xf - self.box.x0)/self.grid
+    axes = []
+    for d in range(3):
+      k = int(np.ceil(self.rcut/width[d]))
+      idx = np.arange(c[d] - k, c[d] + k + 1)
+      if self.box.t == 'Periodic':
+        idx = np.unique(np.mod(idx, self.grid[d]))
+      else:
+        idx = idx[(idx >= 0) & (idx < self.grid[d])]
+      axes.append(idx)
+    mesh = np.meshgrid(*axes, indexing='ij')
+    ranks = np.ravel_multi_index([m.ravel() for m in mesh], self.grid)
+    return ranks[ranks != rank]
+
+  def members(self, ranks):
+    """
+    Indices of the particles owned by the given subdomains at the last
+    rebuild.
+    """
+    start = np.concatenate([[0], np.cumsum(self.counts)])
+    return np.concatenate([self.arrays['members'][start[r]:start[r + 1]]
+                           for r in ranks] + [np.zeros(0, dtype=np.int64)])
+
+  def run(self, nsteps):
+    """
+    Run `nsteps` steps in the workers.
+
+    Returns
+    -------
+
+    energ : float
+        The potential energy, reduced over all the subdomains
+    """
+    self.ctrl[0] = nsteps
+    try:
+      self._start.wait()
+      self._done.wait()
+    except threading.BrokenBarrierError:
+      raise RuntimeError("A domain decomposition worker failed")
+    self.energ = float(self.energies.sum())
+    self.gather()
+    return self.energ
+
+  def close(self):
+    """
+    Stop the workers and release the shared memory.
+    """
+    if not self.workers:
+      return
+    self._closing = True
+    try:
+      self.ctrl[0] = -1
+      try:
+        self._start.wait(timeout=10.0)
+      except threading.BrokenBarrierError:
+        pass
+      for w in self.workers:
+        w.join(timeout=10.0)
+        if w.is_alive():
+          w.terminate()
+          w.join()
+    finally:
+      self.workers = []
+      self.arrays = {}
+      self.energies = self.flags = self.counts = self.ctrl = None
+      self._shm.close()
+      self._shm.unlink()
+
+  def _watch(self):
+    """
+    Break the barriers if a worker dies, so nobody waits for it forever.
+    """
+    workers = list(self.workers)
+    while not self._closing:
+      if any(w.exitcode is not None for w in workers):
+        if not self._closing:
+          for barrier in (self._start, self._done, self._step):
+            barrier.abort()
+        return
+      threading.Event().wait(0.05)
+
+  def _work(self, rank):
+    """
+    Main loop of a worker.
+    """
+    sub = Subdomain(self, rank)
+    try:
+      while True:
+        self._start.wait()
+        nsteps = int(self.ctrl[0])
+        if nsteps < 0:
+          break
+        sub.migrate()
+        self._step.wait()
+        sub.rebuild()
+        sub.forces()
+        self._step.wait()
+        for _ in range(nsteps):
+          sub.first_step()
+          self._step.wait()
+          self.flags[rank] = sub.moved_too_far()
+          self._step.wait()
+          if self.flags.any():
+            sub.migrate()
+            self._step.wait()
+            sub.rebuild()
+          sub.forces()
+          sub.last_step()
+          self._step.wait()
+        self._done.wait()
+    except Exception:
+      for barrier in (self._start, self._done, self._step):
+        barrier.abort()
+      raise
+
+class Subdomain(object):
+  """
+  Subdomain class. The part of the work done by each worker.
+  """
+  def __init__(self, dd, rank):
+    self.dd = dd
+    self.rank = rank
+    self.lo, self.hi = dd.bounds(rank)
+    self.neighbour = LinkedCell(dd.box, dd.rcut)
+    self.near = dd.neighbours(rank)
+    self.own = np.zeros(0, dtype=np.int64)
+    self.local = np.zeros(0, dtype=np.int64)
+    self.pairs_own = np.zeros((0, 2), dtype=np.int64)
+    self.pairs_halo = np.zeros((0, 2), dtype=np.int64)
+
+  def migrate(self):
+    """
+    Hand over the particles that left the region of the subdomain.
+    """
+    a = self.dd.arrays
+    if len(self.own):
+      a['owner'][self.own] = self.dd.domain_of(a['x'][self.own])
+
+  def halo(self):
+    """
+    Particles of the neighbouring subdomains closer than the cut radius,
+    plus the skin, to the region of this one, in each direction.
+    """
+    box = self.dd.box
+    cand = self.dd.members(self.near)
+    x = self.dd.arrays['x'][cand]
+    width = self.hi - self.lo
+    u = x - self.lo
+    if box.t == 'Periodic':
+      l = box.xf - box.x0
+      u = np.mod(u, l)
+      dist = np.where(u <= width, 0.0, np.minimum(u - width, l - u))
+    else:
+      dist = np.maximum(np.maximum(-u, u - width), 0.0)
+    return cand[np.all(dist < self.dd.rcut, axis=1)]
+
+  def rebuild(self):
+    """
+    Take ownership of the particles in the region, publish them, find the
+    halo and build the pairs with at least one owned particle.
+
+    Between rebuilds particles move less than half the skin, so the new
+    owned ones were all owned by this subdomain or its neighbours.
+    """
+    dd = self.dd
+    a = dd.arrays
+    cand = dd.members(np.append(self.near, self.rank))
+    self.own = np.sort(cand[a['owner'][cand] == self.rank])
+    dd._step.wait()
+    dd.counts[self.rank] = len(self.own)
+    dd._step.wait()
+    start = int(dd.counts[:self.rank].sum())
+    a['members'][start:start + len(self.own)] = self.own
+    dd._step.wait()
+    self.local = np.concatenate([self.own, self.halo()])
+    pairs = self.neighbour.build_list(a['x'][self.local], a['t'][self.local])
+    owned = pairs < len(self.own)
+    self.pairs_own = pairs[owned[:, 0] & owned[:, 1]]
+    self.pairs_halo = pairs[owned[:, 0] ^ owned[:, 1]]
+    a['xref'][self.own] = a['x'][self.own]
+
+  def moved_too_far(self):
+    a = self.dd.arrays
+    delr = a['x'][self.own] - a['xref'][self.own]
+    self.dd.box.minimum_image(delr)
+    rsq = np.einsum('ij,ij->i', delr, delr)
+    return int(len(rsq) > 0 and rsq.max() > 0.25*self.dd.skin**2)
+
+  def forces(self):
+    """
+    Forces on the owned particles. Pairs with a halo particle are
+    shared with another subdomain, so only half of their energy counts.
+    """
+    a = self.dd.arrays
+    inter = self.dd.interaction
+    x = a['x'][self.local]
+    v = a['v'][self.local]
+    t = a['t'][self.local]
+    f_own, e_own = inter.forces(x, v, self.pairs_own, box=self.dd.box, t=t)
+    f_halo, e_halo = inter.forces(x, v, self.pairs_halo, box=self.dd.box, t=t)
+    a['f'][self.own] = (f_own + f_halo)[:len(self.own)]
+    self.dd.energies[self.rank] = e_own + 0.5*e_halo
+
+  def first_step(self):
+    a = self.dd.arrays
+    dt = self.dd.integrator.dt
+    own = self.own
+    v = a['v'][own] + 0.5*dt*a['f'][own]/a['mass'][own, np.newaxis]
+    x = a['x'][own] + dt*v
+    img = a['img'][own]
+    x, v = self.dd.box.wrap_boundary(np.ascontiguousarray(x, dtype=np.float32),
+                                     np.ascontiguousarray(v, dtype=np.float32),
+                                     img)
+    a['x'][own] = x
+    a['v'][own] = v
+    a['img'][own] = img
+
+  def last_step(self):
+    a = self.dd.arrays
+    dt = self.dd.integrator.dt
+    own = self.own
+    a['v'][own] += 0.5*dt*a['f'][own]/a['mass'][own, np.newaxis]
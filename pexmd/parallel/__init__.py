@@ -0,0 +1 @@
+from pexmd.parallel.Decomposition import *
@@ -2,21 +2,413 @@
 Main Particles module.
 """
 
+from contextlib import contextmanager
+from multiprocessing import resource_tracker, shared_memory
+import threading
+import time
 import numpy as np
 
+# Arrays with one entry per particle: name, shape of each entry and dtype
+FIELDS = [('_x', (3,), np.float32), ('_v', (3,), np.float32),
+          ('_f', (3,), np.float32), ('_img', (3,), np.int32),
+          ('_t', (), np.int32), ('_mass', (), np.float32),
+          ('_invmass', (), np.float32), ('idx', (), np.int64)]
+PER_PARTICLE = [name for name, _, _ in FIELDS]
+
+# Header of the shared storage: sequence counter, number of particles
+# and capacity
+HEADER = 3
+
+_track_lock = threading.Lock()
+
+def _open_shared(name):
+  """
+  Open an existing shared memory block without handing it to the
+  resource tracker of this process, which would unlink it when the
+  process exits, under the feet of its owner.
+  """
+  try:
+    return shared_memory.SharedMemory(name=name, track=False)
+  except TypeError:
+    # Before Python 3.13 every block is tracked
+    with _track_lock:
+      register = resource_tracker.register
+      resource_tracker.register = lambda name, rtype: None
+      try:
+        return shared_memory.SharedMemory(name=name)
+      finally:
+        resource_tracker.register = register
+
+def _nbytes(capacity, shape, dtype):
+  """
+  Bytes taken by one array of the storage, rounded up to keep the next
+  one aligned.
+  """
+  size = capacity*int(np.prod(shape))*np.dtype(dtype).itemsize
+  return -(-size // 8)*8
+
+def _spread(v):
+  """
+  Spread the lowest 21 bits of `v` so that there are two zeros between
+  each of them.
+  """
+  v = v & np.uint64(0x1fffff)
+  for shift, mask in ((32, 0x1f00000000ffff), (16, 0x1f0000ff0000ff),
+                      (8, 0x100f00f00f00f00f), (4, 0x10c30c30c30c30c3),
+                      (2, 0x1249249249249249)):
+    v = (v | (v << np.uint64(shift))) & np.uint64(mask)
+  return v
+
+def morton_codes(cells):
+  """
+  Position along the Morton (Z-order) curve of 3D integer cells.
+
+  Parameters
+  ----------
+
+  cells : 2D NumPy array
+        Integer cell coordinates, below 2**21, in an Nx3 array
+
+  Returns
+  -------
+
+  codes : 1D NumPy array
+        The uint64 Morton codes
+  """
+  cells = np.asarray(cells, dtype=np.uint64)
+  return ((_spread(cells[:, 0]) << np.uint64(2)) |
+          (_spread(cells[:, 1]) << np.uint64(1)) | _spread(cells[:, 2]))
+
+def hilbert_codes(cells, bits):
+  """
+  Position along the Hilbert curve of 3D integer cells, following
+  Skilling's transposition algorithm.
+
+  Parameters
+  ----------
+
+  cells : 2D NumPy array
+        Integer cell coordinates, below 2**bits, in an Nx3 array
+
+  bits : int
+        Number of bits per coordinate, at most 21
+
+  Returns
+  -------
+
+  codes : 1D NumPy array
+        The uint64 Hilbert codes
+  """
+  X = np.array(cells, dtype=np.uint64).T.copy()
+  zero = np.uint64(0)
+  q = 1 << (bits - 1)
+  while q > 1:
+    Q, P = np.uint64(q), np.uint64(q - 1)
+    for i in range(3):
+      invert = (X[i] & Q) != 0
+      t = np.where(invert, zero, (X[0] ^ X[i]) & P)
+      X[0] ^= np.where(invert, P, t)
+      X[i] ^= t
+    q >>= 1
+  for i in range(1, 3):
+    X[i] ^= X[i-1]
+  t = np.zeros_like(X[0])
+  q = 1 << (bits - 1)
+  while q > 1:
+    t ^= np.where((X[2] & np.uint64(q)) != 0, np.uint64(q - 1), zero)
+    q >>= 1
+  X ^= t
+  codes = np.zeros_like(X[0])
+  for b in range(bits - 1, -1, -1):
+    for i in range(3):
+      codes = (codes << np.uint64(1)) | ((X[i] >> np.uint64(b)) & np.uint64(1))
+  return codes
+
 class Base(object):
   """
   Base Particles class. It is abstract and we should specify which
   type of particle we actually want in order to fill it
   """
-  def __init__(self, n):
+  def __init__(self, n, capacity=None, shared=False):
+    """
+    Parameters
+    ----------
+
+    n : int
+        Number of particles
+
+    capacity : int, optional
+        Number of particles that fit before the storage has to grow
+
+    shared : bool
+        Whether to keep the arrays in shared memory, so that other
+        processes can map them with `attach` and read them without
+        copying. Shared storage cannot grow beyond its capacity.
+    """
     self.n = n
-    self._x = np.zeros((n, 3), dtype=np.float32)
-    self._v = np.zeros((n, 3), dtype=np.float32)
-    self._f = np.zeros((n, 3), dtype=np.float32)
-    self._t = np.zeros(n, dtype=np.int32)
-    self._mass = np.zeros(n, dtype=np.float32)
-    self.idx = np.arange(n)
+    self.capacity = max(n, capacity or 0)
+    self._shm = None
+    self._owner = True
+    self._depth = 0
+    if shared:
+      size = 8*HEADER + sum(_nbytes(self.capacity, shape, dtype)
+                            for _, shape, dtype in FIELDS)
+      self._shm = shared_memory.SharedMemory(create=True, size=size)
+    self._map()
+    self._header[2] = self.capacity
+    self._buffers['idx'][:n] = np.arange(n)
+    self._next_id = n
+    self._views()
+
+  @classmethod
+  def attach(cls, name):
+    """
+    Map the shared storage of particles living in another process.
+    The arrays are the live ones: use `snapshot` to get a consistent
+    copy while the owner keeps writing.
+
+    Parameters
+    ----------
+
+    name : str
+        The `name` of the shared particles
+
+    Returns
+    -------
+
+    particles : Particles
+        Particles backed by the same memory
+    """
+    part = cls.__new__(cls)
+    part._shm = _open_shared(name)
+    part._owner = False
+    part._depth = 0
+    header = np.ndarray(HEADER, dtype=np.int64, buffer=part._shm.buf)
+    part.n = int(header[1])
+    part.capacity = int(header[2])
+    part._map()
+    part._next_id = None
+    part._views()
+    return part
+
+  def _map(self):
+    """
+    Allocate the storage, or lay it over the shared memory block.
+    """
+    self._buffers = {}
+    if self._shm is None:
+      self._header = np.zeros(HEADER, dtype=np.int64)
+      for name, shape, dtype in FIELDS:
+        self._buffers[name] = np.zeros((self.capacity,) + shape, dtype=dtype)
+      return
+    buf = self._shm.buf
+    self._header = np.ndarray(HEADER, dtype=np.int64, buffer=buf)
+    offset = 8*HEADER
+    for name, shape, dtype in FIELDS:
+      self._buffers[name] = np.ndarray((self.capacity,) + shape, dtype=dtype,
+                                       buffer=buf, offset=offset)
+      offset += _nbytes(self.capacity, shape, dtype)
+
+  @property
+  def shared(self):
+    return self._shm is not None
+
+  @property
+  def name(self):
+    """
+    Name of the shared memory block, to `attach` from other processes.
+    """
+    return self._shm.name if self._shm is not None else None
+
+  @property
+  def frame(self):
+    """
+    Number of completed writes, as counted by `writing`.
+    """
+    return int(self._header[0]) // 2
+
+  @contextmanager
+  def writing(self):
+    """
+    Bracket a modification of the arrays. The sequence counter is odd
+    while it lasts, so that readers in `snapshot` retry instead of
+    copying a half-written frame. Nested calls count as one write, and
+    so does finishing a frame that a native writer left open.
+    """
+    if not self._depth and not self._header[0] % 2:
+      self._header[0] += 1
+    self._depth += 1
+    try:
+      yield self
+    finally:
+      self._depth -= 1
+      if not self._depth:
+        self._header[0] += 1
+
+  def snapshot(self, fields=('x', 'v')):
+    """
+    Consistent copy of some arrays, taken without stopping the writer.
+
+    Parameters
+    ----------
+
+    fields : sequence of str
+        Names of the arrays to copy, such as 'x', 'v', 't' or 'idx'
+
+    Returns
+    -------
+
+    frame : int
+        The frame the copies belong to
+
+    arrays : dict
+        The copies, by name
+    """
+    names = [f if f in self._buffers else '_' + f for f in fields]
+    tries = 0
+    while True:
+      if tries:
+        time.sleep(0 if tries < 100 else 1e-4)
+      tries += 1
+      seq = int(self._header[0])
+      if seq % 2:
+        continue
+      n = int(self._header[1])
+      arrays = dict((f, self._buffers[name][:n].copy())
+                    for f, name in zip(fields, names))
+      if int(self._header[0]) == seq:
+        if n != self.n:
+          self.n = n
+          self._views()
+        return seq // 2, arrays
+
+  def close(self):
+    """
+    Release the shared memory. The owner also frees the block, so it
+    should be the last one to close.
+    """
+    if self._shm is None:
+      return
+    for name in PER_PARTICLE:
+      setattr(self, name, None)
+    self._buffers = {}
+    self._header = np.zeros(HEADER, dtype=np.int64)
+    self._shm.close()
+    if self._owner:
+      self._shm.unlink()
+    self._shm = None
+
+  def _views(self):
+    """
+    Point the per-particle arrays to the first `n` entries of the
+    storage.
+    """
+    if self._owner:
+      self._header[1] = self.n
+    for name in PER_PARTICLE:
+      setattr(self, name, self._buffers[name][:self.n])
+
+  def _grow(self, needed):
+    """
+    Make room for at least `needed` particles, doubling the capacity
+    so that the cost of growing is amortised.
+    """
+    if needed <= self.capacity:
+      return
+    if self._shm is not None:
+      msg = "Shared storage for {0} particles cannot hold {1}"
+      raise ValueError(msg.format(self.capacity, needed))
+    self.capacity = max(needed, 2*self.capacity)
+    for name, buf in self._buffers.items():
+      new = np.zeros((self.capacity,) + buf.shape[1:], dtype=buf.dtype)
+      new[:self.n] = buf[:self.n]
+      self._buffers[name] = new
+
+  def insert(self, x, v=None, t=0, mass=1.0):
+    """
+    Add particles at the end of the storage.
+
+    Parameters
+    ----------
+
+    x : 2D NumPy array
+        Positions of the new particles, in an Mx3 array
+
+    v : 2D NumPy array, optional
+        Velocities of the new particles. By default, zero.
+
+    t, mass : 1D NumPy array or scalar
+        Types and masses of the new particles
+
+    Returns
+    -------
+
+    idx : 1D NumPy array
+        The IDs given to the new particles
+    """
+    x = np.asarray(x, dtype=np.float32).reshape(-1, 3)
+    m = len(x)
+    self._grow(self.n + m)
+    with self.writing():
+      new = slice(self.n, self.n + m)
+      buf = self._buffers
+      buf['_x'][new] = x
+      buf['_v'][new] = 0.0 if v is None else v
+      buf['_f'][new] = 0.0
+      buf['_img'][new] = 0
+      buf['_t'][new] = t
+      buf['_mass'][new] = mass
+      with np.errstate(divide='ignore'):
+        buf['_invmass'][new] = 1.0/buf['_mass'][new]
+      buf['idx'][new] = np.arange(self._next_id, self._next_id + m)
+      self._next_id += m
+      self.n += m
+      self._views()
+    return buf['idx'][new].copy()
+
+  def delete(self, positions):
+    """
+    Remove particles, filling each hole with one of the last particles
+    so that only O(M) entries are moved. The other particles keep their
+    IDs in `idx`, but not necessarily their positions.
+
+    Parameters
+    ----------
+
+    positions : 1D NumPy array or integer
+        Current positions in the arrays of the particles to remove
+    """
+    positions = np.unique(np.atleast_1d(positions))
+    if len(positions) and (positions[0] < 0 or positions[-1] >= self.n):
+      raise IndexError("Trying to delete particles outside the system")
+    n = self.n - len(positions)
+    holes = positions[positions < n]
+    tail = np.ones(self.n - n, dtype=bool)
+    tail[positions[positions >= n] - n] = False
+    movers = n + np.flatnonzero(tail)
+    with self.writing():
+      for buf in self._buffers.values():
+        buf[holes] = buf[movers]
+      self.n = n
+      self._views()
+
+  def remove(self, position):
+    """
+    Remove a single particle in O(1), swapping it with the last one.
+
+    Parameters
+    ----------
+
+    position : int
+        Current position in the arrays of the particle to remove
+    """
+    if not 0 <= position < self.n:
+      raise IndexError("Trying to delete particles outside the system")
+    with self.writing():
+      self.n -= 1
+      for buf in self._buffers.values():
+        buf[position] = buf[self.n]
+      self._views()
 
   @property
   def x(self):
@@ -31,12 +423,13 @@ class Base(object):
     ----------
 
     value : 2D NumPy array
-        The new positons of particles in an Nx3 array
+        The new positons of particles in an Nx3 array. They are
+        copied into the existing buffer, which keeps its address.
     """
-    value = np.array(value, dtype=np.float32)
+    value = np.asarray(value)
     number = np.shape(value)[0]
     if self.n == number:
-      self._x = value
+      self._x[...] = value
     else:
       msg = "Trying to set {0} positions for a system with {1} particles"
       raise ValueError(msg.format(number, self.n))
@@ -56,10 +449,10 @@ class Base(object):
     value : 2D NumPy array
         The new velocities of particles in an Nx3 array
     """
-    value = np.array(value, dtype=np.float32)
+    value = np.asarray(value)
     number = np.shape(value)[0]
     if self.n == number:
-      self._v = value
+      self._v[...] = value
     else:
       msg = "Trying to set {0} velocities for a system with {1} particles"
       raise ValueError(msg.format(number, self.n))
@@ -79,17 +472,59 @@ class Base(object):
     value : 2D NumPy array
         The new forces of particles in an Nx3 array
     """
-    value = np.array(value, dtype=np.float32)
+    value = np.asarray(value)
     number = np.shape(value)[0]
     if self.n == number:
-      self._f = value
+      self._f[...] = value
     else:
       msg = "Trying to set {0} forces for a system with {1} particles"
       raise ValueError(msg.format(number, self.n))
 
+  @property
+  def img(self):
+    return self._img
+
+  @img.setter
+  def img(self, value):
+    """
+    Set image flags of particles.
+
+    Parameters
+    ----------
+
+    value : 2D NumPy array
+        The number of times each particle crossed the periodic box, in
+        an Nx3 array
+    """
+    value = np.asarray(value)
+    number = np.shape(value)[0]
+    if self.n == number:
+      self._img[...] = value
+    else:
+      msg = "Trying to set {0} image flags for a system with {1} particles"
+      raise ValueError(msg.format(number, self.n))
+
   @property
   def a(self):
-    return self._f/self._mass[:, np.newaxis]
+    return self._f*self._invmass[:, np.newaxis]
+
+  def accel(self, out):
+    """
+    Calculate accelerations of particles into a buffer.
+
+    Parameters
+    ----------
+
+    out : 2D NumPy array
+        Nx3 array where the accelerations are written
+
+    Returns
+    -------
+
+    out : 2D NumPy array
+        The same buffer, updated
+    """
+    return np.multiply(self._f, self._invmass[:, np.newaxis], out=out)
 
   @property
   def t(self):
@@ -107,12 +542,12 @@ class Base(object):
         The new types of particles in an Nx3 array
     """
     if np.isscalar(value):
-      self._t = np.array([value]*self.n, dtype=np.int32)
+      self._t[...] = value
     else:
-      value = np.array(value)
+      value = np.asarray(value)
       number = np.shape(value)[0]
       if self.n == number:
-        self._t = value
+        self._t[...] = value
       else:
         msg = "Trying to set {0} types for a system with {1} particles"
         raise ValueError(msg.format(number, self.n))
@@ -133,15 +568,75 @@ class Base(object):
         The new types of particles in an Nx3 array
     """
     if np.isscalar(value):
-      self._mass = np.array([value]*self.n, dtype=np.float32)
+      self._mass[...] = value
     else:
-      value = np.array(value)
+      value = np.asarray(value)
       number = np.shape(value)[0]
       if self.n == number:
-        self._mass = value
+        self._mass[...] = value
       else:
         msg = "Trying to set {0} masses for a system with {1} particles"
         raise ValueError(msg.format(number, self.n))
+    with np.errstate(divide='ignore'):
+      np.divide(1.0, self._mass, out=self._invmass)
+
+  @property
+  def invmass(self):
+    """
+    Inverse masses of particles, cached when the masses are set.
+    """
+    return self._invmass
+
+  def reorder(self, order):
+    """
+    Permute all the per-particle arrays in place. The original IDs are
+    kept in `idx`.
+
+    Parameters
+    ----------
+
+    order : 1D NumPy array
+        New position of the particles: the i-th particle after
+        reordering is the `order[i]`-th one before
+    """
+    for name in PER_PARTICLE:
+      arr = getattr(self, name)
+      arr[...] = arr[order]
+
+  def spatial_order(self, box, curve='Hilbert', bits=10):
+    """
+    Order of the particles along a space-filling curve, so that
+    particles close in space are also close in memory.
+
+    Parameters
+    ----------
+
+    box : Box
+        The simulation box
+
+    curve : {'Hilbert', 'Morton'}
+        The space-filling curve
+
+    bits : int
+        Resolution of the curve, with 2**bits cells per direction
+
+    Returns
+    -------
+
+    order : 1D NumPy array
+        The permutation to pass to `reorder`
+    """
+    s = np.dot(self._x - box.x0, box.hinv.T)
+    if box.t == 'Periodic':
+      s -= np.floor(s)
+    cells = np.clip((s*2**bits).astype(np.int64), 0, 2**bits - 1)
+    if curve == 'Hilbert':
+      codes = hilbert_codes(cells, bits)
+    elif curve == 'Morton':
+      codes = morton_codes(cells)
+    else:
+      raise ValueError("Unknown space-filling curve {0}".format(curve))
+    return np.argsort(codes, kind='stable')
 
 class PointParticles(Base):
   """
@@ -0,0 +1,157 @@
+"""
+Main Profiler module.
+"""
+
+import time
+import contextlib
+
+from pexmd.box import Box
+from pexmd.integrator import Integrator
+from pexmd.interaction import Interaction
+from pexmd.neighbour import Neighbour
+from pexmd.simulation import Simulation
+
+# Methods timed on each kind of object, and the section they belong to
+SECTIONS = [(Neighbour, 'build_list', 'Neigh'),
+            (Interaction, 'forces', 'Force'),
+            (Box, 'wrap_boundary', 'Bound'),
+            (Integrator, 'first_step', 'Integ'),
+            (Integrator, 'last_step', 'Integ'),
+            (Integrator, 'first_step_inplace', 'Integ'),
+            (Integrator, 'last_step_inplace', 'Integ'),
+            (Simulation, '_run_native', 'Native')]
+
+class Profiler(object):
+  """
+  Profiler class. Times the phases of the step loop.
+
+  The objects to profile get their methods wrapped on `attach` and
+  restored on `detach`, so an unused profiler costs nothing.
+  """
+  def __init__(self):
+    self.wrapped = []
+    self.active = set()
+    self.nested = []
+    self.reset()
+
+  def reset(self):
+    """
+    Clear all the statistics.
+    """
+    self.time = {}
+    self.calls = {}
+    self.pairs = 0
+    self.neigh_last = 0
+    self.neigh_max = 0
+    self.start = time.perf_counter()
+
+  def attach(self, *objects):
+    """
+    Start profiling objects.
+
+    Parameters
+    ----------
+
+    objects : Neighbour, Interaction, Box, Integrator or Simulation
+        The objects whose methods are timed. A Simulation brings all
+        of its components along.
+    """
+    for obj in objects:
+      if isinstance(obj, Simulation):
+        self.attach(obj.neighbour, obj.interaction, obj.box, obj.integrator)
+      for cls, name, section in SECTIONS:
+        if isinstance(obj, cls) and name not in vars(obj):
+          setattr(obj, name, self._wrap(getattr(obj, name), section))
+          self.wrapped.append((obj, name))
+
+  def detach(self):
+    """
+    Stop profiling, restoring the original methods.
+    """
+    for obj, name in self.wrapped:
+      delattr(obj, name)
+    self.wrapped = []
+
+  @contextlib.contextmanager
+  def phase(self, section):
+    """
+    Time a block of code as part of `section`. The time spent in phases
+    nested inside it only counts for their own sections, so that no
+    time is counted twice.
+    """
+    clock = time.perf_counter
+    self.nested.append(0.0)
+    t0 = clock()
+    try:
+      yield
+    finally:
+      elapsed = clock() - t0
+      self._add(section, elapsed - self.nested.pop())
+      if self.nested:
+        self.nested[-1] += elapsed
+
+  def _add(self, section, elapsed):
+    self.time[section] = self.time.get(section, 0.0) + elapsed
+    self.calls[section] = self.calls.get(section, 0) + 1
+
+  def _wrap(self, method, section):
+    phase = self.phase
+    if section == 'Neigh':
+      def wrapper(*args, **kwargs):
+        with phase(section):
+          pairs = method(*args, **kwargs)
+        self.neigh_last = len(pairs)
+        self.neigh_max = max(self.neigh_max, self.neigh_last)
+        return pairs
+    elif section == 'Force':
+      def wrapper(x, v, pairs=None, *args, **kwargs):
+        with phase(section):
+          result = method(x, v, pairs, *args, **kwargs)
+        if pairs is not None:
+          self.pairs += len(pairs)
+        return result
+    else:
+      # Only the outermost call is timed, as in-place steps may call the
+      # other ones
+      def wrapper(*args, **kwargs):
+        if section in self.active:
+          return method(*args, **kwargs)
+        self.active.add(section)
+        try:
+          with phase(section):
+            return method(*args, **kwargs)
+        finally:
+          self.active.discard(section)
+    return wrapper
+
+  def summary(self):
+    """
+    Table with the time spent in each section, in the spirit of the
+    one LAMMPS prints at the end of a run.
+
+    Returns
+    -------
+
+    table : str
+        The formatted table
+    """
+    total = time.perf_counter() - self.start
+    sections = ['Neigh', 'Force', 'Bound', 'Integ', 'Native']
+    sections += sorted(s for s in self.time if s not in sections)
+    lines = ["Section |   time (s) |    calls |  %total",
+             "--------+------------+----------+--------"]
+    fmt = "{0:<7s} | {1:10.4f} | {2:8d} | {3:6.2f}"
+    other = total
+    for s in sections:
+      if s in self.time:
+        other -= self.time[s]
+        lines.append(fmt.format(s, self.time[s], self.calls[s],
+                                100*self.time[s]/total if total else 0.0))
+    lines.append("{0:<7s} | {1:10.4f} | {2:8s} | {3:6.2f}".format(
+      'Other', other, '', 100*other/total if total else 0.0))
+    lines.append("")
+    lines.append("Total wall time: {0:.4f} s".format(total))
+    lines.append("Pairs computed in Force: {0:d}".format(self.pairs))
+    lines.append("Neighbour list size: {0:d} (max {1:d})".format(
+      self.neigh_last, self.neigh_max))
+    return "\n".join(lines)
@@ -0,0 +1 @@
+from pexmd.profiler.Profiler import *
@@ -0,0 +1,234 @@
+"""
+Main Simulation module
+"""
+
+import numpy as np
+import ctypes as ct
+
+from pexmd.integrator import VelVerlet
+from pexmd.interaction import LennardJones, FORCES, ENERGY
+from pexmd.neighbour import VerletList
+
+md = ct.CDLL('pexmd/simulation/md.so')
+mdrun_c = md.run
+mdrun_c.argtypes = [ct.c_voidp, ct.c_voidp, ct.c_voidp, ct.c_voidp,
+                    ct.c_voidp, ct.c_voidp, ct.c_longlong, ct.c_voidp,
+                    ct.c_longlong, ct.c_voidp, ct.c_int, ct.c_int,
+                    ct.c_voidp, ct.c_voidp, ct.c_voidp, ct.c_int, ct.c_float,
+                    ct.c_longlong, ct.c_voidp, ct.c_float, ct.c_voidp,
+                    ct.c_voidp, ct.c_int, ct.c_voidp, ct.c_voidp,
+                    ct.c_voidp, ct.c_voidp, ct.c_voidp, ct.c_voidp]
+mdrun_c.restype = ct.c_longlong
+
+BOUNDARIES = {'Periodic': 1, 'Fixed': 2}
+
+class Simulation(object):
+  """
+  Simulation class. Drives the step loop of a system.
+  """
+  def __init__(self, particles, box, integrator, neighbour, interaction,
+               sort_every=None, compute=ENERGY):
+    """
+    Parameters
+    ----------
+
+    particles : Particles
+        The particles of the system
+
+    box : Box
+        The simulation box
+
+    integrator : Integrator
+        The integrator of the equations of motion
+
+    neighbour : Neighbour
+        The builder of the list of pairs
+
+    interaction : Interaction
+        The interaction between the particles
+
+    sort_every : int, optional
+        Interval between reorderings of the particles along a
+        space-filling curve, for better cache reuse in large systems
+
+    compute : int
+        Flags of what the interaction computes besides the forces, such
+        as ENERGY | VIRIAL. Only the steps whose results can be seen,
+        the last one before each callback or the end of `run`, compute
+        them; the others compute the forces alone.
+
+    .. note:: The whole step loop runs natively for a `VelVerlet`
+              integrator with a `LennardJones` interaction. Otherwise,
+              each step goes through the Python objects.
+    """
+    self.particles = particles
+    self.box = box
+    self.integrator = integrator
+    self.neighbour = neighbour
+    self.interaction = interaction
+    self.step = 0
+    self.energ = 0.0
+    self.pairs = None
+    self.sort_every = sort_every
+    self.compute = compute
+    self.native = (type(integrator) is VelVerlet and
+                   type(interaction) is LennardJones)
+
+  def forces(self, compute=None, sample=True):
+    """
+    Build the list of neighbours and calculate the forces.
+
+    Parameters
+    ----------
+
+    compute : int, optional
+        Flags of what to compute besides the forces. By default, the
+        ones of the simulation.
+
+    sample : bool
+        Whether an `rdf` attached to the interaction accumulates this
+        configuration
+    """
+    if compute is None:
+      compute = self.compute
+    part = self.particles
+    inter = self.interaction
+    rdf = getattr(inter, 'rdf', None)
+    if not sample:
+      inter.rdf = None
+    try:
+      self.pairs = self.neighbour.build_list(part.x, part.t)
+      part.f, energ = inter.forces(part.x, part.v, self.pairs, box=self.box,
+                                   t=part.t, compute=compute)
+    finally:
+      if rdf is not None:
+        inter.rdf = rdf
+    if compute & ENERGY:
+      self.energ = energ
+
+  def run(self, nsteps, callback=None, every=None):
+    """
+    Run the simulation
+
+    Parameters
+    ----------
+
+    nsteps : int
+        Number of steps to run
+
+    callback : callable, optional
+        Function called with the simulation as argument every `every`
+        steps, the only time the native loop returns to Python
+
+    every : int, optional
+        Interval between calls to `callback`
+
+    .. note:: Each step is published as a frame of the particles, for
+              readers that `snapshot` shared particles, also from the
+              native loop.
+
+    .. note:: An `rdf` attached to the interaction accumulates each
+              step once. The forces on the starting configuration,
+              computed again on each call, are not sampled.
+    """
+    self.forces(sample=False)
+    done = 0
+    while done < nsteps:
+      n = nsteps - done
+      if callback is not None and every:
+        n = min(n, every - self.step % every)
+      if self.sort_every:
+        n = min(n, self.sort_every - self.step % self.sort_every)
+      if self.native:
+        self._run_native(n)
+      else:
+        for s in range(n):
+          with self.particles.writing():
+            self._run_python(self.compute if s == n - 1 else FORCES)
+      done += n
+      self.step += n
+      if self.sort_every and self.step % self.sort_every == 0:
+        self.reorder()
+      if callback is not None and every and self.step % every == 0:
+        callback(self)
+
+  def reorder(self, curve='Hilbert'):
+    """
+    Sort the particles along a space-filling curve, remapping the
+    neighbour list to match. The original IDs are kept in `idx`.
+    """
+    order = self.particles.spatial_order(self.box, curve)
+    with self.particles.writing():
+      self.particles.reorder(order)
+    self.neighbour.remap(order)
+    if self.pairs is not None and self.pairs is not getattr(self.neighbour,
+                                                            'pairs', None):
+      inverse = np.empty_like(order)
+      inverse[order] = np.arange(len(order))
+      self.pairs = inverse[self.pairs]
+
+  def _run_python(self, compute=None):
+    """
+    One step through the Python objects.
+    """
+    part = self.particles
+    self.integrator.first_step_inplace(part)
+    self.box.wrap_boundary(part.x, part.v, part.img)
+    self.forces(compute)
+    self.integrator.last_step_inplace(part)
+
+  def _run_native(self, nsteps):
+    """
+    Run `nsteps` steps in the native loop. It only comes back here when
+    the neighbour list has to be rebuilt, in the middle of a step whose
+    frame is still open.
+    """
+    part = self.particles
+    inter = self.interaction
+    invmass = part.invmass
+    params = inter.params()
+    ntypes = len(params) if inter.typed else 1
+    t = np.ascontiguousarray(part.t, dtype=np.int32)
+    tp = t.ctypes.data_as(ct.c_voidp) if inter.typed else None
+    boundary = BOUNDARIES.get(self.box.t, 0)
+    cell = self.box.cell
+    cellp = None if cell is None else cell.ctypes.data_as(ct.c_voidp)
+    rdfp = None if inter.rdf is None else inter.rdf.pointer(part.t)
+    pending = ct.c_int(0)
+    energ = ct.c_float(self.energ)
+    virial, peratom = inter._outputs(self.compute, part.n)
+    virialp = None if virial is None else virial.ctypes.data_as(ct.c_voidp)
+    peratomp = None if peratom is None else peratom.ctypes.data_as(ct.c_voidp)
+    seqp = part._header.ctypes.data_as(ct.c_voidp)
+    bufferp = hbufferp = None
+    if inter.nthreads > 1:
+      bufferp, hbufferp = inter.buffers(part.n)
+    done = 0
+    while done < nsteps:
+      xref = None
+      maxdispsq = -1.0
+      if isinstance(self.neighbour, VerletList):
+        xref = self.neighbour._xref.ctypes.data_as(ct.c_voidp)
+        maxdispsq = 0.25*self.neighbour.skin**2
+      done += mdrun_c(part.x.ctypes.data_as(ct.c_voidp),
+                      part.v.ctypes.data_as(ct.c_voidp),
+                      part.f.ctypes.data_as(ct.c_voidp),
+                      invmass.ctypes.data_as(ct.c_voidp), tp,
+                      part.img.ctypes.data_as(ct.c_voidp), part.n,
+                      self.pairs.ctypes.data_as(ct.c_voidp), len(self.pairs),
+                      params.ctypes.data_as(ct.c_voidp), ntypes,
+                      inter.nthreads, self.box.x0.ctypes.data_as(ct.c_voidp),
+                      self.box.xf.ctypes.data_as(ct.c_voidp), cellp,
+                      boundary, self.integrator.dt, nsteps - done, xref,
+                      maxdispsq, ct.byref(pending), ct.byref(energ),
+                      self.compute, virialp, peratomp, rdfp, seqp,
+                      bufferp, hbufferp)
+      self.energ = energ.value
+      if pending.value:
+        with part.writing():
+          self.forces(self.compute if done + 1 == nsteps else FORCES)
+          self.integrator.last_step_inplace(part)
+        energ.value = self.energ
+        done += 1
+      elif done == nsteps:
+        inter._store(virial, peratom)
@@ -0,0 +1 @@
+from pexmd.simulation.Simulation import *
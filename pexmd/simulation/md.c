@@ -0,0 +1,104 @@
+#include <string.h>
+#include <math.h>
+#include "box.h"
+#include "lj.h"
+#include "md.h"
+
+#define PERIODIC 1
+#define FIXED 2
+
+static inline void publish(long long *seq) {
+  /* Bump the sequence counter of a seqlock. Odd while a step is being
+     written, even once it is complete. */
+  if (!seq) return;
+  long long next = __atomic_load_n(seq, __ATOMIC_RELAXED) + 1;
+  if (next % 2) {
+    __atomic_store_n(seq, next, __ATOMIC_RELAXED);
+    __atomic_thread_fence(__ATOMIC_RELEASE);
+  }
+  else {
+    __atomic_store_n(seq, next, __ATOMIC_RELEASE);
+  }
+}
+
+static int moved_too_far(float *x, float *xref, long int npart, float *boxl,
+                         float *tri, float maxdispsq) {
+  if (!xref) return 1;
+  for (long int i = 0; i < npart; i++) {
+    float delr[3];
+    for (int k = 0; k < 3; k++) {
+      delr[k] = x[3*i + k] - xref[3*i + k];
+    }
+    minimum_image(delr, boxl, tri);
+    float rsq = 0.0;
+    for (int k = 0; k < 3; k++) {
+      rsq += delr[k] * delr[k];
+    }
+    if (rsq > maxdispsq) return 1;
+  }
+  return 0;
+}
+
+long int run(float *x, float *v, float *f, float *invmass, int *t,
+             int *img, long int npart, long int *pairs, long int npairs,
+             float *params, int ntypes, int nthreads, float *x0, float *xf,
+             float *tri, int boundary, float dt, long int nsteps, float *xref,
+             float maxdispsq, int *pending, float *energ, int flags,
+             float *virial, float *peratom, struct rdf *rdf,
+             long long *seq, float *buffer, long int *hbuffer) {
+  /* Velocity Verlet steps over a fixed list of pairs. When a particle
+     moves further than allowed by the list, the step is left pending
+     after the boundary conditions, so the caller can rebuild the list,
+     compute forces and finish it. Returns the number of full steps.
+     Only the last step computes what flags asks for besides the
+     forces, as the caller never sees the others. Each step is
+     published through the seqlock counter seq, if given; a pending
+     step leaves it odd for the caller to finish. With more than one
+     thread, buffer and hbuffer are the per-thread buffers of
+     forces_omp. */
+  float boxl[3];
+  for (int k = 0; k < 3; k++) boxl[k] = xf[k] - x0[k];
+  float *boxlp = (boundary == PERIODIC) ? boxl : NULL;
+  *pending = 0;
+  for (long int step = 0; step < nsteps; step++) {
+    publish(seq);
+    for (long int i = 0; i < npart; i++) {
+      for (int k = 0; k < 3; k++) {
+        float a = f[3*i + k] * invmass[i];
+        x[3*i + k] += dt * (v[3*i + k] + 0.5 * dt * a);
+        v[3*i + k] += 0.5 * dt * a;
+      }
+    }
+    if (tri) periodic_triclinic(x, img, npart, x0, tri);
+    else if (boundary == PERIODIC) periodic(x, img, npart, x0, xf);
+    else if (boundary == FIXED) fixed(x, v, npart, x0, xf);
+
+    if (moved_too_far(x, xref, npart, boxlp, tri, maxdispsq)) {
+      *pending = 1;
+      return step;
+    }
+
+    int stepflags = (step == nsteps - 1) ? flags : COMPUTE_FORCES;
+    if (stepflags & COMPUTE_VIRIAL) memset(virial, 0, 6 * sizeof(float));
+    if (stepflags & COMPUTE_PERATOM) memset(peratom, 0, npart * sizeof(float));
+    memset(f, 0, 3 * npart * sizeof(float));
+    float e;
+    if (nthreads > 1) {
+      e = forces_omp(x, t, npart, pairs, npairs, params, ntypes, boxlp, tri,
+                     f, nthreads, stepflags, virial, peratom, rdf, buffer,
+                     hbuffer);
+    }
+    else {
+      e = forces(x, t, pairs, npairs, params, ntypes, boxlp, tri, f,
+                 stepflags, virial, peratom, rdf);
+    }
+    if (stepflags & COMPUTE_ENERGY) *energ = e;
+    for (long int i = 0; i < npart; i++) {
+      for (int k = 0; k < 3; k++) {
+        v[3*i + k] += 0.5 * dt * f[3*i + k] * invmass[i];
+      }
+    }
+    publish(seq);
+  }
+  return nsteps;
+}
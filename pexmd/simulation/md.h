@@ -0,0 +1,13 @@
+#ifndef MD_H
+#define MD_H
+
+#include "lj.h"
+
+long int run(float *x, float *v, float *f, float *invmass, int *t,
+             int *img, long int npart, long int *pairs, long int npairs,
+             float *params, int ntypes, int nthreads, float *x0, float *xf,
+             float *tri, int boundary, float dt, long int nsteps, float *xref,
+             float maxdispsq, int *pending, float *energ, int flags,
+             float *virial, float *peratom, struct rdf *rdf,
+             long long *seq, float *buffer, long int *hbuffer);
+#endif
@@ -0,0 +1,413 @@
+"""
+Main Trajectory module.
+
+A trajectory file has a header, a sequence of fixed-size frames and,
+once the writer is closed, an index of the frames:
+
+- header: MAGIC, its length as a little-endian uint64 and a JSON
+  description of the frame layout, padded to ALIGN bytes
+- frames: one record per frame with the step, the time, the box and the
+  per-particle fields
+- index: the byte offset and step of each frame, the number of frames
+  and INDEX_MAGIC
+"""
+
+import os
+import json
+import queue
+import threading
+import numpy as np
+
+from pexmd.box import Box
+
+MAGIC = b'PEXMDTRJ'
+INDEX_MAGIC = b'PEXMDIDX'
+VERSION = 1
+ALIGN = 64
+
+# Floating point types for each precision
+PRECISIONS = {'half': '<f2', 'single': '<f4', 'double': '<f8'}
+
+# Per-particle fields that can be stored, and their columns
+FIELDS = {'x': 3, 'v': 3, 'f': 3, 'img': 3, 't': 1}
+
+def frame_dtype(n, fields, precision='single'):
+  """
+  Record type of one frame.
+
+  Parameters
+  ----------
+
+  n : int
+      Number of particles
+
+  fields : sequence of str
+      Per-particle fields stored, among 'x', 'v', 'f', 'img' and 't'
+
+  precision : {'half', 'single', 'double'}
+      Floating point precision of 'x', 'v' and 'f'
+
+  Returns
+  -------
+
+  dtype : NumPy dtype
+      The record type. The box is stored as x0, xf and the tilt factors.
+  """
+  if precision not in PRECISIONS:
+    raise ValueError("Unknown precision {0}".format(precision))
+  descr = [('step', '<i8'), ('time', '<f8'), ('box', '<f8', (9,))]
+  for name in fields:
+    if name not in FIELDS:
+      raise ValueError("Unknown field {0}".format(name))
+    kind = '<i4' if name in ('img', 't') else PRECISIONS[precision]
+    shape = (n, FIELDS[name]) if FIELDS[name] > 1 else (n,)
+    descr.append((name, kind, shape))
+  return np.dtype(descr, align=True)
+
+class TrajectoryWriter(object):
+  """
+  Trajectory writer class.
+
+  Frames are copied as they are into preallocated buffers and handed to
+  a background thread that converts them to the stored precision and
+  appends them to the file in chunks. The step loop only waits when
+  all the buffers are still queued.
+  """
+  def __init__(self, fname, n, fields=('x', 'v'), precision='single',
+               nbuffers=4, chunk=16):
+    """
+    Parameters
+    ----------
+
+    fname : str
+        Name of the trajectory file, which is overwritten
+
+    n : int
+        Number of particles
+
+    fields : sequence of str
+        Per-particle fields stored, among 'x', 'v', 'f', 'img' and 't'
+
+    precision : {'half', 'single', 'double'}
+        Floating point precision of 'x', 'v' and 'f'
+
+    nbuffers : int
+        Number of frames that can wait to be written
+
+    chunk : int
+        Number of frames written to the file at once
+    """
+    self.fname = fname
+    self.n = n
+    self.fields = tuple(fields)
+    self.precision = precision
+    self.dtype = frame_dtype(n, self.fields, precision)
+    self.nframes = 0
+    self.offsets = []
+    self.steps = []
+    self.error = None
+    self._free = queue.Queue()
+    self._queued = queue.Queue(maxsize=nbuffers)
+    for _ in range(nbuffers):
+      self._free.put(np.zeros(1, dtype=frame_dtype(n, self.fields)))
+    self._chunk = np.zeros(chunk, dtype=self.dtype)
+    self._file = open(fname, 'wb')
+    self._write_header()
+    self._thread = threading.Thread(target=self._work, daemon=True)
+    self._thread.start()
+
+  def _write_header(self):
+    header = json.dumps({'version': VERSION, 'n': self.n,
+                         'fields': list(self.fields),
+                         'precision': self.precision,
+                         'itemsize': self.dtype.itemsize}).encode()
+    size = len(MAGIC) + 8 + len(header)
+    header += b' '*(-size % ALIGN)
+    self._file.write(MAGIC)
+    self._file.write(np.uint64(len(header)).tobytes())
+    self._file.write(header)
+    self.start = self._file.tell()
+
+  def write(self, particles, box, step=0, time=0.0):
+    """
+    Queue a frame for writing.
+
+    Parameters
+    ----------
+
+    particles : Particles
+        The particles to store
+
+    box : Box
+        The simulation box
+
+    step : int
+        Step of the frame
+
+    time : float
+        Time of the frame
+    """
+    self._check()
+    if particles.n != self.n:
+      msg = "Trying to write {0} particles in a trajectory of {1}"
+      raise ValueError(msg.format(particles.n, self.n))
+    buf = self._free.get()
+    buf['step'] = step
+    buf['time'] = time
+    buf['box'][0, :3] = box.x0
+    buf['box'][0, 3:6] = box.xf
+    buf['box'][0, 6:] = box.tilt if box.triclinic else 0.0
+    for name in self.fields:
+      buf[name][0] = getattr(particles, name)
+    self._queued.put(buf)
+
+  def __call__(self, sim):
+    """
+    Write the current frame of a simulation, so that the writer can be
+    used as a `Simulation.run` callback.
+    """
+    self.write(sim.particles, sim.box, sim.step,
+               sim.step*getattr(sim.integrator, 'dt', 0.0))
+
+  def _work(self):
+    """
+    Background loop: convert the queued frames and write them in
+    chunks.
+    """
+    used = 0
+    while True:
+      buf = self._queued.get()
+      if buf is not None and self.error is None:
+        try:
+          for name in self._chunk.dtype.names:
+            self._chunk[name][used] = buf[name][0]
+          used += 1
+        except Exception as error:
+          self.error = error
+      if buf is not None:
+        self._free.put(buf)
+      if used and (buf is None or used == len(self._chunk)):
+        self._flush_chunk(used)
+        used = 0
+      self._queued.task_done()
+      if buf is None:
+        break
+
+  def _flush_chunk(self, used):
+    if self.error is not None:
+      return
+    try:
+      offset = self._file.tell()
+      self._file.write(self._chunk[:used].tobytes())
+      self.offsets.extend(offset + self.dtype.itemsize*np.arange(used))
+      self.steps.extend(self._chunk['step'][:used])
+      self.nframes += used
+    except Exception as error:
+      self.error = error
+
+  def _check(self):
+    if self.error is not None:
+      raise IOError("Trajectory writer failed: {0}".format(self.error))
+    if self._file.closed:
+      raise ValueError("Trajectory writer is closed")
+
+  def close(self):
+    """
+    Write the pending frames and the index, and close the file.
+    """
+    if self._file.closed:
+      return
+    self._queued.put(None)
+    self._thread.join()
+    index = np.array([self.offsets, self.steps], dtype='<i8').T
+    self._file.write(index.tobytes())
+    self._file.write(np.int64(self.nframes).tobytes())
+    self._file.write(INDEX_MAGIC)
+    self._file.close()
+    if self.error is not None:
+      raise IOError("Trajectory writer failed: {0}".format(self.error))
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *args):
+    self.close()
+
+class TrajectoryReader(object):
+  """
+  Trajectory reader class.
+
+  The file is memory-mapped, so frames are only read from disk when
+  they are used. Frames, fields and selections of them built from
+  integers and slices are views of the file, not copies.
+  """
+  def __init__(self, fname):
+    """
+    Parameters
+    ----------
+
+    fname : str
+        Name of the trajectory file
+    """
+    self.fname = fname
+    with open(fname, 'rb') as f:
+      if f.read(len(MAGIC)) != MAGIC:
+        raise ValueError("{0} is not a pexmd trajectory".format(fname))
+      size = int(np.frombuffer(f.read(8), dtype='<u8')[0])
+      header = json.loads(f.read(size).decode())
+      start = f.tell()
+      end = f.seek(0, os.SEEK_END)
+      f.seek(max(end - 16, 0))
+      trailer = f.read(16)
+    if header['version'] != VERSION:
+      raise ValueError("Unknown trajectory version {0}".format(
+        header['version']))
+    self.n = header['n']
+    self.fields = tuple(header['fields'])
+    self.precision = header['precision']
+    self.dtype = frame_dtype(self.n, self.fields, self.precision)
+    itemsize = self.dtype.itemsize
+    nframes = (end - start) // itemsize
+    if trailer[8:] == INDEX_MAGIC:
+      indexed = int(np.frombuffer(trailer[:8], dtype='<i8')[0])
+      if start + indexed*(itemsize + 16) + 16 == end:
+        nframes = indexed
+    self.nframes = nframes
+    if nframes:
+      self.frames = np.memmap(fname, dtype=self.dtype, mode='r',
+                              offset=start, shape=(nframes,))
+    else:
+      self.frames = np.zeros(0, dtype=self.dtype)
+
+  def __len__(self):
+    return self.nframes
+
+  def __getitem__(self, key):
+    """
+    Frames as records with the step, time, box and stored fields.
+    """
+    return self.frames[key]
+
+  def __iter__(self):
+    return iter(self.frames)
+
+  @property
+  def steps(self):
+    return self.frames['step']
+
+  def find(self, step):
+    """
+    Frame that holds a given step.
+
+    Parameters
+    ----------
+
+    step : int
+        The step to look for
+
+    Returns
+    -------
+
+    i : int
+        Position of the frame
+    """
+    i = int(np.searchsorted(self.steps, step))
+    if i == self.nframes or self.steps[i] != step:
+      raise KeyError("Step {0} is not in the trajectory".format(step))
+    return i
+
+  def field(self, name, frames=slice(None), particles=slice(None)):
+    """
+    One per-particle field for a selection of frames and particles.
+
+    Parameters
+    ----------
+
+    name : str
+        The field, such as 'x' or 'v'
+
+    frames, particles : int, slice or array of int
+        Selection of frames and particles. With integers and slices the
+        result is a view of the file; arrays of indices give a copy.
+
+    Returns
+    -------
+
+    values : NumPy array
+        The selected values
+    """
+    if name not in self.fields:
+      raise KeyError("Field {0} is not in the trajectory".format(name))
+    values = self.frames[name][frames]
+    if FIELDS[name] > 1:
+      return values[..., particles, :]
+    return values[..., particles]
+
+  def box(self, i, t='Periodic'):
+    """
+    Box of a frame.
+
+    Parameters
+    ----------
+
+    i : int
+        Position of the frame
+
+    t : {'Periodic', 'Fixed'}
+        Type of boundary, which is not stored in the file
+
+    Returns
+    -------
+
+    box : Box
+        The simulation box
+    """
+    b = self.frames['box'][i]
+    return Box(b[:3], b[3:6], t=t, tilt=b[6:])
+
+  def chunks(self, size, fields=None, stride=1):
+    """
+    Iterate over the trajectory in chunks of frames, so that long files
+    can be streamed.
+
+    Parameters
+    ----------
+
+    size : int
+        Number of frames in each chunk
+
+    fields : sequence of str, optional
+        Fields to yield. By default, all of them.
+
+    stride : int
+        Interval between the frames used
+
+    Yields
+    ------
+
+    start : int
+        Position of the first frame of the chunk
+
+    chunk : dict
+        Views of the fields for the frames in the chunk, by name, along
+        with their 'step'
+    """
+    fields = self.fields if fields is None else tuple(fields)
+    for start in range(0, self.nframes, size*stride):
+      sel = self.frames[start:start + size*stride:stride]
+      chunk = dict((name, sel[name]) for name in fields)
+      chunk['step'] = sel['step']
+      yield start, chunk
+
+  def close(self):
+    """
+    Release the mapping of the file.
+    """
+    self.frames = np.zeros(0, dtype=self.dtype)
+    self.nframes = 0
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *args):
+    self.close()
@@ -0,0 +1 @@
+from pexmd.trajectory.Trajectory import *
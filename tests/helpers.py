@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+
+"""Fixtures shared by the tests that run simulations."""
+
+from pexmd import simulation, particles, box, integrator, neighbour, interaction
+import numpy as np
+
+def lattice(n=4, spacing=1.5, offset=0.5):
+  """Simple cubic lattice of n**3 positions."""
+  grid = np.arange(n)*spacing + offset
+  return np.array([(i, j, k) for i in grid for j in grid for k in grid],
+                  dtype=np.float32)
+
+def velocities(x, seed):
+  """Normal random velocities for the positions `x`."""
+  rng = np.random.RandomState(seed)
+  return rng.normal(0.0, 1.0, size=x.shape).astype(np.float32)
+
+def build(x, v=None, length=6.0, t='Periodic', tilt=None, rcut=2.5,
+          skin=0.3, shift_style='Displace', mass=1.0, dt=0.005):
+  """
+  Lennard-Jones simulation of the particles at `x`, in a cubic box of
+  side `length`, with a Verlet list and a velocity Verlet integrator.
+  """
+  part = particles.PointParticles(len(x))
+  part.x = x
+  if v is not None:
+    part.v = v
+  part.mass = mass
+  part.t = 0
+  b = box.Box(0.0, length, t=t, tilt=tilt)
+  neigh = neighbour.VerletList(b, rcut, skin)
+  lj = interaction.LennardJones(rcut, 1.0, 1.0, shift_style)
+  integ = integrator.VelVerlet(dt)
+  return simulation.Simulation(part, b, integ, neigh, lj)
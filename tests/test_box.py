@@ -60,3 +60,60 @@ class TestIntegrator(unittest.TestCase):
     x, v = b.wrap_boundary(self.x, self.v)
     np.testing.assert_array_almost_equal(x, self.x_fbc)
     np.testing.assert_array_almost_equal(v, self.v_fbc)
+
+  def test_minimum_image(self):
+    """Minimum image distances."""
+    b = box.Box(self.x0, self.xf, t='Periodic')
+    delr = np.array([[4.0, -3.0, 1.0]], dtype=np.float32)
+    np.testing.assert_array_almost_equal(b.minimum_image(delr.copy()),
+                                         [[-1.0, 2.0, 1.0]])
+    b = box.Box(self.x0, self.xf, t='Fixed')
+    np.testing.assert_array_almost_equal(b.minimum_image(delr.copy()), delr)
+
+  def test_wrap_periodic_images(self):
+    """Wrap through PBC keeping track of the images."""
+    b = box.Box(self.x0, self.xf, t='Periodic')
+    x = self.x.copy()
+    x[0, 0] = 5.0e4
+    img = np.zeros((2, 3), dtype=np.int32)
+    unwrapped = x.copy()
+    x, v = b.wrap_boundary(x, self.v, img)
+    np.testing.assert_array_equal(img, [[10000, 1, 0], [1, -1, -3]])
+    assert np.all(x >= b.x0) and np.all(x <= b.xf)
+    np.testing.assert_array_almost_equal(x[1], self.x_pbc[1])
+    np.testing.assert_allclose(b.unwrap(x, img), unwrapped, atol=1e-2)
+
+  def test_triclinic(self):
+    """Wrap and minimum image in a triclinic box."""
+    b = box.Box(0.0, 4.0, t='Periodic', tilt=[1.0, 0.5, -1.5])
+    assert b.triclinic
+    np.testing.assert_array_almost_equal(np.dot(b.h, b.hinv), np.eye(3))
+    rng = np.random.RandomState(6)
+    x = rng.uniform(-10.0, 10.0, size=(50, 3)).astype(np.float32)
+    v = np.zeros_like(x)
+    img = np.zeros((50, 3), dtype=np.int32)
+    xw, v = b.wrap_boundary(x.copy(), v, img)
+    s = np.dot(xw - b.x0, b.hinv.T)
+    assert np.all(s > -1e-5) and np.all(s < 1 + 1e-5)
+    np.testing.assert_allclose(b.unwrap(xw, img), x, atol=1e-4)
+    delr = b.minimum_image(x[1:] - x[:-1])
+    s = np.dot(delr, b.hinv.T)
+    assert np.all(np.abs(s) <= 0.5 + 1e-5)
+
+  def test_triclinic_fixed(self):
+    """Triclinic boxes are only periodic."""
+    assert_raises(ValueError, box.Box, 0.0, 4.0, 'Fixed', [1.0, 0.0, 0.0])
+    assert not box.Box(0.0, 4.0, tilt=[0.0, 0.0, 0.0]).triclinic
+
+  def test_triclinic_tilt(self):
+    """Tilts beyond half the box length are rejected."""
+    assert_raises(ValueError, box.Box, 0.0, 4.0, 'Periodic', [2.5, 0.0, 0.0])
+    assert_raises(ValueError, box.Box, 0.0, [4.0, 2.0, 4.0], 'Periodic',
+                  [0.0, 0.0, 1.5])
+    b = box.Box(0.0, 4.0, tilt=[2.0, -2.0, 2.0])
+    assert b.cell is b.cell
+    b.xf = 6.0
+    np.testing.assert_array_almost_equal(np.dot(b.h, b.hinv), np.eye(3))
+    np.testing.assert_array_almost_equal(b.cell[:9], b.h.ravel())
+    assert_raises(ValueError, setattr, b, 'xf', 3.0)
+    np.testing.assert_array_equal(b.xf, [6.0, 6.0, 6.0])
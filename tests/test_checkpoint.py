@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `Checkpoint` module."""
+
+
+import os
+import shutil
+import tempfile
+import unittest
+from nose.tools import assert_equals, assert_raises
+
+from pexmd import checkpoint, neighbour
+from tests import helpers
+import numpy as np
+
+class TestCheckpoint(unittest.TestCase):
+  """Tests for `Checkpoint` module."""
+
+  def setUp(self):
+    """Set up test fixtures, if any."""
+    self.tmp = tempfile.mkdtemp()
+    self.fname = os.path.join(self.tmp, 'state.chk')
+    self.x = helpers.lattice()
+    self.v = helpers.velocities(self.x, 3)
+
+  def tearDown(self):
+    """Tear down test fixtures, if any."""
+    shutil.rmtree(self.tmp)
+
+  def build(self):
+    return helpers.build(self.x, self.v)
+
+  def test_restart(self):
+    for native in (True, False):
+      sim = self.build()
+      sim.native = native
+      sim.run(50)
+      rng = np.random.RandomState(11)
+      checkpoint.save(self.fname, sim, rng)
+      expected = rng.random_sample(3)
+      sim.run(50)
+
+      again = self.build()
+      again.native = native
+      again.particles.x += 1.0
+      checkpoint.restore(self.fname, again, rng)
+      assert_equals(again.step, 50)
+      np.testing.assert_array_equal(rng.random_sample(3), expected)
+      nbuilds = again.neighbour.nbuilds
+      again.run(50)
+      assert_equals(again.step, 100)
+      np.testing.assert_array_equal(again.particles.x, sim.particles.x)
+      np.testing.assert_array_equal(again.particles.v, sim.particles.v)
+      assert_equals(again.neighbour.nbuilds - nbuilds,
+                    sim.neighbour.nbuilds - nbuilds)
+
+  def test_load(self):
+    sim = self.build()
+    sim.particles.delete([0, 1])
+    gen = np.random.default_rng(5)
+    checkpoint.save(self.fname, sim, gen)
+    assert not os.path.exists(self.fname + '.tmp')
+    meta, arrays = checkpoint.load(self.fname)
+    assert_equals(meta['particles']['n'], len(self.x) - 2)
+    assert_equals(meta['box']['t'], 'Periodic')
+    x = arrays['particles._x']
+    assert isinstance(x.base, np.memmap)
+    assert not x.flags.writeable
+    np.testing.assert_array_equal(x, sim.particles.x)
+    expected = gen.random(2)
+    again = self.build()
+    checkpoint.restore(self.fname, again, gen)
+    np.testing.assert_array_equal(gen.random(2), expected)
+    np.testing.assert_array_equal(again.particles.idx, sim.particles.idx)
+    assert_equals(again.particles.insert([[0.0, 0.0, 0.0]])[0], len(self.x))
+
+  def test_wrong_class(self):
+    sim = self.build()
+    checkpoint.save(self.fname, sim)
+    sim.neighbour = neighbour.LinkedCell(sim.box, 2.5)
+    assert_raises(ValueError, checkpoint.restore, self.fname, sim)
+
+  def test_checkpointer(self):
+    sim = self.build()
+    chk = checkpoint.Checkpointer(self.fname, every=20)
+    sim.run(60, callback=chk, every=10)
+    assert_equals(chk.nsaves, 3)
+    assert_equals(chk.last_step, 50)
+    meta, arrays = checkpoint.load(self.fname)
+    assert_equals(meta['step'], 50)
+    chk = checkpoint.Checkpointer(self.fname, interval=3600.0)
+    sim.run(20, callback=chk, every=10)
+    assert_equals(chk.nsaves, 0)
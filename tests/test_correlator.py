@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `Correlator` module."""
+
+
+import unittest
+from nose.tools import assert_equals, assert_raises
+
+from pexmd import analysis, particles, box
+import numpy as np
+
+class TestCorrelator(unittest.TestCase):
+  """Tests for `Correlator` module."""
+
+  def setUp(self):
+    """Set up test fixtures, if any."""
+    rng = np.random.RandomState(4)
+    self.a = np.cumsum(rng.normal(size=(300, 20, 3)), axis=0)
+
+  def brute(self, lag, kind):
+    a, b = self.a[:len(self.a) - lag], self.a[lag:]
+    if kind == 'product':
+      return np.mean(np.sum(a*b, axis=2))
+    return np.mean(np.sum((b - a)**2, axis=2))
+
+  def test_first_level_is_exact(self):
+    for kind in ('product', 'displacement'):
+      corr = analysis.Correlator(nlevels=4, p=8, m=2, kind=kind)
+      for a in self.a:
+        corr.push(a)
+      tau, values = corr.result()
+      np.testing.assert_array_equal(tau[:8], np.arange(8))
+      for lag in range(8):
+        np.testing.assert_allclose(values[lag], self.brute(lag, kind))
+
+  def test_displacements_are_exact(self):
+    corr = analysis.Correlator(nlevels=5, p=4, m=2, kind='displacement',
+                               coarsen='last', dt=0.5)
+    for a in self.a:
+      corr.push(a)
+    assert_equals(corr.buffers.shape, (5, 4, 20, 3))
+    tau, values = corr.result()
+    assert_equals(tau[-1], 0.5*3*2**4)
+    expected = []
+    for level in range(5):
+      # Each level keeps the last sample of every block of 2**level
+      sub = self.a[2**level - 1::2**level]
+      for lag in range(0 if level == 0 else 2, 4):
+        d = sub[lag:] - sub[:len(sub) - lag]
+        expected.append(np.mean(np.sum(d**2, axis=2)))
+    np.testing.assert_allclose(values, expected)
+
+  def test_msd(self):
+    part = particles.PointParticles(10)
+    b = box.Box(0.0, 5.0)
+    v = np.random.RandomState(0).normal(size=(10, 3)).astype(np.float32)
+    part.x = np.full((10, 3), 2.5)
+    part.v = v
+    msd = analysis.MSD(b, nlevels=4, p=4, m=2, dt=0.1)
+    vacf = analysis.VACF(nlevels=4, p=4, m=2, dt=0.1)
+    for step in range(40):
+      msd.sample(part)
+      vacf.sample(part)
+      part.x += 0.1*v
+      b.wrap_boundary(part.x, part.v, part.img)
+      order = np.random.RandomState(step).permutation(10)
+      part.reorder(order)
+      v = v[order]
+    tau, values = msd.result()
+    vsq = np.mean(np.sum(part.v**2, axis=1))
+    np.testing.assert_allclose(values, vsq*tau**2, rtol=1e-4, atol=1e-6)
+    tau, values = vacf.result()
+    np.testing.assert_allclose(values, vsq, rtol=1e-5)
+
+  def test_wrong_sample(self):
+    assert_raises(ValueError, analysis.Correlator, p=5, m=2)
+    corr = analysis.Correlator()
+    corr.push(np.zeros((4, 3)))
+    assert_raises(ValueError, corr.push, np.zeros((5, 3)))
@@ -7,7 +7,7 @@
 import unittest
 from nose.tools import assert_equals, assert_raises
 
-from pexmd import integrator
+from pexmd import integrator, particles
 import numpy as np
 
 class TestIntegrator(unittest.TestCase):
@@ -55,3 +55,30 @@ class TestIntegrator(unittest.TestCase):
     x, v = integ.last_step(self.x, self.v, self.a)
     np.testing.assert_array_almost_equal(x, self.x)
     np.testing.assert_array_almost_equal(v, self.v+0.5*0.1*self.a)
+
+  def test_inplace_velverlet(self):
+    integ = integrator.VelVerlet(0.1)
+    part = particles.PointParticles(2)
+    part.x = self.x
+    part.v = self.v
+    part.mass = 2.0
+    part.f = 2.0*self.a
+    x, v = part.x, part.v
+    integ.first_step_inplace(part)
+    assert part.x is x and part.v is v
+    np.testing.assert_array_almost_equal(part.x, self.x + 0.1*self.v + 0.5*self.a*0.01)
+    np.testing.assert_array_almost_equal(part.v, self.v + 0.5*0.1*self.a)
+    integ.last_step_inplace(part)
+    assert part.x is x and part.v is v
+    np.testing.assert_array_almost_equal(part.v, self.v + 0.1*self.a)
+
+  def test_inplace_integrator(self):
+    integ = integrator.Integrator(0.1)
+    part = particles.PointParticles(2)
+    part.x = self.x
+    part.v = self.v
+    part.mass = 1.0
+    integ.first_step_inplace(part)
+    integ.last_step_inplace(part)
+    np.testing.assert_array_almost_equal(part.x, self.x)
+    np.testing.assert_array_almost_equal(part.v, self.v)
@@ -6,7 +6,7 @@
 
 import unittest
 
-from pexmd import interaction
+from pexmd import interaction, box
 import numpy as np
 
 class TestInteraction(unittest.TestCase):
@@ -94,3 +94,220 @@ class TestInteraction(unittest.TestCase):
     force_by_hand = np.array([[24.0, 0.0, 0.0], [-0.181641, 0.0, 0.0],
                               [-23.818359, 0.0, 0.0], [0.0, 0.0, 0.0]])
     np.testing.assert_array_almost_equal(f, force_by_hand)
+
+  def test_lj_forces_threads(self):
+    rng = np.random.RandomState(0)
+    x = rng.uniform(0.0, 6.0, size=(300, 3)).astype(np.float32)
+    serial = interaction.LennardJones(2.5, 1.0, 1.0, "None")
+    threaded = interaction.LennardJones(2.5, 1.0, 1.0, "None", nthreads=4)
+    pairs = np.array([(i, j) for i in range(300) for j in range(i+1, 300)
+                      if np.sum((x[i] - x[j])**2) > 0.8], dtype=np.int64)
+    f1, e1 = serial.forces(x, x, pairs)
+    f4, e4 = threaded.forces(x, x, pairs)
+    np.testing.assert_allclose(f4, f1, rtol=1e-4, atol=1e-3)
+    np.testing.assert_allclose(e4, e1, rtol=1e-4)
+    # The per-thread buffers are kept, and cleared, between calls
+    buffer = threaded._buffer
+    f4, e4 = threaded.forces(x, x, pairs, compute=interaction.PERATOM)
+    assert threaded._buffer is buffer
+    np.testing.assert_allclose(f4, f1, rtol=1e-4, atol=1e-3)
+    threaded.nthreads = 6
+    f6, e6 = threaded.forces(x, x, pairs)
+    self.assertEqual(len(threaded._buffer), 6*4*300)
+    np.testing.assert_allclose(f6, f1, rtol=1e-4, atol=1e-3)
+
+  def test_lj_forces_periodic(self):
+    b = box.Box(0.0, 10.0, t='Periodic')
+    x = np.array([[0.5, 5.0, 5.0], [9.5, 5.0, 5.0]], dtype=np.float32)
+    x_inside = np.array([[5.5, 5.0, 5.0], [4.5, 5.0, 5.0]], dtype=np.float32)
+    pairs = np.array([[0, 1]], dtype=np.int64)
+    for nthreads in (1, 2):
+      lj = interaction.LennardJones(2.5, 1.0, 1.0, "None", nthreads=nthreads)
+      f, e = lj.forces(x, x, pairs, box=b)
+      f_ref, e_ref = lj.forces(x_inside, x_inside, pairs)
+      np.testing.assert_array_almost_equal(f, f_ref)
+      np.testing.assert_almost_equal(e, e_ref)
+      f, e = lj.forces(x, x, pairs)
+      np.testing.assert_array_almost_equal(f, np.zeros_like(x))
+
+  def test_lj_forces_triclinic(self):
+    b = box.Box(0.0, 6.0, t='Periodic', tilt=[2.0, 0.0, 0.0])
+    x = np.array([[0.5, 0.5, 3.0], [1.5, 5.5, 3.0]], dtype=np.float32)
+    pairs = np.array([[0, 1]], dtype=np.int64)
+    delr = b.minimum_image(x[:1] - x[1:])
+    x_ref = np.array([[0.0, 0.0, 0.0], -delr[0]], dtype=np.float32)
+    lj = interaction.LennardJones(2.5, 1.0, 1.0)
+    f, e = lj.forces(x, x, pairs, box=b)
+    f_ref, e_ref = lj.forces(x_ref, x_ref, pairs)
+    assert np.any(f_ref != 0)
+    np.testing.assert_array_almost_equal(f, f_ref)
+    np.testing.assert_almost_equal(e, e_ref)
+
+  def test_shortrange_batch(self):
+    rng = np.random.RandomState(2)
+    x = rng.uniform(0.0, 4.0, size=(60, 3)).astype(np.float32)
+    b = box.Box(0.0, 4.0, t='Periodic')
+    pairs = np.array([(i, j) for i in range(60) for j in range(i+1, 60)],
+                     dtype=np.int64)
+    lj = interaction.LennardJones(1.5, 1.0, 0.5, "Displace")
+    assert lj.batched
+    f, e = interaction.ShortRange.forces(lj, x, x, pairs, box=b)
+    f_ref, e_ref = lj.forces(x, x, pairs, box=b)
+    np.testing.assert_allclose(f, f_ref, rtol=1e-4, atol=1e-3)
+    np.testing.assert_allclose(e, e_ref, rtol=1e-4)
+
+  def test_shortrange_per_pair(self):
+    class Spring(interaction.ShortRange):
+      def pair_force(self, s1, s2):
+        return s2 - s1
+      def pair_energ(self, s1, s2):
+        return 0.5*np.sum((s1 - s2)**2)
+    spring = Spring(5.4)
+    assert not spring.batched
+    f, e = spring.forces(self.three_by3, self.three_by3)
+    np.testing.assert_array_almost_equal(f, [[0.0, 0.0, 0.0], [-3.0, 0.0, 0.0],
+                                             [3.0, 0.0, 0.0]])
+    np.testing.assert_almost_equal(e, 3.0)
+    delr = np.array([[1.0, 0.0, 0.0], [0.0, -2.0, 0.0]])
+    r2 = np.sum(delr**2, axis=1)
+    np.testing.assert_array_almost_equal(spring.pair_force_batch(r2, delr),
+                                         -delr)
+    np.testing.assert_array_almost_equal(spring.pair_energ_batch(r2),
+                                         [0.5, 2.0])
+
+  def test_tabulated_lj(self):
+    rng = np.random.RandomState(3)
+    x = rng.uniform(0.0, 5.0, size=(100, 3)).astype(np.float32)
+    b = box.Box(0.0, 5.0, t='Periodic')
+    pairs = np.array([(i, j) for i in range(100) for j in range(i+1, 100)],
+                     dtype=np.int64)
+    delr = b.minimum_image(x[pairs[:, 0]] - x[pairs[:, 1]])
+    pairs = pairs[np.sum(delr**2, axis=1) > 0.9**2]
+    lj = interaction.LennardJones(2.5, 1.0, 1.0, "Displace")
+    energy = lambda r: 4*(r**-12 - r**-6)
+    force = lambda r: 24*(2*r**-13 - r**-7)
+    f_ref, e_ref = lj.forces(x, x, pairs, box=b)
+    tab = interaction.Tabulated(2.5, energy, force, rmin=0.8, ntable=4000,
+                                shift_style="Displace")
+    f, e = tab.forces(x, x, pairs, box=b)
+    np.testing.assert_allclose(f, f_ref, rtol=1e-3, atol=1e-2)
+    np.testing.assert_allclose(e, e_ref, rtol=1e-3)
+    tab = interaction.Tabulated(2.5, energy, rmin=0.8, ntable=4000,
+                                shift_style="Displace")
+    f, e = tab.forces(x, x, pairs, box=b)
+    np.testing.assert_allclose(f, f_ref, rtol=1e-3, atol=1e-2)
+    f, e = interaction.ShortRange.forces(tab, x, x, pairs, box=b)
+    np.testing.assert_allclose(f, f_ref, rtol=1e-3, atol=1e-2)
+
+  def test_tabulated_arrays(self):
+    r = np.linspace(0.8, 2.5, 500)
+    tab = interaction.Tabulated(2.5, 4*(r**-12 - r**-6), 24*(2*r**-13 - r**-7),
+                                r=r, ntable=2000)
+    lj = interaction.LennardJones(2.5, 1.0, 1.0, "None")
+    x = np.array([[0.0, 0.0, 0.0], [1.1, 0.0, 0.0], [0.0, 1.3, 0.4]],
+                 dtype=np.float32)
+    pairs = np.array([[0, 1], [0, 2], [1, 2]], dtype=np.int64)
+    f, e = tab.forces(x, x, pairs)
+    f_ref = lj.forces(x, x, pairs)[0]
+    np.testing.assert_allclose(f, f_ref, rtol=1e-3, atol=1e-3)
+    e_ref = sum(lj.pair_energ(x[i], x[j]) for i, j in pairs)
+    np.testing.assert_allclose(e, e_ref, rtol=1e-3)
+    self.assertRaises(ValueError, interaction.Tabulated, 2.5,
+                      4*(r**-12 - r**-6))
+    self.assertRaises(ValueError, interaction.Tabulated, 2.5,
+                      lambda r: 4*(r**-12 - r**-6), 24*(2*r**-13 - r**-7))
+
+  def test_lj_per_type(self):
+    rng = np.random.RandomState(4)
+    x = rng.uniform(0.0, 5.0, size=(80, 3)).astype(np.float32)
+    t = rng.randint(0, 2, size=80).astype(np.int32)
+    b = box.Box(0.0, 5.0, t='Periodic')
+    pairs = np.array([(i, j) for i in range(80) for j in range(i+1, 80)],
+                     dtype=np.int64)
+    delr = b.minimum_image(x[pairs[:, 0]] - x[pairs[:, 1]])
+    pairs = pairs[np.sum(delr**2, axis=1) > 0.8]
+    eps = np.array([[1.0, 1.5], [1.5, 0.5]])
+    sigma = np.array([[1.0, 0.9], [0.9, 0.8]])
+    rcut = np.array([[2.5, 2.2], [2.2, 2.0]])
+    f_ref = np.zeros_like(x)
+    e_ref = 0.0
+    for t1 in range(2):
+      for t2 in range(2):
+        sel = (t[pairs[:, 0]] == t1) & (t[pairs[:, 1]] == t2)
+        lj = interaction.LennardJones(rcut[t1, t2], eps[t1, t2], sigma[t1, t2])
+        f, e = lj.forces(x, x, pairs[sel], box=b)
+        f_ref += f
+        e_ref += e
+    for nthreads in (1, 3):
+      lj = interaction.LennardJones(rcut, eps, sigma, nthreads=nthreads)
+      f, e = lj.forces(x, x, pairs, box=b, t=t)
+      np.testing.assert_allclose(f, f_ref, rtol=1e-4, atol=1e-3)
+      np.testing.assert_allclose(e, e_ref, rtol=1e-4)
+    self.assertRaises(ValueError, lj.forces, x, x, pairs)
+    self.assertRaises(ValueError, lj.pair_force, x[0], x[1])
+    self.assertRaises(ValueError, lj.pair_energ, x[0], x[1])
+    self.assertRaises(ValueError, interaction.ShortRange.forces, lj, x, x,
+                      pairs, box=b, t=t)
+
+  def test_lj_params_cached(self):
+    lj = interaction.LennardJones(2.5, 1.0, 1.0)
+    params = lj.params()
+    assert lj.params() is params
+    lj.eps = 2.0
+    assert lj.params() is not params
+    np.testing.assert_allclose(lj.params()[:4], 2*params[:4])
+    lj.rcut = 2.0
+    np.testing.assert_allclose(lj.params()[4], 4.0)
+
+  def test_lj_mixing(self):
+    lj = interaction.LennardJones(2.5, [1.0, 4.0], [1.0, 2.0],
+                                  mixing='Lorentz-Berthelot')
+    np.testing.assert_array_almost_equal(lj.eps, [[1.0, 2.0], [2.0, 4.0]])
+    np.testing.assert_array_almost_equal(lj.sigma, [[1.0, 1.5], [1.5, 2.0]])
+    assert lj.typed
+    lj = interaction.LennardJones(2.5, [1.0, 4.0], [1.0, 4.0],
+                                  mixing='Geometric')
+    np.testing.assert_array_almost_equal(lj.sigma, [[1.0, 2.0], [2.0, 4.0]])
+    self.assertRaises(ValueError, interaction.LennardJones, 2.5,
+                      [[1.0, 2.0], [1.0, 1.0]], 1.0)
+
+  def test_compute_flags(self):
+    rng = np.random.RandomState(4)
+    x = rng.uniform(0.0, 5.0, size=(120, 3)).astype(np.float32)
+    b = box.Box(0.0, 5.0, t='Periodic')
+    pairs = np.array([(i, j) for i in range(120) for j in range(i+1, 120)],
+                     dtype=np.int64)
+    delr = b.minimum_image(x[pairs[:, 0]] - x[pairs[:, 1]])
+    pairs = pairs[np.sum(delr**2, axis=1) > 0.9**2]
+    everything = (interaction.ENERGY | interaction.VIRIAL |
+                  interaction.PERATOM)
+    ref = interaction.LennardJones(2.5, 1.0, 1.0, "Displace")
+    f_ref, e_ref = interaction.ShortRange.forces(ref, x, x, pairs, box=b,
+                                                 compute=everything)
+    tab = interaction.Tabulated(2.5, lambda r: 4*(r**-12 - r**-6),
+                                lambda r: 24*(2*r**-13 - r**-7), rmin=0.8,
+                                ntable=4000, shift_style="Displace")
+    for inter in (interaction.LennardJones(2.5, 1.0, 1.0, "Displace"),
+                  interaction.LennardJones(2.5, 1.0, 1.0, "Displace",
+                                           nthreads=3), tab):
+      f, e = inter.forces(x, x, pairs, box=b, compute=interaction.FORCES)
+      np.testing.assert_allclose(f, f_ref, rtol=1e-3, atol=1e-2)
+      assert e == 0.0
+      assert inter.virial is None and inter.peratom is None
+      f, e = inter.forces(x, x, pairs, box=b, compute=everything)
+      np.testing.assert_allclose(e, e_ref, rtol=1e-3)
+      np.testing.assert_allclose(inter.virial, ref.virial, rtol=1e-3,
+                                 atol=1e-2)
+      np.testing.assert_allclose(inter.virial, inter.virial.T)
+      np.testing.assert_allclose(inter.peratom, ref.peratom, rtol=1e-3,
+                                 atol=1e-3)
+      np.testing.assert_allclose(np.sum(inter.peratom), e, rtol=1e-4)
+      f, e = inter.forces(x, x, pairs, box=b, compute=interaction.PERATOM)
+      assert e == 0.0
+      np.testing.assert_allclose(inter.peratom, ref.peratom, rtol=1e-3,
+                                 atol=1e-3)
+    w = np.zeros((3, 3))
+    for i, j in pairs:
+      d = b.minimum_image((x[i] - x[j])[np.newaxis].copy())[0]
+      w += np.outer(d, ref.pair_force(d, np.zeros(3)))
+    np.testing.assert_allclose(ref.virial, w, rtol=1e-3, atol=1e-2)
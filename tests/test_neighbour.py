@@ -6,7 +6,7 @@
 
 import unittest
 from nose.tools import assert_equals
-from pexmd import neighbour
+from pexmd import neighbour, box
 import numpy as np
 
 class TestNeighbour(unittest.TestCase):
@@ -54,3 +54,137 @@ class TestNeighbour(unittest.TestCase):
     np.testing.assert_array_equal(pair, [(2, 3)])
     pair = self.neighall.build_list(None, self.two_two_types)
     np.testing.assert_array_equal(pair, self.pair_all)
+
+class TestLinkedCell(unittest.TestCase):
+  """Tests for `LinkedCell` neighbour list."""
+
+  def setUp(self):
+    """Set up test fixtures, if any."""
+    rng = np.random.RandomState(0)
+    self.x = rng.uniform(0.0, 5.0, size=(200, 3)).astype(np.float32)
+    self.t = rng.randint(1, 3, size=200)
+    self.rcut = 1.2
+
+  def brute_force(self, b, types=None):
+    pairs = []
+    l = b.xf - b.x0
+    for i in range(len(self.x)):
+      for j in range(i+1, len(self.x)):
+        delr = self.x[i] - self.x[j]
+        if b.t == 'Periodic':
+          delr -= l*np.round(delr/l)
+        if np.sum(delr**2) < self.rcut**2:
+          pairs.append((i, j))
+    return pairs
+
+  def as_set(self, pairs):
+    return set(tuple(p) for p in pairs)
+
+  def test_fixed(self):
+    b = box.Box(0.0, 5.0, t='Fixed')
+    neigh = neighbour.LinkedCell(b, self.rcut)
+    pairs = neigh.build_list(self.x, self.t)
+    assert_equals(pairs.dtype, np.int64)
+    assert_equals(pairs.shape[1], 2)
+    assert_equals(len(pairs), len(self.brute_force(b)))
+    assert_equals(self.as_set(pairs), set(self.brute_force(b)))
+
+  def test_periodic(self):
+    b = box.Box(0.0, 5.0, t='Periodic')
+    neigh = neighbour.LinkedCell(b, self.rcut)
+    pairs = neigh.build_list(self.x, self.t)
+    assert_equals(len(pairs), len(self.brute_force(b)))
+    assert_equals(self.as_set(pairs), set(self.brute_force(b)))
+
+  def test_triclinic(self):
+    b = box.Box(0.0, 5.0, t='Periodic', tilt=[1.5, -1.0, 0.5])
+    x = b.wrap_boundary(self.x.copy(), np.zeros_like(self.x))[0]
+    neigh = neighbour.LinkedCell(b, self.rcut)
+    pairs = neigh.build_list(x, self.t)
+    allpairs = np.array([(i, j) for i in range(len(x))
+                         for j in range(i+1, len(x))])
+    delr = b.minimum_image(x[allpairs[:, 0]] - x[allpairs[:, 1]])
+    expected = allpairs[np.sum(delr**2, axis=1) < self.rcut**2]
+    assert_equals(self.as_set(pairs), self.as_set(expected))
+
+  def test_sparse_large_box(self):
+    for t in ('Fixed', 'Periodic'):
+      b = box.Box(0.0, 5000.0, t=t)
+      x = np.random.RandomState(4).uniform(0.0, 5000.0, size=(100, 3))
+      x[1] = x[0] + 0.5
+      x = x.astype(np.float32)
+      neigh = neighbour.LinkedCell(b, 1.0)
+      pairs = neigh.build_list(x, np.zeros(100, dtype=np.int32))
+      np.testing.assert_array_equal(pairs, [[0, 1]])
+
+  def test_small_periodic(self):
+    b = box.Box(0.0, 5.0, t='Periodic')
+    neigh = neighbour.LinkedCell(b, 2.4)
+    self.rcut = 2.4
+    pairs = neigh.build_list(self.x, self.t)
+    assert_equals(self.as_set(pairs), set(self.brute_force(b)))
+
+  def test_types(self):
+    b = box.Box(0.0, 5.0, t='Periodic')
+    allpairs = self.brute_force(b)
+    neigh = neighbour.LinkedCell(b, self.rcut, [2, 2])
+    pairs = neigh.build_list(self.x, self.t)
+    expected = set((i, j) for i, j in allpairs
+                   if self.t[i] == 2 and self.t[j] == 2)
+    assert_equals(self.as_set(pairs), expected)
+    neigh = neighbour.LinkedCell(b, self.rcut, [2, 1])
+    pairs = neigh.build_list(self.x, self.t)
+    np.testing.assert_array_equal(self.t[pairs[:, 0]], 2)
+    np.testing.assert_array_equal(self.t[pairs[:, 1]], 1)
+    expected = set((i, j) if self.t[i] == 2 else (j, i) for i, j in allpairs
+                   if self.t[i] != self.t[j])
+    assert_equals(self.as_set(pairs), expected)
+
+class TestVerletList(unittest.TestCase):
+  """Tests for `VerletList` neighbour list."""
+
+  def setUp(self):
+    """Set up test fixtures, if any."""
+    rng = np.random.RandomState(1)
+    self.x = rng.uniform(0.0, 5.0, size=(100, 3)).astype(np.float32)
+    self.t = np.ones(100, dtype=np.int32)
+    self.box = box.Box(0.0, 5.0, t='Periodic')
+
+  def test_build_with_skin(self):
+    neigh = neighbour.VerletList(self.box, 1.0, 0.3)
+    pairs = neigh.build_list(self.x, self.t)
+    cell = neighbour.LinkedCell(self.box, 1.3)
+    expected = cell.build_list(self.x, self.t)
+    assert_equals(set(map(tuple, pairs)), set(map(tuple, expected)))
+    assert_equals(neigh.nbuilds, 1)
+
+  def test_reuse(self):
+    neigh = neighbour.VerletList(self.box, 1.0, 0.3)
+    pairs = neigh.build_list(self.x, self.t)
+    x = self.x.copy()
+    x[0, 0] += 0.1
+    assert neigh.build_list(x, self.t) is pairs
+    assert_equals(neigh.nbuilds, 1)
+    x[0, 0] += 0.1
+    assert neigh.build_list(x, self.t) is not pairs
+    assert_equals(neigh.nbuilds, 2)
+
+  def test_reuse_across_boundary(self):
+    neigh = neighbour.VerletList(self.box, 1.0, 0.3)
+    x = self.x.copy()
+    x[0, 0] = 4.99
+    neigh.build_list(x, self.t)
+    x[0, 0] = 0.01
+    neigh.build_list(x, self.t)
+    assert_equals(neigh.nbuilds, 1)
+
+  def test_remap(self):
+    neigh = neighbour.VerletList(self.box, 1.0, 0.3)
+    pairs = neigh.build_list(self.x, self.t)
+    expected = set(map(tuple, np.sort(pairs, axis=1)))
+    order = np.random.RandomState(2).permutation(len(self.x))
+    neigh.remap(order)
+    assert neigh.build_list(self.x[order], self.t) is pairs
+    remapped = set(map(tuple, np.sort(order[pairs], axis=1)))
+    assert_equals(remapped, expected)
+    assert_equals(neigh.nbuilds, 1)
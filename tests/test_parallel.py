@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `Decomposition` module."""
+
+
+import os
+import signal
+import unittest
+from multiprocessing import shared_memory
+
+from pexmd import parallel, box
+from tests import helpers
+import numpy as np
+
+class TestDecomposition(unittest.TestCase):
+  """Tests for `Decomposition` module."""
+
+  def setUp(self):
+    """Set up test fixtures, if any."""
+    self.x = helpers.lattice(5, 1.6, 0.4)
+    self.v = helpers.velocities(self.x, 7)
+
+  def simulation(self, t):
+    return helpers.build(self.x, self.v, length=8.0, t=t, shift_style='None')
+
+  def build(self, t):
+    sim = self.simulation(t)
+    return sim.particles, sim.box, sim.integrator, sim.interaction
+
+  def reference(self, t, nsteps):
+    sim = self.simulation(t)
+    sim.native = False
+    sim.run(nsteps)
+    return sim
+
+  def test_matches_serial(self):
+    for t, grid in (('Periodic', (2, 1, 1)), ('Periodic', (2, 2, 1)),
+                    ('Fixed', (1, 2, 2))):
+      sim = self.reference(t, 60)
+      part, b, integ, lj = self.build(t)
+      with parallel.DomainDecomposition(part, b, integ, lj, grid=grid) as dd:
+        dd.run(30)
+        energ = dd.run(30)
+      np.testing.assert_allclose(part.x, sim.particles.x, atol=1e-3)
+      np.testing.assert_allclose(part.v, sim.particles.v, atol=1e-3)
+      np.testing.assert_array_equal(part.img, sim.particles.img)
+      np.testing.assert_allclose(energ, sim.energ, rtol=1e-4)
+
+  def test_domains(self):
+    part, b, integ, lj = self.build('Periodic')
+    with parallel.DomainDecomposition(part, b, integ, lj, grid=(2, 2, 2)) as dd:
+      np.testing.assert_array_equal(np.bincount(dd.arrays['owner']),
+                                    [27, 18, 18, 12, 18, 12, 12, 8])
+      lo, hi = dd.bounds(7)
+      np.testing.assert_array_almost_equal(lo, [4.0, 4.0, 4.0])
+      np.testing.assert_array_almost_equal(hi, [8.0, 8.0, 8.0])
+
+  def test_triclinic(self):
+    part, b, integ, lj = self.build('Periodic')
+    b = box.Box(0.0, 8.0, tilt=[1.0, 0.0, 0.0])
+    self.assertRaises(ValueError, parallel.DomainDecomposition, part, b,
+                      integ, lj)
+
+  def test_neighbours(self):
+    part, b, integ, lj = self.build('Periodic')
+    with parallel.DomainDecomposition(part, b, integ, lj, grid=(4, 1, 1)) as dd:
+      np.testing.assert_array_equal(dd.neighbours(0), [1, 2, 3])
+      np.testing.assert_array_equal(np.sort(dd.members([1])),
+                                    np.flatnonzero(dd.arrays['owner'] == 1))
+    part, b, integ, lj = self.build('Fixed')
+    with parallel.DomainDecomposition(part, b, integ, lj, grid=(8, 1, 1)) as dd:
+      np.testing.assert_array_equal(dd.neighbours(0), [1, 2, 3])
+      np.testing.assert_array_equal(dd.neighbours(4), [1, 2, 3, 5, 6, 7])
+
+  def test_worker_fails(self):
+    part, b, integ, lj = self.build('Periodic')
+    lj.forces = None
+    dd = parallel.DomainDecomposition(part, b, integ, lj, grid=(2, 1, 1))
+    name = dd._shm.name
+    self.assertRaises(RuntimeError, dd.run, 5)
+    dd.close()
+    self.assertRaises(FileNotFoundError, shared_memory.SharedMemory, name)
+
+  def test_worker_killed(self):
+    part, b, integ, lj = self.build('Periodic')
+    dd = parallel.DomainDecomposition(part, b, integ, lj, grid=(2, 1, 1))
+    name = dd._shm.name
+    dd.run(2)
+    os.kill(dd.workers[0].pid, signal.SIGKILL)
+    self.assertRaises(RuntimeError, dd.run, 5)
+    dd.close()
+    self.assertRaises(FileNotFoundError, shared_memory.SharedMemory, name)
+
+  def test_after_openmp(self):
+    import threading
+    sim = self.reference('Periodic', 20)
+    part, b, integ, lj = self.build('Periodic')
+    lj.nthreads = 2
+    # An OpenMP region in this process before starting the workers
+    lj.forces(part.x, part.v, box=b)
+    result = []
+    with parallel.DomainDecomposition(part, b, integ, lj) as dd:
+      runner = threading.Thread(target=lambda: result.append(dd.run(20)),
+                                daemon=True)
+      runner.start()
+      runner.join(timeout=60)
+      assert not runner.is_alive()
+    np.testing.assert_allclose(result[0], sim.energ, rtol=1e-4)
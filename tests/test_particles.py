@@ -82,6 +82,22 @@ class TestParticles(unittest.TestCase):
     part.mass = 2.0
     np.testing.assert_array_equal(part.a, self.four_by3/2)
 
+  def test_inverse_mass(self):
+    part = particles.PointParticles(4)
+    part.f = self.four_by3
+    part.mass = np.array([1.0, 2.0, 4.0, 8.0])
+    np.testing.assert_array_almost_equal(part.invmass, [1.0, 0.5, 0.25, 0.125])
+    out = np.empty((4, 3), dtype=np.float32)
+    assert part.accel(out) is out
+    np.testing.assert_array_almost_equal(out, self.four_by3/part.mass[:, np.newaxis])
+
+  def test_set_keeps_buffer(self):
+    part = particles.PointParticles(4)
+    x = part.x
+    part.x = self.four_by3
+    assert part.x is x
+    np.testing.assert_array_equal(x, self.four_by3)
+
   def test_modify_type(self):
     part = particles.PointParticles(4)
     part.t = np.array([1, 1, 2, 2], dtype=np.int32)
@@ -99,3 +115,130 @@ class TestParticles(unittest.TestCase):
     np.testing.assert_array_equal(part.mass, np.array([1, 1, 1, 1], dtype=np.float32))
     sttr = lambda mass: part.__setattr__("mass", mass)
     assert_raises(ValueError, sttr, np.array([1.0, 1.0, 1.0]))
+
+  def test_modify_image(self):
+    part = particles.PointParticles(4)
+    np.testing.assert_array_equal(part.img, np.zeros((4, 3)))
+    part.img = [[1, 0, 0]]*4
+    assert_equals(part.img.dtype, np.int32)
+    sttr = lambda img: part.__setattr__("img", img)
+    assert_raises(ValueError, sttr, np.zeros((3, 3)))
+
+  def test_morton(self):
+    cells = np.array([[0, 0, 0], [0, 0, 1], [0, 1, 0], [1, 0, 0], [1, 1, 1],
+                      [2, 0, 0]])
+    np.testing.assert_array_equal(particles.morton_codes(cells),
+                                  [0, 1, 2, 4, 7, 32])
+
+  def test_hilbert(self):
+    bits = 3
+    grid = np.arange(2**bits)
+    cells = np.array([(i, j, k) for i in grid for j in grid for k in grid])
+    codes = particles.hilbert_codes(cells, bits)
+    np.testing.assert_array_equal(np.sort(codes), np.arange(len(cells)))
+    path = cells[np.argsort(codes)]
+    np.testing.assert_array_equal(np.abs(np.diff(path, axis=0)).sum(axis=1), 1)
+
+  def test_reorder(self):
+    part = particles.PointParticles(4)
+    part.x = self.four_by3
+    part.v = 2*self.four_by3
+    part.mass = [1.0, 2.0, 3.0, 4.0]
+    x = part.x
+    part.reorder(np.array([2, 0, 3, 1]))
+    assert part.x is x
+    np.testing.assert_array_equal(part.x, self.four_by3[[2, 0, 3, 1]])
+    np.testing.assert_array_equal(part.v, 2*self.four_by3[[2, 0, 3, 1]])
+    np.testing.assert_array_equal(part.idx, [2, 0, 3, 1])
+    np.testing.assert_array_almost_equal(part.invmass, [1/3.0, 1.0, 0.25, 0.5])
+
+  def test_insert(self):
+    part = particles.PointParticles(4, capacity=5)
+    part.x = self.four_by3
+    part.mass = 2.0
+    idx = part.insert(self.three_by3, t=1, mass=4.0)
+    assert_equals(part.n, 7)
+    assert part.capacity >= 7
+    np.testing.assert_array_equal(idx, [4, 5, 6])
+    np.testing.assert_array_equal(part.x[:4], self.four_by3)
+    np.testing.assert_array_equal(part.x[4:], self.three_by3)
+    np.testing.assert_array_equal(part.t, [0, 0, 0, 0, 1, 1, 1])
+    np.testing.assert_array_almost_equal(part.invmass, [0.5]*4 + [0.25]*3)
+    x = part.x
+    part.insert([[5.0, 5.0, 5.0]])
+    assert_equals(part.n, 8)
+    assert x.base is part.x.base
+
+  def test_delete(self):
+    part = particles.PointParticles(4)
+    part.x = self.four_by3
+    part.delete([0, 3])
+    assert_equals(part.n, 2)
+    np.testing.assert_array_equal(part.idx, [2, 1])
+    np.testing.assert_array_equal(part.x, self.four_by3[[2, 1]])
+    assert_raises(IndexError, part.delete, [2])
+    idx = part.insert([[0.0, 0.0, 1.0]])
+    np.testing.assert_array_equal(idx, [4])
+
+  def test_remove(self):
+    part = particles.PointParticles(4)
+    part.x = self.four_by3
+    part.mass = [1.0, 2.0, 3.0, 4.0]
+    part.remove(1)
+    assert_equals(part.n, 3)
+    np.testing.assert_array_equal(part.idx, [0, 3, 2])
+    np.testing.assert_array_equal(part.x, self.four_by3[[0, 3, 2]])
+    np.testing.assert_array_almost_equal(part.invmass, [1.0, 0.25, 1/3.0])
+    assert_raises(IndexError, part.remove, 3)
+
+  def test_shared(self):
+    part = particles.PointParticles(4, capacity=6, shared=True)
+    part.x = self.four_by3
+    reader = particles.PointParticles.attach(part.name)
+    assert_equals(reader.n, 4)
+    np.testing.assert_array_equal(reader.x, self.four_by3)
+    with part.writing():
+      part.x[0, 0] = 5.0
+    assert_equals(reader.x[0, 0], 5.0)
+    part.insert([[1.0, 1.0, 1.0]])
+    frame, arrays = reader.snapshot(('x', 'idx'))
+    assert_equals(frame, 2)
+    assert_equals(reader.n, 5)
+    np.testing.assert_array_equal(arrays['idx'], np.arange(5))
+    assert_raises(ValueError, part.insert, np.zeros((2, 3)))
+    reader.close()
+    part.close()
+
+  def test_shared_across_processes(self):
+    import multiprocessing as mp
+    part = particles.PointParticles(4, shared=True)
+    part.x = self.four_by3
+    queue = mp.get_context('fork').Queue()
+    def read(name):
+      reader = particles.PointParticles.attach(name)
+      frame, arrays = reader.snapshot(('x',))
+      queue.put((frame, arrays['x']))
+      reader.close()
+    proc = mp.get_context('fork').Process(target=read, args=(part.name,))
+    proc.start()
+    frame, x = queue.get(timeout=10)
+    proc.join()
+    assert_equals(frame, 0)
+    np.testing.assert_array_equal(x, self.four_by3)
+    part.close()
+
+  def test_shared_other_process(self):
+    import subprocess
+    import sys
+    part = particles.PointParticles(4, shared=True)
+    part.x = self.four_by3
+    code = ("from pexmd import particles\n"
+            "reader = particles.PointParticles.attach({0!r})\n"
+            "print(reader.snapshot(('x',))[1]['x'].sum())\n"
+            "reader.close()\n").format(part.name)
+    out = subprocess.run([sys.executable, '-c', code], capture_output=True,
+                         check=True, text=True)
+    np.testing.assert_almost_equal(float(out.stdout), self.four_by3.sum())
+    assert 'leaked' not in out.stderr
+    part.x[0, 0] = 7.0
+    part.close()
@@ -22,3 +22,9 @@ class TestPexmd(unittest.TestCase):
         pexmd.box
         pexmd.integrator
         pexmd.interaction
+        pexmd.simulation
+        pexmd.profiler
+        pexmd.parallel
+        pexmd.trajectory
+        pexmd.checkpoint
+        pexmd.analysis
@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `Profiler` module."""
+
+
+import unittest
+from nose.tools import assert_equals
+
+from pexmd import profiler, neighbour
+from tests import helpers
+import numpy as np
+
+class TestProfiler(unittest.TestCase):
+  """Tests for `Profiler` module."""
+
+  def setUp(self):
+    """Set up test fixtures, if any."""
+    self.sim = helpers.build(helpers.lattice(3), length=4.5, rcut=2.0,
+                             shift_style='None')
+
+  def test_python_loop(self):
+    prof = profiler.Profiler()
+    self.sim.native = False
+    prof.attach(self.sim)
+    self.sim.run(10)
+    for section in ('Neigh', 'Force', 'Bound'):
+      assert_equals(prof.calls[section], 11 if section != 'Bound' else 10)
+    assert_equals(prof.calls['Integ'], 20)
+    assert_equals(prof.neigh_last, len(self.sim.pairs))
+    assert_equals(prof.pairs, 11*len(self.sim.pairs))
+    assert 'Force' in prof.summary()
+
+  def test_native_loop(self):
+    prof = profiler.Profiler()
+    prof.attach(self.sim)
+    self.sim.run(10, callback=lambda s: None, every=5)
+    assert_equals(prof.calls['Native'], 2)
+
+  def test_native_nested(self):
+    import time
+    self.sim.neighbour = neighbour.VerletList(self.sim.box, 2.0, 0.01)
+    self.sim.particles.v = np.random.RandomState(2).normal(
+      size=self.sim.particles.x.shape)
+    prof = profiler.Profiler()
+    prof.attach(self.sim)
+    t0 = time.perf_counter()
+    self.sim.run(50)
+    elapsed = time.perf_counter() - t0
+    assert prof.calls['Neigh'] > 2
+    assert sum(prof.time.values()) <= elapsed
+    other = prof.summary().splitlines()[2 + len(prof.time)]
+    assert other.startswith('Other')
+    assert float(other.split('|')[1]) >= 0.0
+
+  def test_phase(self):
+    prof = profiler.Profiler()
+    with prof.phase('Outer'):
+      with prof.phase('Inner'):
+        sum(range(10000))
+    assert_equals(prof.calls, {'Outer': 1, 'Inner': 1})
+    assert prof.time['Outer'] >= 0.0
+    assert_equals(prof.nested, [])
+
+  def test_detach(self):
+    prof = profiler.Profiler()
+    prof.attach(self.sim)
+    prof.detach()
+    assert 'build_list' not in vars(self.sim.neighbour)
+    self.sim.native = False
+    self.sim.run(2)
+    assert_equals(prof.calls, {})
@@ -0,0 +1,69 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `RDF` module."""
+
+
+import unittest
+from nose.tools import assert_equals, assert_raises
+
+from pexmd import analysis, box, neighbour, interaction
+from tests import helpers
+import numpy as np
+
+class TestRDF(unittest.TestCase):
+  """Tests for `RDF` module."""
+
+  def setUp(self):
+    """Set up test fixtures, if any."""
+    rng = np.random.RandomState(2)
+    self.box = box.Box(0.0, 8.0)
+    self.x = rng.uniform(0.0, 8.0, size=(400, 3)).astype(np.float32)
+    self.t = rng.randint(0, 2, size=400).astype(np.int32)
+    self.pairs = neighbour.LinkedCell(self.box, 3.0).build_list(self.x, self.t)
+
+  def test_kernel_matches_numpy(self):
+    for nthreads in (1, 2):
+      lj = interaction.LennardJones(3.0, 1.0, 0.1, nthreads=nthreads)
+      lj.rdf = analysis.RDF(3.0, nbins=30, ntypes=2)
+      lj.forces(self.x, None, self.pairs, box=self.box, t=self.t)
+      ref = analysis.RDF(3.0, nbins=30, ntypes=2)
+      ref.accumulate(self.x, self.pairs, self.box, self.t)
+      np.testing.assert_array_equal(lj.rdf.hist, ref.hist)
+      assert_equals(lj.rdf.nsamples, 1)
+      assert_equals(lj.rdf.hist.sum(), len(self.pairs))
+
+  def test_ideal_gas(self):
+    rdf = analysis.RDF(3.0, nbins=10)
+    rdf.accumulate(self.x, self.pairs, self.box)
+    g = rdf.g(len(self.x), self.box.volume)
+    assert_equals(g.shape, (10,))
+    np.testing.assert_allclose(g[3:], 1.0, atol=0.15)
+
+  def test_per_type(self):
+    rdf = analysis.RDF(3.0, nbins=10, ntypes=2)
+    assert_raises(ValueError, rdf.accumulate, self.x, self.pairs, self.box)
+    rdf.accumulate(self.x, self.pairs, self.box, self.t)
+    g = rdf.g(np.bincount(self.t), self.box.volume)
+    assert_equals(g.shape, (2, 2, 10))
+    np.testing.assert_array_equal(g[0, 1], g[1, 0])
+    np.testing.assert_allclose(g[..., 3:], 1.0, atol=0.3)
+    total = analysis.RDF(3.0, nbins=10)
+    total.accumulate(self.x, self.pairs, self.box)
+    np.testing.assert_array_equal(rdf.hist.sum(axis=(0, 1)), total.hist[0, 0])
+
+  def test_native_loop(self):
+    x = helpers.lattice()
+    sim = helpers.build(x, helpers.velocities(x, 1))
+    part, b, lj = sim.particles, sim.box, sim.interaction
+    lj.rdf = analysis.RDF(2.5, nbins=25)
+    sim.run(40)
+    assert_equals(lj.rdf.nsamples, 40)
+    sim.run(10)
+    assert_equals(lj.rdf.nsamples, 50)
+    sim.native = False
+    sim.run(10)
+    assert_equals(lj.rdf.nsamples, 60)
+    g = lj.rdf.g(part.n, b.volume)
+    assert_equals(g[:2].sum(), 0.0)
+    assert g.max() > 1.0
@@ -0,0 +1,149 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `Simulation` module."""
+
+
+import unittest
+from nose.tools import assert_equals
+
+from pexmd import neighbour, interaction
+from tests import helpers
+import numpy as np
+
+class TestSimulation(unittest.TestCase):
+  """Tests for `Simulation` module."""
+
+  def setUp(self):
+    """Set up test fixtures, if any."""
+    self.x = helpers.lattice()
+    self.v = helpers.velocities(self.x, 5)
+
+  def build(self, t='Periodic', skin=0.3, tilt=None):
+    return helpers.build(self.x, self.v, t=t, tilt=tilt, skin=skin)
+
+  def test_native_matches_python(self):
+    for t in ('Periodic', 'Fixed'):
+      native = self.build(t)
+      python = self.build(t)
+      python.native = False
+      assert native.native
+      native.run(100)
+      python.run(100)
+      np.testing.assert_allclose(native.particles.x, python.particles.x,
+                                 atol=1e-3)
+      np.testing.assert_allclose(native.particles.v, python.particles.v,
+                                 atol=1e-3)
+      np.testing.assert_allclose(native.energ, python.energ, rtol=1e-3)
+      assert_equals(native.neighbour.nbuilds, python.neighbour.nbuilds)
+      np.testing.assert_array_equal(native.particles.img, python.particles.img)
+
+  def test_native_threads(self):
+    native = self.build()
+    native.interaction.nthreads = 3
+    python = self.build()
+    python.native = False
+    native.run(100)
+    python.run(100)
+    np.testing.assert_allclose(native.particles.x, python.particles.x,
+                               atol=1e-3)
+    np.testing.assert_allclose(native.energ, python.energ, rtol=1e-3)
+
+  def test_native_triclinic(self):
+    native = self.build(tilt=[1.0, 0.5, -0.5])
+    python = self.build(tilt=[1.0, 0.5, -0.5])
+    python.native = False
+    native.run(100)
+    python.run(100)
+    np.testing.assert_allclose(native.particles.x, python.particles.x,
+                               atol=1e-3)
+    np.testing.assert_array_equal(native.particles.img, python.particles.img)
+
+  def test_rebuild_every_step(self):
+    native = self.build()
+    python = self.build()
+    native.neighbour = neighbour.LinkedCell(native.box, 2.5)
+    python.neighbour = neighbour.LinkedCell(python.box, 2.5)
+    python.native = False
+    native.run(20)
+    python.run(20)
+    np.testing.assert_allclose(native.particles.x, python.particles.x,
+                               atol=1e-4)
+
+  def test_callback(self):
+    sim = self.build()
+    steps = []
+    sim.run(25, callback=lambda s: steps.append(s.step), every=10)
+    assert_equals(steps, [10, 20])
+    assert_equals(sim.step, 25)
+
+  def test_frames(self):
+    for native in (True, False):
+      sim = self.build()
+      sim.native = native
+      sim.run(100)
+      assert_equals(sim.particles.frame, 100)
+      assert_equals(sim.particles._header[0] % 2, 0)
+
+  def test_snapshot_during_native_run(self):
+    import threading
+    sim = self.build()
+    frames = []
+    running = threading.Event()
+    running.set()
+    def read():
+      while running.is_set():
+        frames.append(sim.particles.snapshot(('x',))[0])
+    reader = threading.Thread(target=read)
+    reader.start()
+    sim.run(20000)
+    running.clear()
+    reader.join()
+    inside = [f for f in frames if 0 < f < 20000]
+    assert len(set(inside)) > 1
+
+  def test_reorder(self):
+    sorted_sim = self.build()
+    plain = self.build()
+    sorted_sim.sort_every = 30
+    plain.run(100)
+    sorted_sim.run(100)
+    part = sorted_sim.particles
+    assert np.any(part.idx != np.arange(part.n))
+    back = np.argsort(part.idx)
+    np.testing.assert_allclose(part.x[back], plain.particles.x, atol=1e-3)
+    np.testing.assert_allclose(part.v[back], plain.particles.v, atol=1e-3)
+    np.testing.assert_allclose(sorted_sim.energ, plain.energ, rtol=1e-3)
+
+  def test_compute_flags(self):
+    flags = interaction.ENERGY | interaction.VIRIAL
+    native = self.build()
+    native.compute = flags
+    python = self.build()
+    python.compute = flags
+    python.native = False
+    reference = self.build()
+    reference.native = False
+    native.run(60)
+    python.run(60)
+    reference.run(60)
+    np.testing.assert_allclose(native.energ, reference.energ, rtol=1e-3)
+    np.testing.assert_allclose(python.energ, reference.energ, rtol=1e-3)
+    np.testing.assert_allclose(native.interaction.virial,
+                               python.interaction.virial, rtol=1e-3,
+                               atol=1e-2)
+    assert reference.interaction.virial is None
+    forces = self.build()
+    forces.compute = interaction.FORCES
+    forces.run(60)
+    assert_equals(forces.energ, 0.0)
+    np.testing.assert_allclose(forces.particles.x, native.particles.x,
+                               atol=1e-3)
+    for use_native in (True, False):
+      peratom = self.build()
+      peratom.native = use_native
+      peratom.compute = interaction.PERATOM
+      peratom.run(60)
+      assert_equals(peratom.energ, 0.0)
+      np.testing.assert_allclose(np.sum(peratom.interaction.peratom),
+                                 reference.energ, rtol=1e-3)
@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `StructureFactor` module."""
+
+
+import unittest
+from nose.tools import assert_equals, assert_raises
+
+from pexmd import analysis, particles, box
+import numpy as np
+
+class TestStructureFactor(unittest.TestCase):
+  """Tests for `StructureFactor` module."""
+
+  def setUp(self):
+    """Set up test fixtures, if any."""
+    rng = np.random.RandomState(0)
+    self.box = box.Box(0.0, 10.0)
+    x = rng.uniform(0.0, 10.0, size=(300, 3))
+    x = np.concatenate([x, x + rng.normal(0.0, 0.3, size=x.shape)]) % 10.0
+    self.part = particles.PointParticles(len(x))
+    self.part.x = x
+    self.part.t = rng.randint(0, 2, size=len(x))
+
+  def direct(self, sf, x):
+    """S(k) summed directly over the same wavevectors as the grid."""
+    n = sf.ngrid
+    q = np.stack(np.meshgrid(np.fft.fftfreq(n)*n, np.fft.fftfreq(n)*n,
+                             np.fft.rfftfreq(n)*n, indexing='ij'), axis=-1)
+    q = q.reshape(-1, 3)
+    k = 2*np.pi*q/10.0
+    kabs = np.linalg.norm(k, axis=1)
+    use = (kabs >= sf.edges[0]) & (kabs < sf.kmax)
+    shell = np.digitize(kabs[use], sf.edges) - 1
+    rhok = np.exp(-1j*np.dot(x.astype(np.float64), k[use].T)).sum(axis=0)
+    s = np.abs(rhok)**2/len(x)
+    return (np.bincount(shell, weights=s, minlength=sf.nbins) /
+            np.bincount(shell, minlength=sf.nbins))
+
+  def test_matches_direct_sum(self):
+    for order, rtol in (('CIC', 0.05), ('TSC', 0.02)):
+      sf = analysis.StructureFactor(self.box, ngrid=32, order=order)
+      sf.sample(self.part)
+      k, s = sf.result()
+      np.testing.assert_allclose(k[0], 2*np.pi/10.0, rtol=0.2)
+      np.testing.assert_allclose(s, self.direct(sf, self.part.x), rtol=rtol)
+
+  def test_bragg_peak(self):
+    grid = np.arange(8)*1.25
+    x = np.array([(i, j, l) for i in grid for j in grid for l in grid])
+    part = particles.PointParticles(len(x))
+    part.x = x
+    sf = analysis.StructureFactor(self.box, ngrid=32, order='TSC',
+                                  kmax=6.0)
+    sf.sample(part)
+    sf.sample(part)
+    assert_equals(sf.nsamples, 2)
+    k, s = sf.result()
+    peak = np.argmin(np.abs(k - 2*np.pi/1.25))
+    assert_equals(np.argmax(s), peak)
+    np.testing.assert_allclose(s[:peak - 1], 0.0, atol=1e-6)
+
+  def test_partials(self):
+    total = analysis.StructureFactor(self.box, ngrid=16)
+    total.sample(self.part)
+    sf = analysis.StructureFactor(self.box, ngrid=16, ntypes=2)
+    sf.sample(self.part)
+    k, s = sf.result()
+    assert_equals(s.shape, (2, 2, sf.nbins))
+    np.testing.assert_array_equal(s[0, 1], s[1, 0])
+    counts = np.bincount(self.part.t)
+    weight = np.sqrt(np.outer(counts, counts))[..., np.newaxis]/self.part.n
+    np.testing.assert_allclose((weight*s).sum(axis=(0, 1)), total.result()[1])
+
+  def test_errors(self):
+    assert_raises(ValueError, analysis.StructureFactor,
+                  box.Box(0.0, 10.0, t='Fixed'))
+    assert_raises(ValueError, analysis.StructureFactor, self.box, ngrid=8,
+                  order=4)
+    assert_raises(ValueError, analysis.StructureFactor, self.box, ngrid=8,
+                  order='PCS')
+
+  def test_shells(self):
+    sf = analysis.StructureFactor(self.box, ngrid=32)
+    dk = 2*np.pi/10.0
+    np.testing.assert_allclose(sf.k, dk*np.arange(1, sf.nbins + 1))
+    np.testing.assert_allclose(np.diff(sf.edges), dk)
+    assert sf.kmax <= 0.5*np.pi*32/10.0
+    sf = analysis.StructureFactor(self.box, ngrid=32, nbins=3)
+    np.testing.assert_allclose(sf.kmax, 3.5*dk)
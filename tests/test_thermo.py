@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `Thermo` module."""
+
+
+import io
+import unittest
+from nose.tools import assert_equals
+
+from pexmd import analysis, interaction
+from tests import helpers
+import numpy as np
+
+class TestThermo(unittest.TestCase):
+  """Tests for `Thermo` module."""
+
+  def setUp(self):
+    """Set up test fixtures, if any."""
+    x = helpers.lattice()
+    self.sim = helpers.build(x, helpers.velocities(x, 8), mass=2.0)
+
+  def test_block_average(self):
+    rng = np.random.RandomState(1)
+    avg = analysis.BlockAverage()
+    # Correlated samples: the naive error is too small
+    values = np.repeat(rng.normal(size=512), 8)
+    for value in values:
+      avg.add(value)
+    assert_equals(avg.n, len(values))
+    np.testing.assert_allclose(avg.mean, values.mean())
+    np.testing.assert_allclose(avg.errors[0],
+                               values.std()/np.sqrt(len(values) - 1))
+    np.testing.assert_allclose(avg.error, 1/np.sqrt(512), rtol=0.2)
+
+  def test_sample(self):
+    log = io.StringIO()
+    thermo = analysis.Thermo(log=log, log_every=2)
+    self.sim.run(50, callback=thermo, every=5)
+    assert_equals(thermo.nsamples, 10)
+    part = self.sim.particles
+    kin = 0.5*np.sum(part.mass[:, np.newaxis]*part.v**2)
+    np.testing.assert_allclose(thermo.values['KinEng'], kin, rtol=1e-5)
+    np.testing.assert_allclose(thermo.values['Temp'], 2*kin/(3*part.n),
+                               rtol=1e-5)
+    np.testing.assert_allclose(thermo.values['PotEng'], self.sim.energ)
+    lines = log.getvalue().splitlines()
+    assert_equals(len(lines), 6)
+    assert_equals(lines[0].split(), ['Step'] + analysis.QUANTITIES)
+    assert_equals(int(lines[-1].split()[0]), 45)
+    tot = thermo.averages['TotEng']
+    assert abs(tot.mean - thermo.values['TotEng']) < 1e-2*abs(tot.mean)
+    assert 'Press' in thermo.summary()
+
+  def test_pressure(self):
+    thermo = analysis.Thermo(log=None)
+    self.sim.forces()
+    thermo.sample(self.sim)
+    part = self.sim.particles
+    b = self.sim.box
+    virial = 0.0
+    for i, j in self.sim.pairs:
+      delr = b.minimum_image((part.x[i] - part.x[j])[np.newaxis].copy())[0]
+      r = np.linalg.norm(delr)
+      if r < 2.5:
+        virial += 24*(2/r**12 - 1/r**6)
+    press = (2*thermo.values['KinEng'] + virial)/(3*b.volume)
+    np.testing.assert_allclose(thermo.values['Press'], press, rtol=1e-4)
+
+  def test_kernel_virial(self):
+    thermo = analysis.Thermo(log=None)
+    self.sim.forces()
+    thermo.sample(self.sim)
+    virial = thermo.virial(self.sim)
+    self.sim.compute = interaction.ENERGY | interaction.VIRIAL
+    self.sim.forces()
+    assert self.sim.interaction.virial is not None
+    np.testing.assert_allclose(np.trace(self.sim.interaction.virial), virial,
+                               rtol=1e-4)
+    kernel = analysis.Thermo(log=None)
+    kernel.sample(self.sim)
+    np.testing.assert_allclose(kernel.values['Press'],
+                               thermo.values['Press'], rtol=1e-4)
+
+  def test_attach(self):
+    thermo = analysis.Thermo(log=None, sim=self.sim)
+    assert_equals(self.sim.compute,
+                  interaction.ENERGY | interaction.VIRIAL)
+    self.sim.run(10, callback=thermo, every=5)
+    assert self.sim.interaction.virial is not None
+    self.sim.compute = interaction.FORCES
+    lazy = analysis.Thermo(log=None)
+    lazy.sample(self.sim)
+    assert np.isnan(lazy.values['PotEng'])
+    assert np.isnan(lazy.values['TotEng'])
+    assert self.sim.compute & interaction.VIRIAL
+
+  def test_without_energy(self):
+    self.sim.compute = interaction.FORCES
+    thermo = analysis.Thermo(log=None)
+    self.sim.run(20, callback=thermo, every=5)
+    assert_equals(thermo.nsamples, 4)
+    assert_equals(thermo.averages['PotEng'].n, 3)
+    assert_equals(thermo.averages['KinEng'].n, 4)
+    assert np.isfinite(thermo.mean('PotEng'))
+    assert np.isfinite(thermo.mean('TotEng'))
+    assert np.isfinite(thermo.mean('Press'))
+    avg = analysis.BlockAverage()
+    avg.add(np.nan)
+    assert_equals(avg.n, 0)
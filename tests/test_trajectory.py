@@ -0,0 +1,140 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `Trajectory` module."""
+
+
+import os
+import json
+import shutil
+import tempfile
+import unittest
+from nose.tools import assert_equals, assert_raises
+
+from pexmd import trajectory, particles, box
+import numpy as np
+
+class TestTrajectoryWriter(unittest.TestCase):
+  """Tests for `TrajectoryWriter`."""
+
+  def setUp(self):
+    """Set up test fixtures, if any."""
+    self.tmp = tempfile.mkdtemp()
+    self.fname = os.path.join(self.tmp, 'traj.bin')
+    self.part = particles.PointParticles(5)
+    self.part.x = np.arange(15).reshape(5, 3)
+    self.part.v = -np.arange(15).reshape(5, 3)
+    self.part.t = [0, 1, 0, 1, 0]
+    self.box = box.Box(0.0, 10.0)
+
+  def tearDown(self):
+    """Tear down test fixtures, if any."""
+    shutil.rmtree(self.tmp)
+
+  def read(self):
+    with open(self.fname, 'rb') as f:
+      data = f.read()
+    assert_equals(data[:8], trajectory.MAGIC)
+    size = int(np.frombuffer(data[8:16], dtype='<u8')[0])
+    header = json.loads(data[16:16 + size].decode())
+    dtype = trajectory.frame_dtype(header['n'], header['fields'],
+                                   header['precision'])
+    assert_equals(data[-8:], trajectory.INDEX_MAGIC)
+    nframes = int(np.frombuffer(data[-16:-8], dtype='<i8')[0])
+    index = np.frombuffer(data[-16 - 16*nframes:-16],
+                          dtype='<i8').reshape(nframes, 2)
+    frames = np.frombuffer(data, dtype=dtype, count=nframes,
+                           offset=16 + size)
+    return header, index, frames
+
+  def test_write(self):
+    with trajectory.TrajectoryWriter(self.fname, 5, fields=('x', 'v', 't'),
+                                     nbuffers=2, chunk=3) as writer:
+      for step in range(7):
+        self.part.x += 1.0
+        writer.write(self.part, self.box, step=10*step, time=0.1*step)
+    assert_equals(writer.nframes, 7)
+    header, index, frames = self.read()
+    assert_equals(header['fields'], ['x', 'v', 't'])
+    np.testing.assert_array_equal(index[:, 1], 10*np.arange(7))
+    assert_equals(index[1, 0] - index[0, 0], frames.dtype.itemsize)
+    np.testing.assert_array_equal(frames['step'], 10*np.arange(7))
+    np.testing.assert_array_equal(frames['x'][-1], self.part.x)
+    np.testing.assert_array_equal(frames['x'][0], self.part.x - 6.0)
+    np.testing.assert_array_equal(frames['t'][3], [0, 1, 0, 1, 0])
+    np.testing.assert_array_equal(frames['box'][0], [0]*3 + [10]*3 + [0]*3)
+
+  def test_precision(self):
+    with trajectory.TrajectoryWriter(self.fname, 5, fields=('x',),
+                                     precision='half') as writer:
+      writer.write(self.part, self.box)
+    header, index, frames = self.read()
+    assert_equals(frames['x'].dtype, np.float16)
+    np.testing.assert_array_equal(frames['x'][0], self.part.x)
+    assert_raises(ValueError, trajectory.frame_dtype, 5, ('q',))
+    assert_raises(ValueError, trajectory.frame_dtype, 5, ('x',), 'quad')
+
+  def test_wrong_size(self):
+    with trajectory.TrajectoryWriter(self.fname, 4) as writer:
+      assert_raises(ValueError, writer.write, self.part, self.box)
+    assert_raises(ValueError, writer.write, self.part, self.box)
+
+class TestTrajectoryReader(unittest.TestCase):
+  """Tests for `TrajectoryReader`."""
+
+  def setUp(self):
+    """Set up test fixtures, if any."""
+    self.tmp = tempfile.mkdtemp()
+    self.fname = os.path.join(self.tmp, 'traj.bin')
+    part = particles.PointParticles(6)
+    part.x = np.arange(18).reshape(6, 3)
+    part.t = [0, 1, 2, 0, 1, 2]
+    self.box = box.Box(0.0, 10.0, tilt=[1.0, 0.0, 0.0])
+    with trajectory.TrajectoryWriter(self.fname, 6, fields=('x', 't'),
+                                     chunk=4) as writer:
+      for step in range(10):
+        writer.write(part, self.box, step=5*step)
+        part.x += 1.0
+
+  def tearDown(self):
+    """Tear down test fixtures, if any."""
+    shutil.rmtree(self.tmp)
+
+  def test_frames(self):
+    with trajectory.TrajectoryReader(self.fname) as reader:
+      assert_equals(len(reader), 10)
+      assert_equals(reader.fields, ('x', 't'))
+      np.testing.assert_array_equal(reader.steps, 5*np.arange(10))
+      assert_equals(reader.find(35), 7)
+      assert_raises(KeyError, reader.find, 36)
+      np.testing.assert_array_equal(reader[7]['x'],
+                                    np.arange(18).reshape(6, 3) + 7)
+      b = reader.box(3)
+      np.testing.assert_array_equal(b.tilt, [1.0, 0.0, 0.0])
+      np.testing.assert_array_equal(b.xf, self.box.xf)
+
+  def test_views(self):
+    with trajectory.TrajectoryReader(self.fname) as reader:
+      x = reader.field('x', slice(1, None, 3), slice(0, 4, 2))
+      assert_equals(x.shape, (3, 2, 3))
+      assert np.shares_memory(x, reader.frames)
+      np.testing.assert_array_equal(x[1], [[4, 5, 6], [10, 11, 12]])
+      t = reader.field('t', 2, [0, 5])
+      np.testing.assert_array_equal(t, [0, 2])
+      assert_raises(KeyError, reader.field, 'v')
+
+  def test_chunks(self):
+    with trajectory.TrajectoryReader(self.fname) as reader:
+      chunks = list(reader.chunks(2, fields=('x',), stride=2))
+    assert_equals([start for start, _ in chunks], [0, 4, 8])
+    steps = np.concatenate([chunk['step'] for _, chunk in chunks])
+    np.testing.assert_array_equal(steps, 10*np.arange(5))
+    assert_equals(chunks[0][1]['x'].shape, (2, 6, 3))
+
+  def test_unindexed(self):
+    with open(self.fname, 'rb') as f:
+      data = f.read()
+    with open(self.fname, 'wb') as f:
+      f.write(data[:-16 - 16*10 - 7])
+    with trajectory.TrajectoryReader(self.fname) as reader:
+      assert_equals(len(reader), 9)